@@ -1,37 +1,66 @@
 """
-Admin 认证模块
-- JWT Token 认证
-- 自动续期机制
+认证模块
+- JWT Token 签发与校验，Admin Token 和提问者 Token 共用 authenticate()
+- 已校验的 Token 缓存在进程内 (LRU)，缓存时间不超过 Token 自身的 exp，命中时不再验签和解析
+- 吊销列表保存在 revoked_tokens 表中，吊销时递增 generations 表中的代数；
+  各 worker 最多 AUTH_REVOCATION_TTL_MS 毫秒后重新读取，执行吊销的 worker 提交后立即生效
+- 自动续期机制: 每个旧 Token 只签发一次新 Token，之后的请求返回同一个新 Token
+- 登录时生成会话 ID (sid)，续期签发的 Token 沿用同一个 sid；注销时按会话吊销，
+  任何 worker 为该会话签发的续期 Token 一并失效
 """
 import jwt
+import time
+import uuid
+import hashlib
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from fastapi import HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from passlib.context import CryptContext
+from sqlalchemy import event, select, update, delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from .config import settings
+from . import models, database
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer(auto_error=False)
 
+_pwd_context = None
+
+
+def get_pwd_context():
+    """bcrypt 密码上下文，第一次使用时才导入 passlib (管理员密码目前按明文比较，启动时不需要)"""
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """验证密码"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     """生成密码哈希"""
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 
-def create_admin_token(username: str) -> dict:
-    """创建 Admin JWT Token"""
+# ============================================
+# 签发
+# ============================================
+def create_admin_token(username: str, session_id: str | None = None) -> dict:
+    """创建 Admin JWT Token (session_id 为空时开始新会话，续期时传入原 Token 的会话 ID)"""
     expire = datetime.utcnow() + timedelta(days=settings.ADMIN_TOKEN_EXPIRE_DAYS)
+    # 同一秒内签发的 Token 也互不相同，注销一个会话不会影响另一个
+    jti = uuid.uuid4().hex
     to_encode = {
         "sub": username,
         "type": "admin",
         "exp": expire,
-        "iat": datetime.utcnow()
+        "iat": datetime.utcnow(),
+        "jti": jti,
+        "sid": session_id or jti,
     }
     token = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return {
@@ -41,26 +70,217 @@ def create_admin_token(username: str) -> dict:
     }
 
 
-def decode_admin_token(token: str) -> dict | None:
-    """解码并验证 Admin Token"""
+def create_question_token(question_id: str) -> str:
+    """创建提问者 Token (撤回问题、订阅状态变化时证明所有权)"""
+    expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode = {"sub": str(question_id), "type": "asker", "exp": expire}
+    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+
+# ============================================
+# 校验
+# ============================================
+def decode_token(token: str) -> dict | None:
+    """验签并解析 Token，无效或已过期时返回 None (不经过缓存)"""
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        if payload.get("type") != "admin":
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except jwt.PyJWTError:
+        return None
+
+
+def token_key(token: str) -> str:
+    """单个 Token 在吊销列表中的键"""
+    return "token:" + hashlib.sha256(token.encode()).hexdigest()
+
+
+def subject_key(token_type: str, subject: str) -> str:
+    """某个主体的全部 Token 在吊销列表中的键 (如 asker:<问题 ID>)"""
+    return f"{token_type}:{subject}"
+
+
+def session_key(session_id: str) -> str:
+    """一次登录及其全部续期 Token 在吊销列表中的键"""
+    return f"session:{session_id}"
+
+
+class VerifiedToken:
+    __slots__ = ("payload", "key", "cached_until", "refreshed")
+
+    def __init__(self, payload: dict, key: str, cached_until: float):
+        self.payload = payload
+        self.key = key
+        self.cached_until = cached_until
+        self.refreshed: str | None = None  # 续期签发的新 Token
+
+    @property
+    def subject_key(self) -> str:
+        return subject_key(self.payload.get("type", ""), self.payload.get("sub", ""))
+
+    @property
+    def session_id(self) -> str | None:
+        # 加入 sid 之前签发的 Token 以自身的 jti 作为会话 ID
+        return self.payload.get("sid") or self.payload.get("jti")
+
+
+class TokenCache:
+    """已校验 Token 的 LRU 缓存 (只缓存有效的 Token)"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[str, VerifiedToken] = OrderedDict()
+
+    def get(self, token: str) -> VerifiedToken | None:
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        if entry.cached_until <= time.time():
+            del self._entries[token]
+            return None
+        self._entries.move_to_end(token)
+        return entry
+
+    def put(self, token: str, payload: dict) -> VerifiedToken:
+        now = time.time()
+        cached_until = min(payload.get("exp", now), now + self.ttl)
+        entry = VerifiedToken(payload, token_key(token), cached_until)
+        if self.max_size > 0:
+            self._entries[token] = entry
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        self._entries.clear()
+
+
+class RevocationList:
+    """吊销列表的进程内副本，按代数与数据库同步
+
+    每条吊销记录保存写入时的代数，代数变化时只加载本地副本之后新增的记录
+    """
+
+    name = "revoked_tokens"
+
+    def __init__(self, generation_ttl: float):
+        self.generation_ttl = generation_ttl
+        self._keys: dict[str, datetime] = {}  # 键 -> 过期时间
+        self._generation: int | None = None
+        self._checked_at = 0.0
+
+    async def refresh(self):
+        """TTL 内直接使用本地副本；代数变化时增量加载未过期的键"""
+        now = time.monotonic()
+        if self._generation is not None and now - self._checked_at <= self.generation_ttl:
+            return
+        # 使用独立的短会话: 调用方可能是长时间不结束的 SSE 请求
+        async with database.ReadSessionLocal() as db:
+            result = await db.execute(
+                select(models.Generation.value).where(models.Generation.name == self.name)
+            )
+            generation = result.scalar() or 0
+            if generation != self._generation:
+                utcnow = datetime.utcnow()
+                query = (
+                    select(models.RevokedToken.key, models.RevokedToken.expires_at)
+                    .where(models.RevokedToken.expires_at > utcnow)
+                )
+                # 首次加载或代数倒退 (如恢复了备份) 时全量加载
+                incremental = self._generation is not None and generation > self._generation
+                if incremental:
+                    query = query.where(models.RevokedToken.generation > self._generation)
+                result = await db.execute(query)
+                if incremental:
+                    keys = {key: exp for key, exp in self._keys.items() if exp > utcnow}
+                    keys.update(result.all())
+                else:
+                    keys = dict(result.all())
+                self._keys = keys
+                self._generation = generation
+        self._checked_at = now
+
+    def is_revoked(self, entry: VerifiedToken) -> bool:
+        if not self._keys:
+            return False
+        if entry.key in self._keys or entry.subject_key in self._keys:
+            return True
+        session_id = entry.session_id
+        return session_id is not None and session_key(session_id) in self._keys
+
+    async def revoke(self, db: AsyncSession, keys: dict[str, datetime]):
+        """在调用方的事务中写入吊销记录 (键 -> 过期时间) 并递增代数，提交后本 worker 立即生效"""
+        if not keys:
+            return
+        now = datetime.utcnow()
+        result = await db.execute(
+            update(models.Generation)
+            .where(models.Generation.name == self.name)
+            .values(value=models.Generation.value + 1)
+            .returning(models.Generation.value)
+        )
+        generation = result.scalar()
+        await db.execute(delete(models.RevokedToken).where(models.RevokedToken.expires_at <= now))
+        stmt = sqlite_insert(models.RevokedToken).values([
+            {"key": key, "expires_at": expires_at, "revoked_at": now, "generation": generation}
+            for key, expires_at in keys.items()
+        ])
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=["key"],
+            set_={"expires_at": stmt.excluded.expires_at, "generation": stmt.excluded.generation},
+        ))
+        event.listen(db.sync_session, "after_commit", self._mark_stale, once=True)
+
+    def _mark_stale(self, session=None):
+        # 保留本地代数，下次 refresh 增量加载
+        self._checked_at = 0.0
+
+
+token_cache = TokenCache(settings.AUTH_TOKEN_CACHE_SIZE, settings.AUTH_TOKEN_CACHE_TTL_SECONDS)
+revocation_list = RevocationList(settings.AUTH_REVOCATION_TTL_MS / 1000)
+
+
+async def authenticate(token: str, token_type: str) -> VerifiedToken | None:
+    """校验 Token 的签名、有效期、类型和吊销状态，失败时返回 None
+
+    Admin 接口、上传接口 (Admin 不限大小) 和提问者 Token 共用
+    """
+    entry = token_cache.get(token)
+    if entry is None:
+        payload = decode_token(token)
+        if payload is None:
             return None
-        return payload
-    except jwt.ExpiredSignatureError:
+        entry = token_cache.put(token, payload)
+    if entry.payload.get("type") != token_type:
         return None
-    except jwt.PyJWTError:
+    await revocation_list.refresh()
+    if revocation_list.is_revoked(entry):
         return None
+    return entry
 
 
+async def revoke_token(db: AsyncSession, entry: VerifiedToken):
+    """吊销 Token 及其所在会话 (包括其他 worker 续期签发的新 Token，不提交事务)"""
+    expires_at = datetime.utcfromtimestamp(entry.payload.get("exp", time.time()))
+    keys = {entry.key: expires_at}
+    session_id = entry.session_id
+    if session_id is not None:
+        # 会话中最晚的 Token 不晚于现在签发 (其他 worker 在 AUTH_REVOCATION_TTL_MS 内仍可能续期)
+        keys[session_key(session_id)] = datetime.utcnow() + timedelta(
+            days=settings.ADMIN_TOKEN_EXPIRE_DAYS, milliseconds=settings.AUTH_REVOCATION_TTL_MS,
+        )
+    await revocation_list.revoke(db, keys)
+
+
+# ============================================
+# Admin
+# ============================================
 def check_token_needs_refresh(payload: dict) -> bool:
     """检查 Token 是否需要续期"""
     exp = payload.get("exp")
     if not exp:
         return False
-    expire_time = datetime.fromtimestamp(exp)
-    remaining = expire_time - datetime.utcnow()
+    remaining = timedelta(seconds=exp - time.time())
     return remaining.days < settings.ADMIN_TOKEN_REFRESH_DAYS
 
 
@@ -69,7 +289,7 @@ async def get_current_admin(
 ) -> dict:
     """
     验证当前请求的 Admin 身份
-    返回: {"username": str, "new_token": str | None}
+    返回: {"username": str, "new_token": str | None, "token": VerifiedToken}
     如果 Token 即将过期，会返回新 Token
     """
     if not credentials:
@@ -78,26 +298,34 @@ async def get_current_admin(
             detail="未提供认证凭据",
             headers={"WWW-Authenticate": "Bearer"}
         )
-    
-    payload = decode_admin_token(credentials.credentials)
-    if not payload:
+
+    entry = await authenticate(credentials.credentials, "admin")
+    if not entry:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="无效或过期的 Token",
+            detail="无效、过期或已注销的 Token",
             headers={"WWW-Authenticate": "Bearer"}
         )
-    
-    username = payload.get("sub")
-    result = {"username": username, "new_token": None}
-    
-    # 检查是否需要续期
-    if check_token_needs_refresh(payload):
-        new_token_data = create_admin_token(username)
-        result["new_token"] = new_token_data["access_token"]
-    
+
+    username = entry.payload.get("sub")
+    result = {"username": username, "new_token": None, "token": entry}
+
+    # 检查是否需要续期 (同一个旧 Token 只签发一次)
+    if check_token_needs_refresh(entry.payload):
+        if entry.refreshed is None:
+            entry.refreshed = create_admin_token(username, session_id=entry.session_id)["access_token"]
+        result["new_token"] = entry.refreshed
+
     return result
 
 
+async def is_admin_authorization(authorization: str | None) -> bool:
+    """Authorization 请求头是否携带有效的 Admin Token (可选鉴权的接口使用)"""
+    if not authorization or not authorization.startswith("Bearer "):
+        return False
+    return await authenticate(authorization[len("Bearer "):], "admin") is not None
+
+
 def verify_admin_credentials(username: str, password: str) -> bool:
     """
     验证管理员凭据
@@ -1,23 +1,56 @@
 """
 SQLite 自动备份模块
 - 支持定时备份
+- 使用 SQLite 在线备份 API 分步复制，在工作线程中执行，不阻塞事件循环和写入
+- 可选 gzip / zstd 压缩: 在线备份 API 只能写入 SQLite 数据库文件，先备份到未压缩的临时文件再流式压缩，
+  BACKUP_DIR 所在磁盘需要约两倍于数据库大小的可用空间，开始前会检查
 - 限制备份数量，自动清理旧备份
+- 提供校验和恢复命令:
+    python -m backend.backup create|list|verify|restore
 """
 import os
+import gzip
 import shutil
+import sqlite3
 import asyncio
 import logging
+import tempfile
+import time
 from datetime import datetime
 from pathlib import Path
 from .config import settings
+from . import metrics
 
 logger = logging.getLogger(__name__)
 
+BACKUP_GLOB = "qa_box_backup_*.db*"
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def _open_compressed(path: Path, mode: str, compression: str):
+    """按压缩格式打开文件对象 (mode 为 "rb" 或 "wb")"""
+    if compression == "gzip":
+        return gzip.open(path, mode)
+    if compression == "zstd":
+        import zstandard
+        raw = open(path, mode)
+        if mode == "rb":
+            return zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        return zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+    return open(path, mode)
+
+
+def _detect_compression(path: Path) -> str:
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if path.name.endswith(suffix):
+            return compression
+    return "none"
+
 
 class BackupManager:
     def __init__(self):
-        self.backup_dir = Path(settings.BACKUP_DIR)
-        self.backup_dir.mkdir(parents=True, exist_ok=True)
+        self.backup_dir = Path(settings.BACKUP_DIR)  # 第一次备份时创建
         self.db_path = self._get_db_path()
         self._task = None
         self._last_backup_hash = None  # 用于检测数据库是否变化
@@ -36,8 +69,13 @@ class BackupManager:
         if not self.db_path.exists():
             return None
         # 使用文件大小和修改时间作为简单的哈希
-        stat = self.db_path.stat()
-        return f"{stat.st_size}_{stat.st_mtime}"
+        # WAL 模式下新写入先落在 -wal 文件中，需要一并纳入
+        parts = []
+        for path in (self.db_path, self.db_path.with_name(self.db_path.name + "-wal")):
+            if path.exists():
+                stat = path.stat()
+                parts.append(f"{stat.st_size}_{stat.st_mtime}")
+        return "|".join(parts)
     
     def _should_backup(self) -> bool:
         """判断是否需要备份（数据库是否有变化）"""
@@ -52,8 +90,47 @@ class BackupManager:
         logger.debug("Database unchanged, skipping backup")
         return False
     
+    def _resolve_compression(self) -> str:
+        compression = settings.BACKUP_COMPRESSION
+        if compression == "zstd":
+            try:
+                import zstandard  # noqa: F401
+            except ImportError:
+                logger.warning("zstandard is not installed, falling back to gzip backup compression")
+                return "gzip"
+        return compression
+    
+    def _online_copy(self, target: Path):
+        """使用 SQLite 在线备份 API 分步复制数据库
+        
+        每一步只复制 BACKUP_PAGES_PER_STEP 页，步骤之间释放锁，
+        写入方不会被长时间阻塞，也不会复制到写了一半的文件。
+        """
+        source = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        dest = sqlite3.connect(target)
+        try:
+            source.backup(
+                dest,
+                pages=settings.BACKUP_PAGES_PER_STEP,
+                sleep=settings.BACKUP_STEP_SLEEP_MS / 1000,
+            )
+            # 备份文件独立使用，不需要 WAL
+            dest.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            dest.close()
+            source.close()
+    
+    def _required_space(self, compression: str) -> int:
+        """备份过程中 BACKUP_DIR 最多需要的空间: 未压缩的临时文件，压缩时再加上不超过其大小的压缩输出"""
+        size = sum(
+            path.stat().st_size
+            for path in (self.db_path, self.db_path.with_name(self.db_path.name + "-wal"))
+            if path.exists()
+        )
+        return size * 2 if compression != "none" else size
+    
     def create_backup(self, force: bool = False) -> str | None:
-        """创建一个数据库备份
+        """创建一个数据库备份 (同步执行，异步代码中请使用 run_backup)
         
         Args:
             force: 强制备份，忽略变化检测
@@ -68,30 +145,123 @@ class BackupManager:
             return None
         
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_name = f"qa_box_backup_{timestamp}.db"
+        compression = self._resolve_compression()
+        backup_name = f"qa_box_backup_{timestamp}.db{COMPRESSION_SUFFIXES.get(compression, '')}"
         backup_path = self.backup_dir / backup_name
+        # 先写入隐藏的临时文件，完成后再重命名，避免出现不完整的备份
+        tmp_path = self.backup_dir / f".{backup_name}.tmp"
+        db_hash = self._get_db_hash()
+        started = time.perf_counter()
         
         try:
-            shutil.copy2(self.db_path, backup_path)
+            self.backup_dir.mkdir(parents=True, exist_ok=True)
+            required = self._required_space(compression)
+            free = shutil.disk_usage(self.backup_dir).free
+            if free < required:
+                raise OSError(f"not enough free space in {self.backup_dir}: {free} bytes free, {required} bytes needed")
+            self._online_copy(tmp_path)
+            if compression != "none":
+                compressed_path = tmp_path.with_name(tmp_path.name + ".z")
+                with open(tmp_path, "rb") as src, _open_compressed(compressed_path, "wb", compression) as dst:
+                    shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+                os.replace(compressed_path, tmp_path)
+            os.replace(tmp_path, backup_path)
             logger.info(f"Backup created: {backup_path}")
+            metrics.backup_duration.observe(time.perf_counter() - started, result="success")
+            metrics.backup_last_success.set(time.time())
             
             # 更新哈希值
-            self._last_backup_hash = self._get_db_hash()
+            self._last_backup_hash = db_hash
             
             self._cleanup_old_backups()
             return str(backup_path)
         except Exception as e:
             logger.error(f"Backup failed: {e}")
+            metrics.backup_duration.observe(time.perf_counter() - started, result="failure")
+            for leftover in (tmp_path, tmp_path.with_name(tmp_path.name + ".z")):
+                leftover.unlink(missing_ok=True)
             return None
     
-    def _cleanup_old_backups(self):
-        """清理旧备份，保留最近 N 个"""
-        max_backups = settings.BACKUP_MAX_COUNT
-        backups = sorted(
-            self.backup_dir.glob("qa_box_backup_*.db"),
+    async def run_backup(self, force: bool = False) -> str | None:
+        """在工作线程中创建备份，不阻塞事件循环"""
+        return await asyncio.to_thread(self.create_backup, force)
+    
+    def _extract(self, backup_path: Path) -> tuple[Path, bool]:
+        """返回可直接用 SQLite 打开的备份文件路径，压缩备份会解压到临时文件
+        
+        返回: (文件路径, 是否为需要删除的临时文件)
+        """
+        compression = _detect_compression(backup_path)
+        if compression == "none":
+            return backup_path, False
+        fd, tmp_name = tempfile.mkstemp(prefix=".qa_box_verify_", suffix=".db", dir=self.backup_dir)
+        with os.fdopen(fd, "wb") as dst, _open_compressed(backup_path, "rb", compression) as src:
+            shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+        return Path(tmp_name), True
+    
+    def verify_backup(self, backup_path: str | Path) -> tuple[bool, list[str]]:
+        """对备份执行 PRAGMA integrity_check
+        
+        返回: (是否通过, 检查结果)
+        """
+        backup_path = Path(backup_path)
+        try:
+            db_file, is_temp = self._extract(backup_path)
+        except Exception as e:
+            # 文件不存在、压缩数据损坏等
+            return False, [f"Failed to read backup: {e}"]
+        try:
+            conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True)
+            try:
+                messages = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+            finally:
+                conn.close()
+        except sqlite3.DatabaseError as e:
+            messages = [str(e)]
+        finally:
+            if is_temp:
+                db_file.unlink(missing_ok=True)
+        return messages == ["ok"], messages
+    
+    def restore_backup(self, backup_path: str | Path, target: str | Path | None = None) -> bool:
+        """校验备份后，用在线备份 API 将其写回数据库
+        
+        Args:
+            target: 恢复目标，默认为当前配置的数据库文件
+        """
+        backup_path = Path(backup_path)
+        target = Path(target) if target else self.db_path
+        ok, messages = self.verify_backup(backup_path)
+        if not ok:
+            logger.error(f"Refusing to restore {backup_path}: integrity check failed: {messages[:5]}")
+            return False
+        
+        db_file, is_temp = self._extract(backup_path)
+        try:
+            source = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True)
+            dest = sqlite3.connect(target, timeout=settings.SQLITE_BUSY_TIMEOUT_MS / 1000)
+            try:
+                source.backup(dest, pages=settings.BACKUP_PAGES_PER_STEP)
+            finally:
+                dest.close()
+                source.close()
+        finally:
+            if is_temp:
+                db_file.unlink(missing_ok=True)
+        logger.info(f"Restored {backup_path} into {target}")
+        return True
+    
+    def _backup_files(self) -> list[Path]:
+        return sorted(
+            self.backup_dir.glob(BACKUP_GLOB),
             key=lambda p: p.stat().st_mtime,
             reverse=True
         )
+    
+    def _cleanup_old_backups(self):
+        """清理旧备份，保留最近 N 个"""
+        max_backups = settings.BACKUP_MAX_COUNT
+        backups = self._backup_files()
         
         for old_backup in backups[max_backups:]:
             try:
@@ -102,11 +272,7 @@ class BackupManager:
     
     def list_backups(self) -> list[dict]:
         """列出所有备份"""
-        backups = sorted(
-            self.backup_dir.glob("qa_box_backup_*.db"),
-            key=lambda p: p.stat().st_mtime,
-            reverse=True
-        )
+        backups = self._backup_files()
         return [
             {
                 "name": b.name,
@@ -116,19 +282,26 @@ class BackupManager:
             for b in backups
         ]
     
-    async def start_scheduled_backup(self):
-        """启动定时备份任务"""
+    async def start_scheduled_backup(self, backup_now: bool = False):
+        """启动定时备份任务
+        
+        Args:
+            backup_now: 先在后台创建一次备份 (仅在数据库有变化时)，即使定时备份已禁用
+        """
         interval_hours = settings.BACKUP_INTERVAL_HOURS
         if interval_hours <= 0:
             logger.info("Scheduled backup disabled (interval <= 0)")
-            return
-        
-        logger.info(f"Starting scheduled backup every {interval_hours} hours")
+            if not backup_now:
+                return
+        else:
+            logger.info(f"Starting scheduled backup every {interval_hours} hours")
         
         async def backup_loop():
-            while True:
+            if backup_now:
+                await self.run_backup()
+            while interval_hours > 0:
                 await asyncio.sleep(interval_hours * 3600)
-                self.create_backup()
+                await self.run_backup()
         
         self._task = asyncio.create_task(backup_loop())
     
@@ -142,3 +315,37 @@ class BackupManager:
 
 # 全局备份管理器实例
 backup_manager = BackupManager()
+
+
+def main():
+    import argparse
+    import sys
+    
+    parser = argparse.ArgumentParser(description="QA Box 数据库备份工具")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("create", help="立即创建一个备份")
+    sub.add_parser("list", help="列出已有备份")
+    verify = sub.add_parser("verify", help="校验备份完整性")
+    verify.add_argument("backup")
+    restore = sub.add_parser("restore", help="校验并恢复备份 (建议先停止服务)")
+    restore.add_argument("backup")
+    restore.add_argument("--target", help="恢复到指定文件，默认为当前数据库")
+    args = parser.parse_args()
+    
+    if args.command == "create":
+        path = backup_manager.create_backup(force=True)
+        print(path or "Backup failed")
+        sys.exit(0 if path else 1)
+    elif args.command == "list":
+        for b in backup_manager.list_backups():
+            print(f"{b['created_at']}  {b['size']:>12}  {b['name']}")
+    elif args.command == "verify":
+        ok, messages = backup_manager.verify_backup(args.backup)
+        print("\n".join(messages))
+        sys.exit(0 if ok else 1)
+    elif args.command == "restore":
+        sys.exit(0 if backup_manager.restore_backup(args.backup, args.target) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# Benchmarks package (run from repo root, e.g. python -m backend.benchmarks.bench_pagination)
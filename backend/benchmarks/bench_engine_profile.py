@@ -0,0 +1,141 @@
+"""
+SQLite 引擎配置负载测试: 原始默认配置 vs config.Settings 中的引擎配置
+
+用法 (在仓库根目录):
+    python -m backend.benchmarks.bench_engine_profile --workers 4 --concurrency 16 --duration 10
+
+模拟多个 gunicorn worker (独立进程) 同时读写同一个数据库文件，
+混合执行公开列表查询和提交问题，统计吞吐量、延迟和 "database is locked" 错误数。
+"""
+import os
+import argparse
+import asyncio
+import multiprocessing
+import random
+import statistics
+import tempfile
+import time
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+from .. import models
+from ..database import create_db_engine
+from ..pagination import paginate
+from .common import make_engine, make_sessionmaker, create_schema, seed_questions
+
+PROFILES = ("default", "profile")
+
+
+def build_engine(profile: str, db_path: str):
+    url = f"sqlite+aiosqlite:///{db_path}"
+    if profile == "default":
+        # 改动前 database.py 的配置 (去掉 echo 以免日志输出干扰测量)
+        return create_async_engine(url, connect_args={"check_same_thread": False})
+    return create_db_engine(url, echo=False)
+
+
+async def worker_loop(profile: str, db_path: str, concurrency: int, duration: float,
+                      write_ratio: float, start_at: float, seed: int) -> dict:
+    engine = build_engine(profile, db_path)
+    session_factory = make_sessionmaker(engine)
+    rng = random.Random(seed)
+    stats = {"read": [], "write": [], "errors": 0}
+    feed = (
+        select(models.Question)
+        .where(models.Question.is_answered == True)
+        .where(models.Question.is_public == True)
+    )
+
+    await asyncio.sleep(max(0.0, start_at - time.time()))
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        while time.perf_counter() < deadline:
+            is_write = rng.random() < write_ratio
+            started = time.perf_counter()
+            try:
+                async with session_factory() as session:
+                    if is_write:
+                        session.add(models.Question(content="<p>load test</p>", images=[]))
+                        await session.commit()
+                    else:
+                        await paginate(session, feed, models.Question.answered_at, 20)
+            except OperationalError:
+                stats["errors"] += 1
+                continue
+            stats["write" if is_write else "read"].append(time.perf_counter() - started)
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    await engine.dispose()
+    return stats
+
+
+def run_worker(task: tuple) -> dict:
+    return asyncio.run(worker_loop(*task))
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+async def prepare_db(rows: int) -> str:
+    db_path = os.path.join(tempfile.mkdtemp(prefix="qa_box_load_"), "load.db")
+    engine = make_engine(db_path)
+    await create_schema(engine)
+    await engine.dispose()
+    seed_questions(db_path, rows)
+    return db_path
+
+
+def run_profile(profile: str, args) -> dict:
+    db_path = asyncio.run(prepare_db(args.rows))
+    start_at = time.time() + 1.0
+    tasks = [
+        (profile, db_path, args.concurrency, args.duration, args.write_ratio, start_at, n)
+        for n in range(args.workers)
+    ]
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(args.workers) as pool:
+        results = pool.map(run_worker, tasks)
+
+    reads = [s for r in results for s in r["read"]]
+    writes = [s for r in results for s in r["write"]]
+    return {
+        "profile": profile,
+        "ops_per_sec": (len(reads) + len(writes)) / args.duration,
+        "reads_per_sec": len(reads) / args.duration,
+        "writes_per_sec": len(writes) / args.duration,
+        "locked_errors": sum(r["errors"] for r in results),
+        "read_p50_ms": statistics.median(reads) * 1000 if reads else 0.0,
+        "read_p95_ms": percentile(reads, 95) * 1000,
+        "write_p50_ms": statistics.median(writes) * 1000 if writes else 0.0,
+        "write_p95_ms": percentile(writes, 95) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite engine profile load test")
+    parser.add_argument("--workers", type=int, default=4, help="模拟的 gunicorn worker 进程数")
+    parser.add_argument("--concurrency", type=int, default=16, help="每个 worker 的并发请求数")
+    parser.add_argument("--duration", type=float, default=10.0, help="每个配置的测试时长(秒)")
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--profiles", default=",".join(PROFILES))
+    args = parser.parse_args()
+
+    header = f"{'profile':<10}{'ops/s':>10}{'reads/s':>10}{'writes/s':>10}{'locked':>8}" \
+             f"{'read p50':>10}{'read p95':>10}{'write p50':>11}{'write p95':>11}"
+    rows = [run_profile(p, args) for p in args.profiles.split(",")]
+    print(header)
+    for r in rows:
+        print(f"{r['profile']:<10}{r['ops_per_sec']:>10.1f}{r['reads_per_sec']:>10.1f}"
+              f"{r['writes_per_sec']:>10.1f}{r['locked_errors']:>8}"
+              f"{r['read_p50_ms']:>10.2f}{r['read_p95_ms']:>10.2f}"
+              f"{r['write_p50_ms']:>11.2f}{r['write_p95_ms']:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+"""
+HTTP 负载基准测试: 以固定并发对 API 施加混合负载，按端点输出吞吐量和延迟分位数
+
+用法 (在仓库根目录):
+    # 进程内 (httpx ASGITransport，不经过网络)
+    python -m backend.benchmarks.bench_http --rows 100000 --images 3 --duration 20 --output before.json
+    # 本机 gunicorn (多 worker，经过真实 HTTP)
+    python -m backend.benchmarks.bench_http --mode server --workers 2 --output after.json --compare before.json
+    # 只比较两份已有报告
+    python -m backend.benchmarks.bench_http --compare before.json after.json
+
+- 数据库按 (行数, 图片数, 随机种子) 生成一次后缓存在 --seed-cache 目录，每次运行复制一份使用
+- 负载由 --mix 指定各端点的权重；数据和请求序列都使用固定随机种子，便于复现
+- 需要 httpx (pip install httpx)
+"""
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import asyncio
+import sqlite3
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+
+DEFAULT_MIX = "list=45,get=20,batch=15,create=15,upload=5"
+ENDPOINTS = {
+    "list": "GET /api/public/questions",
+    "get": "GET /api/questions/{id}",
+    "batch": "POST /api/questions/batch",
+    "create": "POST /api/questions",
+    "upload": "POST /api/upload",
+}
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise SystemExit(f"unknown endpoint in --mix: {name} (choose from {', '.join(ENDPOINTS)})")
+        weights[name] = float(weight or 1)
+    return {k: v for k, v in weights.items() if v > 0}
+
+
+def percentile(sorted_samples: list[float], pct: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, round(len(sorted_samples) * pct / 100))
+    return sorted_samples[min(len(sorted_samples), rank) - 1]
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ---------- 数据准备 ----------
+
+def prepare_database(args, run_dir: str) -> str:
+    """生成 (或复用缓存的) 种子数据库，复制到本次运行目录"""
+    from .common import make_engine, create_schema, seed_questions
+
+    os.makedirs(args.seed_cache, exist_ok=True)
+    cached = os.path.join(args.seed_cache, f"seed_{args.rows}_{args.images}_{args.seed}.db")
+    if not os.path.exists(cached):
+        building = cached + ".building"
+        if os.path.exists(building):
+            os.remove(building)
+
+        async def build():
+            engine = make_engine(building)
+            await create_schema(engine)
+            await engine.dispose()
+
+        asyncio.run(build())
+        elapsed = seed_questions(building, args.rows, max_images=args.images, seed=args.seed)
+        os.replace(building, cached)
+        print(f"seeded {args.rows} questions in {elapsed:.1f}s -> {cached}", file=sys.stderr)
+
+    db_path = os.path.join(run_dir, "bench.db")
+    shutil.copyfile(cached, db_path)
+    return db_path
+
+
+def sample_ids(db_path: str, limit: int, seed: int) -> list[str]:
+    conn = sqlite3.connect(db_path)
+    try:
+        ids = [row[0] for row in conn.execute("SELECT id FROM questions ORDER BY rowid LIMIT ?", (limit * 5,))]
+    finally:
+        conn.close()
+    random.Random(seed).shuffle(ids)
+    return ids[:limit]
+
+
+def make_images(count: int, seed: int) -> list[bytes]:
+    """生成若干张小 PNG (随机噪点，内容互不相同)"""
+    from PIL import Image
+
+    rng = random.Random(seed)
+    images = []
+    for _ in range(count):
+        image = Image.frombytes("RGB", (96, 96), bytes(rng.getrandbits(8) for _ in range(96 * 96 * 3)))
+        buf = io.BytesIO()
+        image.save(buf, "PNG")
+        images.append(buf.getvalue())
+    return images
+
+
+# ---------- 负载 ----------
+
+class Workload:
+    def __init__(self, ids: list[str], images: list[bytes]):
+        self.ids = ids
+        self.images = images
+        self.image_urls: list[str] = []  # 已上传图片的 URL，新建问题时引用
+
+    async def run_op(self, client, op: str, rng: random.Random):
+        if op == "list":
+            # 大部分请求读第一页，其余随机翻页
+            skip = 0 if rng.random() < 0.7 else rng.randint(1, 50) * 20
+            return await client.get("/api/public/questions", params={"skip": skip, "limit": 20})
+        if op == "get":
+            return await client.get(f"/api/questions/{rng.choice(self.ids)}")
+        if op == "batch":
+            return await client.post("/api/questions/batch", json=rng.sample(self.ids, min(20, len(self.ids))))
+        if op == "create":
+            images = rng.sample(self.image_urls, min(len(self.image_urls), rng.randint(0, 2)))
+            return await client.post(
+                "/api/questions",
+                json={"content": f"<p>load test {rng.getrandbits(32)}</p>", "images": images},
+            )
+        if op == "upload":
+            # 图片池很小: 除前几次外都是重复上传 (按内容去重)
+            data = rng.choice(self.images)
+            response = await client.post("/api/upload", files={"file": ("bench.png", data, "image/png")})
+            if response.status_code == 200 and len(self.image_urls) < len(self.images):
+                url = response.json()["url"]
+                if url not in self.image_urls:
+                    self.image_urls.append(url)
+            return response
+        raise ValueError(op)
+
+
+async def drive(client, workload: Workload, weights: dict[str, float], args) -> dict[str, dict]:
+    ops, op_weights = zip(*weights.items())
+    samples = {op: [] for op in ops}
+    errors = {op: 0 for op in ops}
+    measuring = False
+    warmup_end = time.perf_counter() + args.warmup
+    deadline = warmup_end + args.duration
+
+    async def user(index: int):
+        nonlocal measuring
+        rng = random.Random(args.seed * 1000 + index)
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                return
+            op = rng.choices(ops, op_weights)[0]
+            started = time.perf_counter()
+            try:
+                response = await workload.run_op(client, op, rng)
+                failed = response.status_code >= 400
+            except Exception:
+                failed = True
+            elapsed = time.perf_counter() - started
+            if started >= warmup_end:
+                samples[op].append(elapsed)
+                errors[op] += failed
+
+    await asyncio.gather(*(user(i) for i in range(args.concurrency)))
+    return {op: {"latencies": samples[op], "errors": errors[op]} for op in ops}
+
+
+def summarize(raw: dict[str, dict], duration: float) -> dict[str, dict]:
+    result = {}
+    all_latencies = []
+    total_errors = 0
+    for op, data in raw.items():
+        latencies = sorted(data["latencies"])
+        all_latencies.extend(latencies)
+        total_errors += data["errors"]
+        result[op] = _stats(latencies, data["errors"], duration)
+        result[op]["endpoint"] = ENDPOINTS[op]
+    result["total"] = _stats(sorted(all_latencies), total_errors, duration)
+    return result
+
+
+def _stats(latencies: list[float], errors: int, duration: float) -> dict:
+    count = len(latencies)
+    return {
+        "requests": count,
+        "errors": errors,
+        "rps": round(count / duration, 2),
+        "mean_ms": round(sum(latencies) / count * 1000, 3) if count else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+async def run_inprocess(workload: Workload, weights: dict[str, float], args) -> dict:
+    import httpx
+    from ..main import app
+
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            return await drive(client, workload, weights, args)
+    finally:
+        await app.router.shutdown()
+
+
+async def run_server(workload: Workload, weights: dict[str, float], args, env: dict, run_dir: str) -> dict:
+    import httpx
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    log = open(os.path.join(run_dir, "server.log"), "w")
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "gunicorn", "backend.main:app",
+            "-k", "uvicorn.workers.UvicornWorker", "-w", str(args.workers),
+            "-b", f"127.0.0.1:{port}",
+        ],
+        env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+            for _ in range(600):
+                if server.poll() is not None:
+                    raise SystemExit(f"server exited, see {log.name}")
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.1)
+            else:
+                raise SystemExit(f"server did not start, see {log.name}")
+            return await drive(client, workload, weights, args)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        log.close()
+
+
+# ---------- 报告 ----------
+
+def print_report(report: dict):
+    print(f"{'endpoint':<10}{'requests':>10}{'errors':>8}{'req/s':>10}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}  (ms)")
+    for op, s in report["results"].items():
+        print(f"{op:<10}{s['requests']:>10}{s['errors']:>8}{s['rps']:>10.1f}"
+              f"{s['mean_ms']:>9.2f}{s['p50_ms']:>9.2f}{s['p95_ms']:>9.2f}{s['p99_ms']:>9.2f}")
+
+
+def print_comparison(old: dict, new: dict):
+    def cell(a: float, b: float) -> str:
+        change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+        return f"{a:.1f} -> {b:.1f} ({change})"
+
+    print(f"comparing {old['meta'].get('git_commit')} ({old['meta']['started_at']}) "
+          f"-> {new['meta'].get('git_commit')} ({new['meta']['started_at']})")
+    print(f"{'endpoint':<10}{'req/s':<30}{'p50 ms':<30}p99 ms")
+    for op, s in new["results"].items():
+        o = old["results"].get(op)
+        if o is None:
+            continue
+        print(f"{op:<10}{cell(o['rps'], s['rps']):<30}"
+              f"{cell(o['p50_ms'], s['p50_ms']):<30}{cell(o['p99_ms'], s['p99_ms'])}")
+
+
+def load_report(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("inprocess", "server"), default="inprocess")
+    parser.add_argument("--rows", type=int, default=10_000, help="种子问题数 (建议 10k ~ 1M)")
+    parser.add_argument("--images", type=int, default=3, help="每个问题最多引用的图片数")
+    parser.add_argument("--concurrency", type=int, default=32, help="并发虚拟用户数")
+    parser.add_argument("--duration", type=float, default=20.0, help="计入统计的时长(秒)")
+    parser.add_argument("--warmup", type=float, default=3.0, help="预热时长(秒)，不计入统计")
+    parser.add_argument("--workers", type=int, default=2, help="server 模式的 gunicorn worker 数")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="端点权重，如 list=45,get=20,...")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--log-level", default="WARNING",
+                        help="服务端日志级别；默认 WARNING，避免逐条访问日志刷屏 (INFO 可测量日志开销)")
+    parser.add_argument("--seed-cache", default=os.path.join(tempfile.gettempdir(), "qa_box_bench_seed"))
+    parser.add_argument("--output", help="将 JSON 报告写入该文件")
+    parser.add_argument("--compare", nargs="+", metavar="REPORT",
+                        help="与已有报告比较；给出两个文件时只比较不运行")
+    args = parser.parse_args()
+
+    if args.compare and len(args.compare) == 2:
+        print_comparison(load_report(args.compare[0]), load_report(args.compare[1]))
+        return
+    try:
+        import httpx  # noqa: F401
+    except ImportError:
+        raise SystemExit("bench_http requires httpx: pip install httpx")
+
+    weights = parse_mix(args.mix)
+    run_dir = tempfile.mkdtemp(prefix="qa_box_bench_http_")
+    # 必须在导入 backend 模块之前设置: 配置在导入时读取
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite+aiosqlite:///{os.path.join(run_dir, 'bench.db')}",
+        "UPLOAD_DIR": os.path.join(run_dir, "uploads"),
+        "BACKUP_DIR": os.path.join(run_dir, "backups"),
+        "BACKUP_INTERVAL_HOURS": "0",
+        "METRICS_DIR": os.path.join(run_dir, "metrics"),
+        "LOG_FILE": os.path.join(run_dir, "backend.log"),
+        "LOG_LEVEL": args.log_level,
+    }
+    os.environ.update(env)
+
+    db_path = prepare_database(args, run_dir)
+    ids = sample_ids(db_path, 10_000, args.seed)
+    images = make_images(8, args.seed)
+    workload = Workload(ids, images)
+
+    started_at = datetime.now().isoformat(timespec="seconds")
+    if args.mode == "inprocess":
+        raw = asyncio.run(run_inprocess(workload, weights, args))
+    else:
+        raw = asyncio.run(run_server(workload, weights, args, env, run_dir))
+
+    report = {
+        "meta": {
+            "started_at": started_at,
+            "git_commit": git_commit(),
+            "mode": args.mode,
+            "rows": args.rows,
+            "images": args.images,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "workers": args.workers if args.mode == "server" else 1,
+            "mix": weights,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+        },
+        "results": summarize(raw, args.duration),
+    }
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"report written to {args.output}", file=sys.stderr)
+    if args.compare:
+        print_comparison(load_report(args.compare[0]), report)
+    shutil.rmtree(run_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+访问日志中间件基准测试: 改动前 (BaseHTTPMiddleware + 同步 FileHandler + echo=True)
+vs 纯 ASGI 中间件 + QueueHandler
+
+用法 (在仓库根目录):
+    python -m backend.benchmarks.bench_logging --requests 20000 --concurrency 32
+
+在进程内直接调用 ASGI 应用 (不经过网络)，只测量中间件和日志本身的开销。
+两个端点: /health (无数据库) 和 /db (一次 SELECT，体现 SQL 日志的开销)。
+日志写入临时目录中的文件；原先输出到 stdout 的 handler 同样改为写文件，避免终端输出影响测量。
+"""
+import os
+import sys
+import time
+import queue
+import asyncio
+import logging
+import argparse
+import tempfile
+import contextlib
+from logging.handlers import QueueHandler, QueueListener
+from fastapi import FastAPI, Request
+from sqlalchemy import text
+from starlette.middleware.base import BaseHTTPMiddleware
+from ..database import create_db_engine
+from ..logging_config import LOG_FORMAT
+from ..middleware import LogMiddleware
+from .common import make_engine, create_schema
+
+SCENARIOS = ("legacy", "asgi-queue", "asgi-queue+sql")
+
+
+class LegacyLogMiddleware(BaseHTTPMiddleware):
+    """改动前的访问日志中间件"""
+
+    def __init__(self, app, access_logger: logging.Logger):
+        super().__init__(app)
+        self.logger = access_logger
+
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.time()
+        response = await call_next(request)
+        process_time = time.time() - start_time
+        log_msg = (
+            f"{request.method} {request.url.path} "
+            f"- {response.status_code} "
+            f"- {request.client.host} "
+            f"- {process_time:.4f}s"
+        )
+        if response.status_code >= 400:
+            self.logger.error(log_msg)
+        else:
+            self.logger.info(log_msg)
+        return response
+
+
+def make_handlers(log_dir: str, name: str) -> list[logging.Handler]:
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [
+        logging.FileHandler(os.path.join(log_dir, f"{name}.stdout.log")),
+        logging.FileHandler(os.path.join(log_dir, f"{name}.log")),
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+
+def build_app(scenario: str, engine, access_logger: logging.Logger) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    @app.get("/db")
+    async def db_query():
+        async with engine.connect() as conn:
+            result = await conn.execute(text("SELECT COUNT(*) FROM questions"))
+            return {"count": result.scalar()}
+
+    if scenario == "legacy":
+        app.add_middleware(LegacyLogMiddleware, access_logger=access_logger)
+    else:
+        app.add_middleware(LogMiddleware, access_logger=access_logger)
+    return app
+
+
+async def call(app, path: str):
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    sent = False
+    disconnected = asyncio.Event()
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # 与真实服务器一致: 客户端断开前不会返回
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and not message.get("more_body"):
+            disconnected.set()
+
+    await app(scope, receive, send)
+
+
+async def measure(app, path: str, requests: int, concurrency: int) -> float:
+    """返回每秒请求数"""
+    per_worker = requests // concurrency
+
+    async def worker():
+        for _ in range(per_worker):
+            await call(app, path)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))  # 预热
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return per_worker * concurrency / (time.perf_counter() - started)
+
+
+async def run_scenario(scenario: str, db_path: str, log_dir: str, args) -> dict[str, float]:
+    handlers = make_handlers(log_dir, scenario)
+    access_logger = logging.getLogger(f"bench.{scenario}")
+    access_logger.propagate = False
+    access_logger.setLevel(logging.INFO)
+    sql_logger = logging.getLogger("sqlalchemy.engine")
+    listener = None
+
+    with open(os.path.join(log_dir, f"{scenario}.echo.log"), "w") as echo_out:
+        if scenario == "legacy":
+            for handler in handlers:
+                access_logger.addHandler(handler)
+            # echo=True 在 sqlalchemy.engine 上挂同步的 stdout handler
+            with contextlib.redirect_stdout(echo_out):
+                engine = create_db_engine(f"sqlite+aiosqlite:///{db_path}", echo=True)
+        else:
+            log_queue = queue.SimpleQueue()
+            queue_handler = QueueHandler(log_queue)
+            access_logger.addHandler(queue_handler)
+            listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+            listener.start()
+            engine = create_db_engine(f"sqlite+aiosqlite:///{db_path}")
+            if scenario == "asgi-queue+sql":
+                sql_logger.addHandler(queue_handler)
+                sql_logger.setLevel(logging.INFO)
+
+        app = build_app(scenario, engine, access_logger)
+        results = {}
+        with contextlib.redirect_stdout(echo_out):
+            for path in ("/health", "/db"):
+                results[path] = await measure(app, path, args.requests, args.concurrency)
+
+    await engine.dispose()
+    if listener is not None:
+        listener.stop()
+    # echo=True 的默认 handler 挂在 sqlalchemy.engine.Engine 上
+    for logger in (access_logger, sql_logger, logging.getLogger("sqlalchemy.engine.Engine")):
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+    sql_logger.setLevel(logging.WARNING)
+    for handler in handlers:
+        handler.close()
+    return results
+
+
+async def run(args):
+    work_dir = tempfile.mkdtemp(prefix="qa_box_bench_logging_")
+    db_path = os.path.join(work_dir, "bench.db")
+    engine = make_engine(db_path)
+    await create_schema(engine)
+    await engine.dispose()
+
+    results = {}
+    for scenario in SCENARIOS:
+        results[scenario] = await run_scenario(scenario, db_path, work_dir, args)
+
+    baseline = results["legacy"]
+    print(f"{'scenario':<18}{'/health req/s':>16}{'/db req/s':>14}")
+    for scenario, result in results.items():
+        print(
+            f"{scenario:<18}"
+            f"{result['/health']:>10.0f} ({result['/health'] / baseline['/health']:.2f}x)"
+            f"{result['/db']:>8.0f} ({result['/db'] / baseline['/db']:.2f}x)"
+        )
+    print(f"logs written to {work_dir}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=10_000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
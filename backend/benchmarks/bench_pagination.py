@@ -0,0 +1,111 @@
+"""
+分页基准测试: offset 分页 vs 游标分页
+
+用法 (在仓库根目录):
+    python -m backend.benchmarks.bench_pagination --rows 1000000
+
+对公开列表和管理列表分别测量第 1 页与深页的查询耗时 (中位数)。
+游标分页的深页耗时应与第 1 页基本一致，offset 分页随页码线性增长。
+"""
+import os
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from sqlalchemy import select
+from .. import models
+from ..pagination import paginate, encode_cursor
+from .common import make_engine, make_sessionmaker, create_schema, seed_questions
+
+
+def public_stmt():
+    return (
+        select(models.Question)
+        .where(models.Question.is_answered == True)
+        .where(models.Question.is_public == True)
+    )
+
+
+def admin_stmt():
+    return select(models.Question)
+
+
+async def cursor_for_page(session, stmt, sort_column, page: int, limit: int) -> str | None:
+    """取得第 page 页 (从 1 开始) 的起始游标，即上一页最后一行 (不计时)"""
+    if page <= 1:
+        return None
+    result = await session.execute(
+        stmt.order_by(sort_column.desc(), models.Question.id.desc())
+        .offset((page - 1) * limit - 1)
+        .limit(1)
+    )
+    last = result.scalars().first()
+    if last is None:
+        return None
+    return encode_cursor(getattr(last, sort_column.key), last.id)
+
+
+async def time_query(session_factory, repeat: int, **kwargs) -> float:
+    samples = []
+    for _ in range(repeat):
+        async with session_factory() as session:
+            started = time.perf_counter()
+            await paginate(session, **kwargs)
+            samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+async def run(args):
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="qa_box_bench_"), "bench.db")
+    engine = make_engine(db_path)
+    session_factory = make_sessionmaker(engine)
+
+    if not os.path.exists(db_path) or os.path.getsize(db_path) == 0 or args.reseed:
+        await create_schema(engine)
+        print(f"Seeding {args.rows} rows into {db_path} ...")
+        elapsed = seed_questions(db_path, args.rows)
+        print(f"Seeded in {elapsed:.1f}s")
+    else:
+        await create_schema(engine)
+
+    pages = [int(p) for p in args.pages.split(",")]
+    targets = [
+        ("public", public_stmt(), models.Question.answered_at),
+        ("admin", admin_stmt(), models.Question.created_at),
+    ]
+
+    print(f"\n{'list':<8}{'page':>8}{'offset (ms)':>14}{'cursor (ms)':>14}")
+    for name, stmt, sort_column in targets:
+        for page in pages:
+            async with session_factory() as session:
+                cursor = await cursor_for_page(session, stmt, sort_column, page, args.limit)
+            if page > 1 and cursor is None:
+                continue
+            offset_ms = await time_query(
+                session_factory, args.repeat,
+                stmt=stmt, sort_column=sort_column, limit=args.limit,
+                skip=(page - 1) * args.limit,
+            ) * 1000
+            cursor_ms = await time_query(
+                session_factory, args.repeat,
+                stmt=stmt, sort_column=sort_column, limit=args.limit, cursor=cursor,
+            ) * 1000
+            print(f"{name:<8}{page:>8}{offset_ms:>14.2f}{cursor_ms:>14.2f}")
+
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offset vs cursor pagination benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--pages", default="1,10,100,1000,10000")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--db", help="复用已有的基准数据库文件")
+    parser.add_argument("--reseed", action="store_true")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
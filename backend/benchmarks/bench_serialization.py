@@ -0,0 +1,146 @@
+"""
+JSON 序列化基准测试: 100 行的管理列表页
+
+用法 (在仓库根目录):
+    python -m backend.benchmarks.bench_serialization --rows 100 --repeat 2000
+
+分三部分测量每页耗时:
+- decode: JSONType 解码 images / answer_images (标准库 json vs serialization.loads)
+- encode: response_model 校验 + 标准库 JSONResponse vs 直接从 ORM 对象构造 + serialization.dumps
+- endpoint: 在进程内调用两个等价的 FastAPI 路由 (不查询数据库)，包含路由和中间件以外的全部开销
+"""
+import json
+import time
+import random
+import asyncio
+import argparse
+from datetime import datetime, timedelta
+from typing import List
+from fastapi import FastAPI
+from pydantic import TypeAdapter
+from .. import models, schemas
+from ..serialization import HAS_ORJSON, loads, questions_json, questions_response
+
+
+def make_questions(rows: int, seed: int = 42) -> list:
+    """构造与真实数据规模相近的问题对象 (富文本内容、0~3 张图片、缩略图 srcset)"""
+    rng = random.Random(seed)
+    base = datetime(2024, 1, 1)
+    questions = []
+    for i in range(rows):
+        images = [f"/uploads/2024-01-01/{rng.getrandbits(256):064x}.png" for _ in range(rng.randint(0, 3))]
+        answered = rng.random() < 0.7
+        q = models.Question(
+            id=f"{rng.getrandbits(128):032x}",
+            content="<p>" + "这是一个问题 question text " * rng.randint(5, 30) + "</p>",
+            images=images,
+            created_at=base + timedelta(seconds=i * 37, microseconds=i),
+            is_answered=answered,
+            is_public=answered and rng.random() < 0.8,
+            answer_content="<p>" + "回答 answer " * rng.randint(5, 40) + "</p>" if answered else None,
+            answer_images=[],
+            answered_at=base + timedelta(seconds=i * 37 + 3600) if answered else None,
+        )
+        q.srcset = {
+            url: {str(w): url.replace(".png", f"_{w}.webp") for w in (320, 800)} for url in images
+        }
+        questions.append(q)
+    return questions
+
+
+def per_page(func, repeat: int) -> float:
+    """每次调用的平均耗时 (微秒)"""
+    for _ in range(max(1, repeat // 10)):
+        func()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def bench_decode(questions: list, repeat: int) -> tuple[float, float]:
+    encoded = [json.dumps(q.images) for q in questions] + [json.dumps(q.answer_images) for q in questions]
+
+    def stdlib():
+        for value in encoded:
+            json.loads(value)
+
+    def fast():
+        for value in encoded:
+            loads(value)
+
+    return per_page(stdlib, repeat), per_page(fast, repeat)
+
+
+def bench_encode(questions: list, repeat: int) -> tuple[float, float]:
+    adapter = TypeAdapter(List[schemas.QuestionOut])
+
+    def response_model():
+        # FastAPI 对 response_model 的处理: 校验 -> 转为 JSON 兼容对象 -> JSONResponse (json.dumps)
+        content = adapter.dump_python(adapter.validate_python(questions, from_attributes=True), mode="json")
+        json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+    def direct():
+        questions_json(questions)
+
+    return per_page(response_model, repeat), per_page(direct, repeat)
+
+
+async def call(app, path: str):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": b"", "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+def bench_endpoint(questions: list, repeat: int) -> tuple[float, float]:
+    app = FastAPI()
+
+    @app.get("/before", response_model=List[schemas.QuestionOut])
+    async def before():
+        return questions
+
+    @app.get("/after", response_model=List[schemas.QuestionOut])
+    async def after():
+        return questions_response(questions)
+
+    async def measure(path: str) -> float:
+        for _ in range(max(1, repeat // 10)):
+            await call(app, path)
+        started = time.perf_counter()
+        for _ in range(repeat):
+            await call(app, path)
+        return (time.perf_counter() - started) / repeat * 1e6
+
+    async def run():
+        return await measure("/before"), await measure("/after")
+
+    return asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100, help="每页行数")
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    questions = make_questions(args.rows)
+    print(f"{args.rows} rows per page, orjson {'enabled' if HAS_ORJSON else 'NOT installed (stdlib fallback)'}")
+    print(f"{'stage':<10}{'before (us)':>14}{'after (us)':>14}{'speedup':>10}")
+    for name, bench in (("decode", bench_decode), ("encode", bench_encode), ("endpoint", bench_endpoint)):
+        before, after = bench(questions, args.repeat)
+        print(f"{name:<10}{before:>14.1f}{after:>14.1f}{before / after:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+启动耗时基准测试: 导入耗时，以及 gunicorn 多 worker 冷启动到可以响应请求的时间
+
+用法 (在仓库根目录):
+    python -m backend.benchmarks.bench_startup --rows 200000 --workers 4 --repeat 3 --output before.json
+    python -m backend.benchmarks.bench_startup --rows 200000 --workers 4 --compare before.json
+
+- import: 新解释器中 import backend.main 的耗时 (取中位数)
+- first_ready: 启动 gunicorn 到 /health 第一次返回 200 的时间
+- all_ready: 到全部 worker 输出 "Application startup complete" 的时间
+- backups: 一次冷启动中执行的启动备份次数 (日志中的 "Backup created"；每次启动都使用未备份过的数据库副本)
+- 数据库复用 bench_http 的种子缓存 (--seed-cache)；需要 httpx 和 gunicorn
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import statistics
+from datetime import datetime
+
+READY_MARKER = "Application startup complete"
+BACKUP_MARKER = "Backup created"
+
+
+def measure_import(env: dict) -> float:
+    code = "import time; t = time.perf_counter(); import backend.main; print(time.perf_counter() - t)"
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_cold_start(env: dict, workers: int, run_dir: str, timeout: float = 120) -> dict:
+    """启动 gunicorn，记录第一次响应和全部 worker 就绪的时间"""
+    import httpx
+
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "gunicorn", "backend.main:app",
+            "-k", "uvicorn.workers.UvicornWorker", "-w", str(workers),
+            "-b", f"127.0.0.1:{port}", "--log-level", "info",
+        ],
+        env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+    ready_times: list[float] = []
+    output: list[str] = []
+
+    def read_output():
+        for line in server.stdout:
+            output.append(line)
+            if READY_MARKER in line:
+                ready_times.append(time.perf_counter() - started)
+
+    reader = threading.Thread(target=read_output, daemon=True)
+    reader.start()
+    first_ready = None
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=5) as client:
+            while time.perf_counter() - started < timeout:
+                if server.poll() is not None:
+                    raise SystemExit("server exited:\n" + "".join(output[-30:]))
+                if first_ready is None:
+                    try:
+                        if client.get("/health").status_code == 200:
+                            first_ready = time.perf_counter() - started
+                    except httpx.TransportError:
+                        pass
+                if first_ready is not None and len(ready_times) >= workers:
+                    # 等待启动备份完成 (可能在 worker 就绪之后于后台执行)
+                    if any(BACKUP_MARKER in line for line in output) or time.perf_counter() - started > timeout / 2:
+                        break
+                time.sleep(0.01)
+            else:
+                raise SystemExit("server did not become ready:\n" + "".join(output[-30:]))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        reader.join(timeout=5)
+    # 同一秒内的多个备份文件名相同，按日志计数
+    backups = sum(BACKUP_MARKER in line for line in output)
+    return {"first_ready": first_ready, "all_ready": max(ready_times[:workers]), "backups": backups}
+
+
+def print_report(report: dict):
+    r = report["results"]
+    print(f"import       {r['import']:.3f}s")
+    print(f"first_ready  {r['first_ready']:.3f}s")
+    print(f"all_ready    {r['all_ready']:.3f}s   ({report['meta']['workers']} workers)")
+    print(f"backups      {r['backups']:.0f} per cold start")
+
+
+def print_comparison(old: dict, new: dict):
+    print(f"comparing {old['meta'].get('git_commit')} -> {new['meta'].get('git_commit')}")
+    for key in ("import", "first_ready", "all_ready", "backups"):
+        a, b = old["results"][key], new["results"][key]
+        change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+        print(f"{key:<12} {a:>8.3f} -> {b:>8.3f} ({change})")
+
+
+def main():
+    from .bench_http import prepare_database, git_commit, load_report
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000, help="种子问题数")
+    parser.add_argument("--images", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3, help="每项测量的次数 (取中位数)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--seed-cache", default=os.path.join(tempfile.gettempdir(), "qa_box_bench_seed"))
+    parser.add_argument("--output", help="将 JSON 报告写入该文件")
+    parser.add_argument("--compare", metavar="REPORT", help="与已有报告比较")
+    args = parser.parse_args()
+
+    try:
+        import httpx  # noqa: F401
+    except ImportError:
+        raise SystemExit("bench_startup requires httpx: pip install httpx")
+
+    run_dir = tempfile.mkdtemp(prefix="qa_box_bench_startup_")
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    def make_env(name: str) -> dict:
+        base = os.path.join(run_dir, name)
+        os.makedirs(base)
+        return {
+            **os.environ,
+            "PYTHONPATH": root,
+            "DATABASE_URL": f"sqlite+aiosqlite:///{os.path.join(base, 'bench.db')}",
+            "UPLOAD_DIR": os.path.join(base, "uploads"),
+            "BACKUP_DIR": os.path.join(base, "backups"),
+            "METRICS_DIR": os.path.join(base, "metrics"),
+            "LOG_FILE": os.path.join(base, "backend.log"),
+            "LOG_LEVEL": "INFO",
+        }
+
+    # 生成种子数据库时会导入 backend 模块，配置在导入时读取
+    os.environ.update(make_env("seed"))
+    seed_args = argparse.Namespace(rows=args.rows, images=args.images, seed=args.seed, seed_cache=args.seed_cache)
+    imports, runs = [], []
+    for i in range(args.repeat):
+        env = make_env(f"run{i}")
+        db_path = prepare_database(seed_args, os.path.dirname(env["DATABASE_URL"].split(":///")[-1]))
+        imports.append(measure_import(env))
+        runs.append(measure_cold_start(env, args.workers, run_dir))
+        print(f"run {i + 1}: import {imports[-1]:.3f}s, {runs[-1]}", file=sys.stderr)
+        os.remove(db_path)
+
+    report = {
+        "meta": {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "rows": args.rows,
+            "workers": args.workers,
+            "repeat": args.repeat,
+        },
+        "results": {
+            "import": statistics.median(imports),
+            **{key: statistics.median(run[key] for run in runs) for key in ("first_ready", "all_ready", "backups")},
+        },
+    }
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"report written to {args.output}", file=sys.stderr)
+    if args.compare:
+        print_comparison(load_report(args.compare), report)
+    shutil.rmtree(run_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
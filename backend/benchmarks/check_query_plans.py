@@ -0,0 +1,98 @@
+"""
+热点查询的 EXPLAIN QUERY PLAN 检查
+
+用法 (在仓库根目录):
+    python -m backend.benchmarks.check_query_plans
+
+捕获列表接口实际发出的 SQL，逐条执行 EXPLAIN QUERY PLAN，
+断言它们命中预期的索引且不再需要临时 B-Tree 排序。
+"""
+import os
+import asyncio
+import tempfile
+from sqlalchemy import event, select
+from .. import models
+from ..pagination import paginate, encode_cursor
+from .common import make_engine, make_sessionmaker, create_schema, seed_questions
+
+# (名称, 查询构造函数, 排序列, 期望使用的索引)
+HOT_QUERIES = [
+    (
+        "public feed",
+        lambda: select(models.Question)
+        .where(models.Question.is_answered == True)
+        .where(models.Question.is_public == True),
+        models.Question.answered_at,
+        "ix_questions_public_feed",
+    ),
+    (
+        "admin list",
+        lambda: select(models.Question),
+        models.Question.created_at,
+        "ix_questions_created_at_id",
+    ),
+]
+
+
+async def capture_plans(engine, session_factory, stmt, sort_column, cursor) -> list[tuple[str, list[str]]]:
+    """执行一次分页查询，返回 [(SQL, 查询计划明细)]"""
+    captured = []
+
+    def on_execute(conn, cursor_, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", on_execute)
+    try:
+        async with session_factory() as session:
+            await paginate(session, stmt, sort_column, 20, cursor=cursor)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", on_execute)
+
+    plans = []
+    async with engine.connect() as conn:
+        for statement, parameters in captured:
+            result = await conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+            plans.append((statement, [row[-1] for row in result]))
+    return plans
+
+
+async def run(rows: int):
+    db_path = os.path.join(tempfile.mkdtemp(prefix="qa_box_plan_"), "plan.db")
+    engine = make_engine(db_path)
+    session_factory = make_sessionmaker(engine)
+    await create_schema(engine)
+    seed_questions(db_path, rows)
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql("ANALYZE")
+
+    failures = 0
+    for name, build, sort_column, index_name in HOT_QUERIES:
+        stmt = build()
+        async with session_factory() as session:
+            result = await session.execute(
+                stmt.order_by(sort_column.desc(), models.Question.id.desc()).offset(rows // 4).limit(1)
+            )
+            middle = result.scalars().first()
+        cursors = {
+            "first page": None,
+            "cursor page": encode_cursor(getattr(middle, sort_column.key), middle.id),
+            "null tail": encode_cursor(None, middle.id),
+        }
+        for label, cursor in cursors.items():
+            for statement, details in await capture_plans(engine, session_factory, stmt, sort_column, cursor):
+                plan = " | ".join(details)
+                ok = index_name in plan and "TEMP B-TREE" not in plan
+                failures += not ok
+                print(f"[{'OK' if ok else 'FAIL'}] {name} / {label}: {plan}")
+
+    await engine.dispose()
+    assert failures == 0, f"{failures} hot queries do not use their index"
+
+
+def main():
+    asyncio.run(run(rows=20_000))
+
+
+if __name__ == "__main__":
+    main()
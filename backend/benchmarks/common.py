@@ -0,0 +1,84 @@
+"""
+基准测试公共工具
+- 在临时 SQLite 文件中批量生成问题数据
+- 创建指向该文件的独立 engine / session
+"""
+import json
+import uuid
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+from ..migrations import run_migrations
+
+SQLITE_DT_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def make_engine(db_path: str, **kwargs):
+    """创建指向基准数据库文件的 async engine"""
+    return create_async_engine(f"sqlite+aiosqlite:///{db_path}", **kwargs)
+
+
+def make_sessionmaker(engine):
+    return sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+async def create_schema(engine):
+    """按生产环境的迁移流程建表和索引"""
+    await run_migrations(engine)
+
+
+def seed_questions(
+    db_path: str,
+    rows: int,
+    answered_ratio: float = 0.6,
+    public_ratio: float = 0.8,
+    max_images: int = 0,
+    batch_size: int = 50_000,
+    seed: int = 42,
+) -> float:
+    """用原生 sqlite3 批量写入问题数据，返回耗时(秒)
+
+    数据格式与 SQLAlchemy 写入的一致 (DateTime 为带微秒的字符串，JSON 为文本)。
+    """
+    rng = random.Random(seed)
+    start_time = datetime(2024, 1, 1)
+    started = time.perf_counter()
+
+    conn = sqlite3.connect(db_path)
+    # 不修改 journal_mode (它会持久化到文件中，影响被测的引擎配置)
+    conn.execute("PRAGMA synchronous=OFF")
+    sql = (
+        "INSERT INTO questions (id, content, images, created_at, is_answered, "
+        "is_public, answer_content, answer_images, answered_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    )
+    try:
+        for offset in range(0, rows, batch_size):
+            batch = []
+            for n in range(offset, min(offset + batch_size, rows)):
+                created = start_time + timedelta(seconds=n * 30 + rng.randint(0, 29))
+                answered = rng.random() < answered_ratio
+                images = [
+                    f"/uploads/2024-01-01/{uuid.UUID(int=rng.getrandbits(128))}.png"
+                    for _ in range(rng.randint(0, max_images))
+                ]
+                batch.append((
+                    str(uuid.UUID(int=rng.getrandbits(128))),
+                    f"<p>benchmark question {n}</p>",
+                    json.dumps(images),
+                    created.strftime(SQLITE_DT_FORMAT),
+                    int(answered),
+                    int(answered and rng.random() < public_ratio),
+                    f"<p>answer {n}</p>" if answered else None,
+                    json.dumps([]),
+                    (created + timedelta(hours=rng.randint(1, 72))).strftime(SQLITE_DT_FORMAT)
+                    if answered else None,
+                ))
+            conn.executemany(sql, batch)
+            conn.commit()
+    finally:
+        conn.close()
+    return time.perf_counter() - started
@@ -0,0 +1,92 @@
+"""
+管理端批量操作
+- 一次请求包含多个操作 (公开/取消公开/标记已回答/删除)，按顺序在同一事务中执行
+- 每个操作是一条集合式 UPDATE / DELETE ... RETURNING，不逐条查询和提交
+- 图片引用数在同一事务中调整；不再被引用的文件由上传回收任务在宽限期后删除
+"""
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import update, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models
+from .events import broker
+from .feed_cache import public_feed_cache
+from .upload_store import release_reference_counts
+
+MAX_BULK_IDS = 1000
+
+# 操作 -> UPDATE 的 SET 子句
+UPDATE_ACTIONS = {
+    "publish": lambda: {"is_public": True},
+    "unpublish": lambda: {"is_public": False},
+    # 公开列表按 answered_at 排序分页，标记为已回答时补齐时间
+    "mark_answered": lambda: {
+        "is_answered": True,
+        "answered_at": func.coalesce(models.Question.answered_at, datetime.utcnow()),
+    },
+}
+
+
+class TooManyBulkIds(ValueError):
+    """批量操作涉及的问题 ID 过多"""
+
+
+async def _apply_update(db: AsyncSession, action: str, ids: list[str]) -> list[tuple[str, str, dict]]:
+    result = await db.execute(
+        update(models.Question)
+        .where(models.Question.id.in_(ids))
+        .values(**UPDATE_ACTIONS[action]())
+        .returning(models.Question.id, models.Question.is_answered, models.Question.is_public)
+        .execution_options(synchronize_session=False)
+    )
+    return [
+        (qid, "updated", {"is_answered": is_answered, "is_public": is_public})
+        for qid, is_answered, is_public in result.all()
+    ]
+
+
+async def _apply_delete(db: AsyncSession, ids: list[str], released: Counter) -> list[tuple[str, str, dict]]:
+    result = await db.execute(
+        delete(models.Question)
+        .where(models.Question.id.in_(ids))
+        .returning(models.Question.id, models.Question.images, models.Question.answer_images)
+        .execution_options(synchronize_session=False)
+    )
+    events = []
+    for qid, images, answer_images in result.all():
+        # 与 question_image_urls 一致: 同一问题内重复出现只算一次引用
+        released.update(set(images or []) | set(answer_images or []))
+        events.append((qid, "deleted", {}))
+    return events
+
+
+async def apply_bulk_operations(db: AsyncSession, operations: list) -> tuple[list[dict], list[str]]:
+    """按顺序执行批量操作并提交事务
+
+    返回: (每个操作的结果, 不再被引用的文件 URL)
+    任一操作失败时整个事务回滚。
+    """
+    total = sum(len(op.ids) for op in operations)
+    if total > MAX_BULK_IDS:
+        raise TooManyBulkIds(f"At most {MAX_BULK_IDS} IDs per request")
+
+    results = []
+    events = []
+    released = Counter()
+    for op in operations:
+        ids = list(dict.fromkeys(op.ids))
+        if not ids:
+            op_events = []
+        elif op.action == "delete":
+            op_events = await _apply_delete(db, ids, released)
+        else:
+            op_events = await _apply_update(db, op.action, ids)
+        events.extend(op_events)
+        results.append({"action": op.action, "requested": len(ids), "affected": len(op_events)})
+
+    unreferenced = await release_reference_counts(db, released)
+    if events:
+        await public_feed_cache.bump(db)
+        await broker.record_many(db, events)
+    await db.commit()
+    return results, unreferenced
@@ -1,4 +1,5 @@
 import os
+from typing import Literal
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -8,6 +9,68 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 30  # 30 days for "session"
     UPLOAD_DIR: str = os.path.join(BASE_DIR, "uploads")
+    UPLOAD_MAX_SIZE_MB: int = 10  # 普通用户单张图片大小限制，Admin 不受限
+    IMAGE_VARIANT_WIDTHS: str = "320,800"  # 上传后生成的 WebP 缩略图宽度，留空表示禁用
+    IMAGE_VARIANT_QUALITY: int = 80
+    IMAGE_VARIANT_WORKERS: int = 1  # 生成缩略图的进程数
+    
+    # 上传文件存储 (见 storage.py / s3_storage.py)
+    STORAGE_BACKEND: Literal["local", "s3"] = "local"  # local: 保存在 UPLOAD_DIR；s3: S3 兼容的对象存储
+    S3_ENDPOINT_URL: str = ""  # 如 http://127.0.0.1:9000 (MinIO)、https://s3.us-east-1.amazonaws.com
+    S3_BUCKET: str = ""
+    S3_REGION: str = "us-east-1"
+    S3_ACCESS_KEY: str = ""
+    S3_SECRET_KEY: str = ""
+    S3_KEY_PREFIX: str = ""  # 对象键前缀，多个应用共用一个桶时使用
+    S3_ADDRESSING_STYLE: Literal["path", "virtual"] = "path"  # path: <endpoint>/<bucket>/<key>；virtual: <bucket>.<endpoint>/<key>
+    S3_PUBLIC_URL: str = ""  # 公开读的桶或 CDN 地址，留空时 /uploads/ 重定向到预签名 URL
+    S3_PRESIGN_EXPIRES_SECONDS: int = 3600
+    S3_MAX_CONNECTIONS: int = 20  # 每个 worker 的连接池大小
+    S3_MULTIPART_CHUNK_MB: int = 8  # 超过该大小的上传使用分片上传 (S3 要求至少 5MB)
+    S3_TIMEOUT_SECONDS: float = 30
+    
+    # SQLite 引擎配置 (每个连接建立时应用)
+    SQLITE_JOURNAL_MODE: Literal["WAL", "DELETE", "TRUNCATE", "PERSIST", "MEMORY", "OFF"] = "WAL"
+    SQLITE_SYNCHRONOUS: Literal["OFF", "NORMAL", "FULL", "EXTRA"] = "NORMAL"  # WAL 下 NORMAL 即可保证一致性
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # 遇到写锁时等待的毫秒数
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # 内存映射读取大小(字节)，0 表示禁用
+    SQLITE_CACHE_SIZE_KB: int = 16 * 1024  # 每个连接的页缓存大小(KB)
+    DB_POOL_SIZE: int = 5  # 每个 worker 常驻连接数
+    DB_MAX_OVERFLOW: int = 10  # 突发时额外允许的连接数
+    DB_POOL_TIMEOUT: int = 30  # 等待空闲连接的秒数
+    DB_READ_ONLY_POOL: bool = True  # 公开读接口使用独立的只读连接池
+    DB_READ_POOL_SIZE: int = 5
+    DB_READ_MAX_OVERFLOW: int = 20
+    
+    # 公开列表响应缓存
+    FEED_CACHE_MAX_BYTES: int = 8 * 1024 * 1024  # 每个 worker 的缓存上限(字节)
+    FEED_CACHE_GENERATION_TTL_MS: int = 1000  # 其他 worker 的写入最多延迟多久可见
+    
+    # 提问写入合并: 短时间内的多个提交在一个事务中写入 (突发流量时减少 fsync 和写锁争用)
+    QUESTION_WRITE_BATCHING: bool = False
+    QUESTION_BATCH_WINDOW_MS: int = 5  # 第一条提交后最多等待多久再写入
+    QUESTION_BATCH_MAX_ROWS: int = 100  # 攒够这么多条时立即写入
+    
+    # 问题状态推送 (SSE)
+    EVENTS_POLL_INTERVAL_MS: int = 500  # 中继轮询发件箱的间隔 (本 worker 的写入提交后立即推送)
+    EVENTS_RETENTION_HOURS: int = 24  # 发件箱事件保留时长 (断线重连补发的窗口)
+    EVENTS_KEEPALIVE_SECONDS: int = 15
+    EVENTS_RETRY_MS: int = 5000  # 客户端断线后的重连间隔
+    EVENTS_QUEUE_SIZE: int = 100  # 每个连接最多积压的事件数
+    
+    # 日志配置 (在后台线程中写出，不阻塞事件循环)
+    LOG_LEVEL: str = "INFO"
+    LOG_FILE: str = "backend.log"  # 留空表示只输出到 stdout
+    SQL_ECHO: bool = False  # 记录每条 SQL 语句，仅用于调试
+    
+    # 运行指标 (GET /metrics，Prometheus 文本格式)
+    METRICS_ENABLED: bool = True
+    METRICS_DIR: str = os.path.join(BASE_DIR, "metrics")  # 多 worker 共享的快照目录，留空表示只统计当前进程
+    METRICS_FLUSH_SECONDS: int = 5  # 写入快照的间隔，其他 worker 的数据最多延迟这么久
+    
+    # 慢查询记录 (GET {ADMIN_ROUTE_PREFIX}/slow-queries)
+    SLOW_QUERY_MS: int = 200  # 超过该耗时的语句连同 EXPLAIN QUERY PLAN 一起记录，0 表示禁用
+    SLOW_QUERY_LOG_SIZE: int = 100  # 每个 worker 保留最近多少条
     
     # Admin 配置
     ADMIN_ROUTE_PREFIX: str = "/console-x7k9m"  # 不易猜测的管理路由前缀
@@ -16,10 +79,35 @@ class Settings(BaseSettings):
     ADMIN_TOKEN_EXPIRE_DAYS: int = 7  # Admin Token 过期天数
     ADMIN_TOKEN_REFRESH_DAYS: int = 1  # 剩余多少天时自动续期
     
+    # Token 校验缓存与吊销列表
+    AUTH_TOKEN_CACHE_SIZE: int = 4096  # 每个 worker 缓存的已校验 Token 数，0 表示不缓存
+    AUTH_TOKEN_CACHE_TTL_SECONDS: int = 300  # 缓存时间上限 (同时不超过 Token 自身的过期时间)
+    AUTH_REVOCATION_TTL_MS: int = 1000  # 其他 worker 的吊销 (如 Admin 注销) 最多延迟多久生效
+    
     # 备份配置
     BACKUP_DIR: str = os.path.join(BASE_DIR, "backups")
     BACKUP_INTERVAL_HOURS: int = 24  # 自动备份间隔(小时)，0表示禁用
     BACKUP_MAX_COUNT: int = 7  # 最多保留备份数量
+    BACKUP_COMPRESSION: Literal["none", "gzip", "zstd"] = "none"  # zstd 需要安装 zstandard；压缩时需要约 2 倍数据库大小的空间
+    BACKUP_PAGES_PER_STEP: int = 1024  # 在线备份每步复制的页数，步间释放锁
+    BACKUP_STEP_SLEEP_MS: int = 5  # 每步之间的等待时间(毫秒)
+    
+    # 统计计数器由触发器维护，定期按实际数据校正 (见 question_stats.py)
+    STATS_RECONCILE_INTERVAL_HOURS: int = 24  # 0 表示禁用
+    
+    # 数据导出 / 导入 (见 transfer.py)
+    EXPORT_CHUNK_ROWS: int = 1000  # 导出时每次从数据库读取的行数
+    IMPORT_BATCH_ROWS: int = 5000  # 导入时每个事务写入的行数
+    
+    # 上传目录回收 (见 upload_gc.py)
+    UPLOAD_GC_INTERVAL_SECONDS: int = 300  # 每隔多久检查一批文件，0 表示禁用
+    UPLOAD_GC_BATCH_SIZE: int = 500  # 每轮最多检查的文件数
+    UPLOAD_GC_GRACE_HOURS: float = 24  # 上传 (或引用数降为 0) 后多久未被引用才视为孤儿文件
+    UPLOAD_GC_DRY_RUN: bool = False  # 只记录报告，不删除
+    
+    # 后台任务 leader 选举 (见 leader.py): 备份、上传回收、计数器校正只在一个 worker 中运行
+    LEADER_LOCK_FILE: str = ""  # 留空表示使用数据库文件旁边的 <数据库>.leader.lock
+    LEADER_RETRY_SECONDS: int = 30  # 非 leader 重试加锁的间隔 (leader 退出后最多这么久由其他 worker 接替)
     
     # 服务器配置
     HOST: str = "127.0.0.1"
@@ -36,9 +124,9 @@ class Settings(BaseSettings):
     @property
     def cors_origins_list(self) -> list[str]:
         return [origin.strip() for origin in self.CORS_ORIGINS.split(",") if origin.strip()]
+    
+    @property
+    def image_variant_widths_list(self) -> list[int]:
+        return sorted(int(w) for w in self.IMAGE_VARIANT_WIDTHS.split(",") if w.strip())
 
 settings = Settings()
-
-# Ensure directories exist
-os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
-os.makedirs(settings.BACKUP_DIR, exist_ok=True)
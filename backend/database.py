@@ -1,20 +1,122 @@
+import os
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from .config import settings
+from . import metrics, slow_queries
 
-# SQLite specific configuration
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=True,
-    connect_args={"check_same_thread": False}  # SQLite specific
-)
+
+def sqlite_pragmas() -> dict[str, str | int]:
+    """根据配置生成每个连接需要执行的 PRAGMA"""
+    return {
+        "journal_mode": settings.SQLITE_JOURNAL_MODE,
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+        "mmap_size": settings.SQLITE_MMAP_SIZE,
+        # 负数表示以 KB 为单位
+        "cache_size": -settings.SQLITE_CACHE_SIZE_KB,
+    }
+
+
+def read_only_pragmas() -> dict[str, str | int]:
+    """只读连接的 PRAGMA: 不修改 journal_mode，并禁止任何写入"""
+    pragmas = sqlite_pragmas()
+    pragmas.pop("journal_mode")
+    pragmas.pop("synchronous")
+    pragmas["query_only"] = "ON"
+    return pragmas
+
+
+def sqlite_file_path(url: str) -> str | None:
+    """SQLite 数据库文件的绝对路径，内存数据库或其他数据库返回 None"""
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite":
+        return None
+    if not parsed.database or parsed.database == ":memory:":
+        return None
+    return os.path.abspath(parsed.database)
+
+
+def read_only_url(url: str) -> str | None:
+    """将 SQLite 文件 URL 转换为只读 URI 模式，无法转换时返回 None"""
+    path = sqlite_file_path(url)
+    if path is None:
+        return None
+    parsed = make_url(url)
+    return parsed.set(
+        database=f"file:{path}",
+        query={**parsed.query, "mode": "ro", "uri": "true"},
+    ).render_as_string(hide_password=False)
+
+
+def create_db_engine(url: str, pragmas: dict[str, str | int] | None = None, **kwargs):
+    """创建 async engine，并在每个新连接上应用 SQLite PRAGMA
+
+    Args:
+        pragmas: 覆盖默认的 PRAGMA 配置，传入 {} 表示保持 SQLite 默认行为
+        kwargs: 透传给 create_async_engine (可覆盖连接池参数)
+    """
+    options = {
+        # SQL 日志由 SQL_ECHO 通过 sqlalchemy.engine 的日志级别控制 (见 logging_config)
+        "echo": False,
+        "connect_args": {"check_same_thread": False},  # SQLite specific
+        # aiosqlite 默认使用 NullPool，每个请求都要新建连接和线程
+        "poolclass": AsyncAdaptedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+    options.update(kwargs)
+    db_engine = create_async_engine(url, **options)
+    if settings.METRICS_ENABLED:
+        metrics.instrument_engine(db_engine.sync_engine)
+    if settings.SLOW_QUERY_MS > 0:
+        slow_queries.instrument_engine(db_engine.sync_engine)
+
+    if db_engine.dialect.name == "sqlite":
+        pragmas = sqlite_pragmas() if pragmas is None else pragmas
+
+        @event.listens_for(db_engine.sync_engine, "connect")
+        def _apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+
+    return db_engine
+
+
+engine = create_db_engine(settings.DATABASE_URL)
 
 AsyncSessionLocal = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
 
+# 公开读接口使用的只读连接池，不与提交/回答等写操作争用连接
+_read_url = read_only_url(settings.DATABASE_URL) if settings.DB_READ_ONLY_POOL else None
+if _read_url:
+    read_engine = create_db_engine(
+        _read_url,
+        pragmas=read_only_pragmas(),
+        pool_size=settings.DB_READ_POOL_SIZE,
+        max_overflow=settings.DB_READ_MAX_OVERFLOW,
+    )
+else:
+    read_engine = engine
+
+ReadSessionLocal = sessionmaker(
+    read_engine, class_=AsyncSession, expire_on_commit=False
+)
+
 Base = declarative_base()
 
 async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
+
+async def get_read_db():
+    """只读会话，用于不修改数据的公开接口"""
+    async with ReadSessionLocal() as session:
+        yield session
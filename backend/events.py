@@ -0,0 +1,234 @@
+"""
+问题状态事件推送 (Server-Sent Events)
+- 写操作在同一事务中写入 question_events 发件箱
+- 每个 worker 运行一个中继任务，按 ID 顺序读取发件箱并推送给本地订阅者；
+  本 worker 提交后立即唤醒中继，其他 worker 的事件在下一次轮询时送达
+- 断线重连时根据 Last-Event-ID 从发件箱补发错过的事件；错过太多或已被清理时发送 reset 事件
+- 客户端消费过慢、连接积压超过 EVENTS_QUEUE_SIZE 条时丢弃积压的事件并发送 reset 事件
+"""
+import json
+import time
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import event, select, insert, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+PRUNE_INTERVAL_SECONDS = 600
+
+
+class EventBroker:
+    """进程内发布/订阅，按问题 ID 分发"""
+
+    def __init__(self):
+        self._subscribers: dict[str, set[asyncio.Queue]] = {}
+        self._dropped: dict[asyncio.Queue, int] = {}  # 积压已满的连接 -> 丢弃的最大事件 ID
+        self._last_id = 0
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len({id(q) for queues in self._subscribers.values() for q in queues})
+
+    def subscribe(self, question_ids: list[str]) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+        for qid in question_ids:
+            self._subscribers.setdefault(qid, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, question_ids: list[str], queue: asyncio.Queue):
+        for qid in question_ids:
+            queues = self._subscribers.get(qid)
+            if queues is None:
+                continue
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[qid]
+        self._dropped.pop(queue, None)
+
+    def publish(self, item: dict):
+        for queue in self._subscribers.get(item["question_id"], ()):
+            try:
+                queue.put_nowait(item)
+            except asyncio.QueueFull:
+                # 客户端消费过慢，丢弃事件；该连接随后发送 reset，客户端重新获取问题状态
+                logger.warning(f"Dropping event {item['id']} for slow subscriber")
+                self._dropped[queue] = max(self._dropped.get(queue, 0), item["id"])
+
+    def take_dropped(self, queue: asyncio.Queue) -> int | None:
+        """连接有事件被丢弃时清空其积压并返回丢弃的最大事件 ID，否则返回 None"""
+        dropped = self._dropped.pop(queue, None)
+        if dropped is None:
+            return None
+        while not queue.empty():
+            dropped = max(dropped, queue.get_nowait()["id"])
+        return dropped
+
+    async def record(self, db: AsyncSession, question_id: str, kind: str, **payload):
+        """在调用方的事务中写入发件箱，提交后唤醒中继立即推送
+
+        不直接推送本地事件: 统一由中继按 ID 顺序推送，
+        保证客户端收到的事件 ID 递增，Last-Event-ID 补发不会遗漏。
+        """
+        await self.record_many(db, [(question_id, kind, payload)])
+
+    async def record_many(self, db: AsyncSession, events: list[tuple[str, str, dict]]):
+        """批量写入 (问题 ID, 事件类型, 数据)，一条 INSERT 完成"""
+        if not events:
+            return
+        await db.execute(
+            insert(models.QuestionEvent),
+            [
+                {"question_id": qid, "kind": kind, "payload": payload, "created_at": datetime.utcnow()}
+                for qid, kind, payload in events
+            ],
+        )
+        event.listen(db.sync_session, "after_commit", self._wake, once=True)
+
+    def _wake(self, session=None):
+        self._wakeup.set()
+
+    async def replay(self, db: AsyncSession, question_ids: list[str], after_id: int) -> tuple[list[dict], int | None]:
+        """补发 after_id 之后与这些问题相关的事件
+
+        返回 (事件, 重置 ID)。错过的事件超过 EVENTS_QUEUE_SIZE 条，或 after_id 之后的事件已被清理时
+        不补发，重置 ID 为发件箱当前最新的事件 ID，客户端应重新获取问题状态。
+        """
+        limit = settings.EVENTS_QUEUE_SIZE
+        result = await db.execute(
+            select(models.QuestionEvent)
+            .where(models.QuestionEvent.id > after_id)
+            .where(models.QuestionEvent.question_id.in_(question_ids))
+            .order_by(models.QuestionEvent.id)
+            .limit(limit + 1)
+        )
+        items = [_event_item(row) for row in result.scalars().all()]
+        result = await db.execute(
+            select(func.min(models.QuestionEvent.id), func.max(models.QuestionEvent.id))
+        )
+        oldest, newest = result.one()
+        pruned = oldest is not None and oldest > after_id + 1
+        if len(items) > limit or pruned:
+            return [], max(newest or 0, after_id)
+        return items, None
+
+    async def _relay_loop(self):
+        from .database import ReadSessionLocal, AsyncSessionLocal
+
+        async with ReadSessionLocal() as db:
+            result = await db.execute(select(func.max(models.QuestionEvent.id)))
+            self._last_id = result.scalar() or 0
+
+        interval = settings.EVENTS_POLL_INTERVAL_MS / 1000
+        pruned_at = time.monotonic()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self._poll(ReadSessionLocal)
+                if time.monotonic() - pruned_at > PRUNE_INTERVAL_SECONDS:
+                    await self._prune(AsyncSessionLocal)
+                    pruned_at = time.monotonic()
+            except Exception as e:
+                logger.error(f"Event relay error: {e}")
+
+    async def _poll(self, session_factory):
+        async with session_factory() as db:
+            while True:
+                result = await db.execute(
+                    select(models.QuestionEvent)
+                    .where(models.QuestionEvent.id > self._last_id)
+                    .order_by(models.QuestionEvent.id)
+                    .limit(500)
+                )
+                rows = result.scalars().all()
+                for row in rows:
+                    self._last_id = row.id
+                    self.publish(_event_item(row))
+                if len(rows) < 500:
+                    break
+
+    async def _prune(self, session_factory):
+        cutoff = datetime.utcnow() - timedelta(hours=settings.EVENTS_RETENTION_HOURS)
+        async with session_factory() as db:
+            await db.execute(delete(models.QuestionEvent).where(models.QuestionEvent.created_at < cutoff))
+            await db.commit()
+
+    def start_relay(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._relay_loop())
+
+    def stop_relay(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+
+def _event_item(row: models.QuestionEvent) -> dict:
+    return {
+        "id": row.id,
+        "question_id": row.question_id,
+        "kind": row.kind,
+        "payload": row.payload or {},
+    }
+
+
+def format_sse(item: dict) -> str:
+    data = json.dumps({"question_id": item["question_id"], **item["payload"]}, ensure_ascii=False)
+    return f"id: {item['id']}\nevent: {item['kind']}\ndata: {data}\n\n"
+
+
+def format_reset(event_id: int) -> str:
+    """错过的事件无法补发: 客户端收到后应重新获取问题状态"""
+    return f"id: {event_id}\nevent: reset\ndata: {{}}\n\n"
+
+
+async def event_stream(question_ids: list[str], last_event_id: int | None):
+    """SSE 响应体: 先补发错过的事件，再持续推送，空闲时发送心跳
+
+    先订阅再补发，补发期间提交的事件会同时出现在两边；实时事件中 ID 不大于已发送 ID 的直接丢弃
+    """
+    from .database import ReadSessionLocal
+
+    queue = broker.subscribe(question_ids)
+    try:
+        yield f"retry: {settings.EVENTS_RETRY_MS}\n\n"
+        last_sent = 0
+        if last_event_id is not None:
+            last_sent = last_event_id
+            async with ReadSessionLocal() as db:
+                items, reset_id = await broker.replay(db, question_ids, last_event_id)
+            if reset_id is not None:
+                yield format_reset(reset_id)
+                last_sent = reset_id
+            for item in items:
+                yield format_sse(item)
+                last_sent = item["id"]
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=settings.EVENTS_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            dropped = broker.take_dropped(queue)
+            if dropped is not None:
+                last_sent = max(last_sent, item["id"], dropped)
+                yield format_reset(last_sent)
+                continue
+            if item["id"] <= last_sent:
+                continue
+            last_sent = item["id"]
+            yield format_sse(item)
+    finally:
+        broker.unsubscribe(question_ids, queue)
+
+
+broker = EventBroker()
@@ -0,0 +1,104 @@
+"""
+公开列表响应缓存
+- 进程内 LRU，按序列化后的字节数限制内存占用
+- 缓存键包含代数 (generation)，回答/修改/删除/撤回问题时在同一事务中递增
+- 代数保存在数据库 generations 表中，多个 gunicorn worker 共享；
+  各 worker 最多缓存 FEED_CACHE_GENERATION_TTL_MS 毫秒后重新读取，
+  执行写操作的 worker 在提交后立即失效
+- 响应带强 ETag，客户端重复轮询时可直接返回 304
+"""
+import time
+import hashlib
+from collections import OrderedDict
+from sqlalchemy import event, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models
+from .config import settings
+
+
+class CachedResponse:
+    __slots__ = ("body", "etag", "next_cursor")
+
+    def __init__(self, body: bytes, etag: str, next_cursor: str | None):
+        self.body = body
+        self.etag = etag
+        self.next_cursor = next_cursor
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """判断 If-None-Match 请求头是否命中当前 ETag"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+class ResponseCache:
+    def __init__(self, name: str, max_bytes: int, generation_ttl: float):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.generation_ttl = generation_ttl
+        self._entries: OrderedDict[tuple, CachedResponse] = OrderedDict()
+        self._size = 0
+        self._generation: int | None = None
+        self._checked_at = 0.0
+
+    async def generation(self, db: AsyncSession) -> int:
+        """当前代数，在 TTL 内直接使用本地值，不访问数据库"""
+        now = time.monotonic()
+        if self._generation is None or now - self._checked_at > self.generation_ttl:
+            result = await db.execute(
+                select(models.Generation.value).where(models.Generation.name == self.name)
+            )
+            generation = result.scalar() or 0
+            if generation != self._generation:
+                # 旧代数的缓存不会再被命中，直接清空
+                self.clear()
+                self._generation = generation
+            self._checked_at = now
+        return self._generation
+
+    async def bump(self, db: AsyncSession):
+        """在调用方的事务中递增代数，提交后本 worker 立即重新读取"""
+        await db.execute(
+            update(models.Generation)
+            .where(models.Generation.name == self.name)
+            .values(value=models.Generation.value + 1)
+        )
+        event.listen(db.sync_session, "after_commit", self._mark_stale, once=True)
+
+    def _mark_stale(self, session=None):
+        self._checked_at = 0.0
+        self._generation = None
+
+    def get(self, key: tuple) -> CachedResponse | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: tuple, body: bytes, next_cursor: str | None = None) -> CachedResponse:
+        etag = f'"{key[0]}-{hashlib.sha1(body).hexdigest()[:20]}"'
+        entry = CachedResponse(body, etag, next_cursor)
+        if len(body) > self.max_bytes:
+            return entry
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old.body)
+        self._entries[key] = entry
+        self._size += len(body)
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted.body)
+        return entry
+
+    def clear(self):
+        self._entries.clear()
+        self._size = 0
+
+
+public_feed_cache = ResponseCache(
+    "public_feed",
+    max_bytes=settings.FEED_CACHE_MAX_BYTES,
+    generation_ttl=settings.FEED_CACHE_GENERATION_TTL_MS / 1000,
+)
@@ -0,0 +1,227 @@
+"""
+图片缩略图模块
+- 上传后在独立进程池中生成多个宽度的 WebP 缩略图，不占用事件循环
+- 缩略图保存在周文件夹下的 variants/ 子目录中；使用对象存储时先把原图下载到临时目录，
+  生成后再上传缩略图
+- 已生成的宽度记录在 uploads.variants，列表接口据此返回 srcset
+- 为旧文件补生成缩略图:
+    python -m backend.image_variants backfill
+"""
+import asyncio
+import logging
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from sqlalchemy import String, exists, or_, select, type_coerce, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from .config import settings
+from .storage import storage
+from .upload_utils import url_to_key, variant_url
+
+logger = logging.getLogger(__name__)
+
+_executor: ProcessPoolExecutor | None = None
+_pending: set[asyncio.Task] = set()
+
+
+def render_variants(src_path: str, dest_paths: dict[int, str], quality: int) -> list[int]:
+    """在子进程中执行: 生成缩略图，返回实际生成的宽度
+
+    原图宽度不超过目标宽度时跳过该尺寸；动图只保留原图。
+    """
+    from PIL import Image, ImageOps
+
+    generated = []
+    with Image.open(src_path) as image:
+        if getattr(image, "is_animated", False):
+            return generated
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        for width, dest in sorted(dest_paths.items()):
+            if image.width <= width:
+                continue
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS)
+            Path(dest).parent.mkdir(parents=True, exist_ok=True)
+            tmp = f"{dest}.tmp"
+            resized.save(tmp, "WEBP", quality=quality, method=4)
+            Path(tmp).replace(dest)
+            generated.append(width)
+    return generated
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn: 避免在带有数据库线程的进程中 fork
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_VARIANT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+async def generate_variants(url: str) -> list[int]:
+    """为一个已登记的上传文件生成缩略图，并记录到 uploads 表"""
+    from .database import AsyncSessionLocal
+    from .feed_cache import public_feed_cache
+    from . import models
+
+    widths = settings.image_variant_widths_list
+    key = url_to_key(url)
+    if not widths or key is None:
+        return []
+    variant_keys = {w: url_to_key(variant_url(url, w)) for w in widths}
+
+    try:
+        if storage.is_local:
+            generated = await _render(
+                str(storage.local_path(key)),
+                {w: str(storage.local_path(k)) for w, k in variant_keys.items()},
+            )
+        else:
+            generated = await _render_remote(key, variant_keys)
+    except Exception as e:
+        # 非图片或无法解码的文件: 只保留原图
+        logger.info(f"Skipping variants for {url}: {e}")
+        generated = []
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(models.Upload).where(models.Upload.url == url).values(variants=generated)
+        )
+        # 新上传的文件还没有被任何问题引用，不影响公开列表；
+        # 只有文件已出现在公开问题中 (如补生成缩略图) 时才需要让缓存带上新的 srcset
+        if generated and await _in_public_feed(db, url):
+            await public_feed_cache.bump(db)
+        await db.commit()
+    return generated
+
+
+async def _in_public_feed(db: AsyncSession, url: str) -> bool:
+    """文件是否被已回答的公开问题引用"""
+    from . import models, serialization
+
+    ref_count = await db.scalar(select(models.Upload.ref_count).where(models.Upload.url == url))
+    if not ref_count:
+        return False
+    # images / answer_images 以 JSON 文本保存，按带引号的 URL 匹配
+    pattern = serialization.dumps(url).decode("utf-8")
+    return bool(await db.scalar(select(exists().where(
+        models.Question.is_answered == True,
+        models.Question.is_public == True,
+        or_(
+            type_coerce(models.Question.images, String).contains(pattern, autoescape=True),
+            type_coerce(models.Question.answer_images, String).contains(pattern, autoescape=True),
+        ),
+    ))))
+
+
+async def _render(src_path: str, dest_paths: dict[int, str]) -> list[int]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_executor(), render_variants, src_path, dest_paths, settings.IMAGE_VARIANT_QUALITY,
+    )
+
+
+async def _render_remote(key: str, variant_keys: dict[int, str]) -> list[int]:
+    """对象存储: 在临时目录中生成缩略图后上传"""
+    data = await storage.get(key)
+    with tempfile.TemporaryDirectory(prefix="qa_box_variants_") as tmp:
+        src_path = Path(tmp) / "source"
+        await asyncio.to_thread(src_path.write_bytes, data)
+        del data
+        dest_paths = {w: str(Path(tmp) / f"{w}.webp") for w in variant_keys}
+        generated = await _render(str(src_path), dest_paths)
+        for width in generated:
+            content = await asyncio.to_thread(Path(dest_paths[width]).read_bytes)
+            await storage.put(variant_keys[width], content, "image/webp")
+    return generated
+
+
+def schedule_variants(url: str):
+    """后台生成缩略图，不阻塞上传请求的响应"""
+    if not settings.image_variant_widths_list:
+        return
+    task = asyncio.create_task(generate_variants(url))
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+
+
+async def attach_srcsets(db: AsyncSession, questions: list) -> list:
+    """为问题列表设置 srcset 属性 (供 QuestionOut 序列化)，一次查询完成"""
+    from . import models
+
+    urls = set()
+    for q in questions:
+        urls.update(q.images or [])
+        urls.update(q.answer_images or [])
+    urls = [u for u in urls if u.startswith("/uploads/")]
+    if not urls:
+        return questions
+
+    result = await db.execute(
+        select(models.Upload.url, models.Upload.variants)
+        .where(models.Upload.url.in_(urls))
+        .where(models.Upload.variants.is_not(None))
+    )
+    srcsets = {
+        url: {str(w): variant_url(url, w) for w in variants}
+        for url, variants in result.all()
+        if variants
+    }
+    for q in questions:
+        q.srcset = {
+            url: srcsets[url]
+            for url in (q.images or []) + (q.answer_images or [])
+            if url in srcsets
+        }
+    return questions
+
+
+async def shutdown():
+    """停止进程池 (服务关闭时调用)"""
+    global _executor
+    if _pending:
+        await asyncio.gather(*_pending, return_exceptions=True)
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def backfill(batch_size: int = 100) -> int:
+    """为尚未生成缩略图的上传文件补生成，返回处理数量"""
+    from .database import AsyncSessionLocal
+    from . import models
+
+    done = 0
+    last_url = ""
+    while True:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(models.Upload.url)
+                .where(models.Upload.variants.is_(None))
+                .where(models.Upload.url > last_url)
+                .order_by(models.Upload.url)
+                .limit(batch_size)
+            )
+            urls = list(result.scalars().all())
+        if not urls:
+            break
+        await asyncio.gather(*(generate_variants(url) for url in urls))
+        done += len(urls)
+        last_url = urls[-1]
+        logger.info(f"Generated variants for {done} uploads")
+    await shutdown()
+    return done
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] != ["backfill"]:
+        print("usage: python -m backend.image_variants backfill")
+        sys.exit(2)
+    print(f"Processed {asyncio.run(backfill())} uploads")
@@ -0,0 +1,89 @@
+"""
+后台任务的 leader 选举 (多个 gunicorn worker 共享同一个数据库)
+- 启动备份、定时备份、上传目录回收、计数器校正只需要一个 worker 执行；
+  各 worker 启动时对锁文件加非阻塞 flock，加锁成功的成为 leader 并启动这些任务
+- 锁在 worker 的整个生命周期内持有，进程退出 (包括崩溃) 时由内核释放
+- 其余 worker 每隔 LEADER_RETRY_SECONDS 秒重试: 平滑重启时新 worker 先于旧 worker 启动，
+  旧 leader 退出后由其中一个接替
+- 锁文件默认放在数据库文件旁边 (<数据库>.leader.lock)，同一数据库的所有 worker 共用
+"""
+import os
+import fcntl
+import asyncio
+import logging
+from typing import Awaitable, Callable
+from .config import settings
+from .database import sqlite_file_path
+
+logger = logging.getLogger(__name__)
+
+
+def default_lock_path() -> str:
+    if settings.LEADER_LOCK_FILE:
+        return settings.LEADER_LOCK_FILE
+    db_path = sqlite_file_path(settings.DATABASE_URL)
+    if db_path is None:
+        # 内存数据库只在当前进程内可见，按进程区分
+        return os.path.join(settings.BASE_DIR, f".leader.{os.getpid()}.lock")
+    return db_path + ".leader.lock"
+
+
+class LeaderElection:
+    def __init__(self, path: str, retry_seconds: float):
+        self.path = path
+        self.retry_seconds = retry_seconds
+        self._file = None
+        self._task = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._file is not None
+
+    def try_acquire(self) -> bool:
+        """尝试成为 leader (不阻塞)，已经是 leader 时直接返回 True"""
+        if self._file is not None:
+            return True
+        lock_file = open(self.path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+    def release(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    async def start(self, on_elected: Callable[[], Awaitable[None]]):
+        """成为 leader 时调用 on_elected；未成为 leader 时在后台定期重试"""
+        if self.try_acquire():
+            logger.info(f"Worker {os.getpid()} elected leader")
+            await on_elected()
+            return
+        if self.retry_seconds <= 0:
+            return
+
+        async def retry_loop():
+            while True:
+                await asyncio.sleep(self.retry_seconds)
+                try:
+                    if self.try_acquire():
+                        logger.info(f"Worker {os.getpid()} took over as leader")
+                        await on_elected()
+                        return
+                except Exception as e:
+                    logger.error(f"Leader election failed: {e}")
+
+        self._task = asyncio.create_task(retry_loop())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        self.release()
+
+
+leader = LeaderElection(default_lock_path(), settings.LEADER_RETRY_SECONDS)
@@ -0,0 +1,55 @@
+"""
+日志配置
+- 业务代码只向 QueueHandler 写入 (内存队列，不做 I/O)
+- QueueListener 在后台线程中把日志写到 stdout 和日志文件，事件循环不会被磁盘或终端阻塞
+- SQL 日志通过 sqlalchemy.engine 的日志级别控制 (SQL_ECHO)，同样经过队列；
+  不使用 create_engine(echo=True)，它会额外挂一个同步的 stdout handler
+"""
+import sys
+import queue
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener
+from .config import settings
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+_listener: QueueListener | None = None
+
+
+def configure_logging() -> QueueListener:
+    """为根 logger 安装队列 handler 并启动后台写日志线程 (重复调用无副作用)"""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers: list[logging.Handler] = [logging.StreamHandler(sys.stdout)]
+    if settings.LOG_FILE:
+        handlers.append(logging.FileHandler(settings.LOG_FILE))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(settings.LOG_LEVEL)
+    root.addHandler(QueueHandler(log_queue))
+    logging.getLogger("sqlalchemy.engine").setLevel(
+        logging.INFO if settings.SQL_ECHO else logging.WARNING
+    )
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """写完队列中剩余的日志并停止后台线程 (服务关闭时调用)"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
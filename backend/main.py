@@ -1,17 +1,34 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
+from fastapi.responses import RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from .main_router import router
 from .config import settings
-from .database import engine, Base
-from .middleware import LogMiddleware
+from .database import engine
+from .migrations import run_migrations
+from .middleware import LogMiddleware, MetricsMiddleware
+from .logging_config import configure_logging
+from .serialization import FastJSONResponse
 from .backup import backup_manager
+from .upload_gc import upload_gc
+from .question_stats import counter_reconciler
+from .leader import leader
+from .storage import storage, is_valid_key
+from . import image_variants
+from .events import broker
+from .write_queue import question_write_queue
+from . import metrics
+import asyncio
 import os
 
+# 在后台线程中写日志 (stdout + 日志文件)
+configure_logging()
+
 app = FastAPI(
     title="QA Box API",
     description="匿名提问箱后端服务",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse,
 )
 
 # CORS configuration
@@ -21,37 +38,83 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["X-New-Token"],  # 允许前端读取续期 Token
+    expose_headers=["X-New-Token", "X-Next-Cursor"],  # 允许前端读取续期 Token 和分页游标
 )
 
 # Unified Logging Middleware
 app.add_middleware(LogMiddleware)
 
+# 请求指标 (GET /metrics)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Mount static files - 支持子目录
-if not os.path.exists(settings.UPLOAD_DIR):
-    os.makedirs(settings.UPLOAD_DIR)
+if storage.is_local:
+    if not os.path.exists(settings.UPLOAD_DIR):
+        os.makedirs(settings.UPLOAD_DIR)
     
-app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR, html=False), name="uploads")
+    app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR, html=False), name="uploads")
+else:
+    @app.get("/uploads/{key:path}", include_in_schema=False)
+    async def uploads_redirect(key: str):
+        """对象存储: 重定向到预签名 URL (或 S3_PUBLIC_URL)，数据库中的 /uploads/ URL 保持不变"""
+        if not is_valid_key(key):
+            return Response(status_code=404)
+        # 预签名 URL 在半个有效期内不变，重定向本身也可以缓存这么久
+        max_age = settings.S3_PRESIGN_EXPIRES_SECONDS // 2
+        return RedirectResponse(
+            storage.url(key), status_code=307, headers={"Cache-Control": f"private, max-age={max_age}"}
+        )
+
 app.include_router(router, prefix="/api")
 
 
+async def start_leader_tasks():
+    """成为 leader 时调用 (启动时或其他 worker 退出后接替)"""
+    # 启动时在后台创建一次备份（仅在数据库有变化时），不推迟开始服务，并启动定时备份
+    await backup_manager.start_scheduled_backup(backup_now=True)
+    
+    # 启动上传目录回收
+    await upload_gc.start()
+    
+    # 定期校正统计计数器
+    counter_reconciler.start()
+
+
 @app.on_event("startup")
 async def startup():
-    # Create tables
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # 创建表并执行未应用的结构迁移
+    await run_migrations(engine)
+    
+    # 备份、上传回收、计数器校正只在 leader worker 中运行
+    await leader.start(start_leader_tasks)
+    
+    # 启动 SSE 事件中继 (接收其他 worker 产生的事件)
+    broker.start_relay()
     
-    # 启动时创建一次备份（仅在数据库有变化时）
-    backup_manager.create_backup(force=False)
+    # 提问写入合并
+    if settings.QUESTION_WRITE_BATCHING:
+        question_write_queue.start()
     
-    # 启动定时备份任务
-    await backup_manager.start_scheduled_backup()
+    # 定期写入指标快照，供其他 worker 汇总
+    metrics.registry.start_flush()
 
 
 @app.on_event("shutdown")
 async def shutdown():
     # 停止定时备份
     backup_manager.stop_scheduled_backup()
+    upload_gc.stop()
+    counter_reconciler.stop()
+    leader.stop()
+    # 写完队列中剩余的提问
+    await question_write_queue.stop()
+    broker.stop_relay()
+    metrics.registry.stop_flush()
+    # 停止缩略图进程池
+    await image_variants.shutdown()
+    # 关闭对象存储的连接池
+    await storage.close()
 
 
 @app.get("/")
@@ -59,6 +122,15 @@ async def root():
     return {"message": "QA Box API is running"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Prometheus 指标 (汇总所有 worker)，Nginx 只代理 /api 和 /uploads，不对外暴露"""
+    if not settings.METRICS_ENABLED:
+        return Response(status_code=404)
+    body = await asyncio.to_thread(metrics.registry.render)
+    return Response(content=body, media_type=metrics.CONTENT_TYPE)
+
+
 @app.get("/health")
 async def health_check():
     """健康检查接口"""
@@ -1,158 +1,281 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status, Response, Header
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Response, Header
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from typing import List, Optional
-import shutil
-import jwt
-import os
-from pathlib import Path
-from datetime import datetime, timedelta
-from . import models, schemas, database, config
-from .auth import get_current_admin, verify_admin_credentials, create_admin_token
-from .upload_utils import get_upload_path
+from datetime import datetime
+from . import models, schemas, database, config, metrics
+from .auth import (
+    get_current_admin, verify_admin_credentials, create_admin_token, create_question_token,
+    authenticate, is_admin_authorization, revoke_token,
+)
+from .upload_utils import save_upload_stream, UploadError, UploadTooLarge
+from .upload_store import (
+    register_upload, release_references, update_references,
+    question_image_urls, MissingUploads,
+)
+from .image_variants import schedule_variants, attach_srcsets
+from .feed_cache import public_feed_cache, etag_matches
+from .events import broker, event_stream
+from .pagination import paginate, InvalidCursor
+from .search import search_questions, InvalidSearchQuery
+from .bulk_ops import apply_bulk_operations, TooManyBulkIds
+from .question_stats import get_stats
+from .projection import parse_projection, apply_projection, wants_srcset, InvalidProjection
+from .transfer import export_statement, export_questions, import_questions, InvalidImport
+from .slow_queries import slow_query_log
+from .serialization import questions_json, questions_response
+from .write_queue import create_question as write_question
 
 router = APIRouter()
 
 # ============================================
-# 公共工具函数
+# 公共接口 (无需鉴权)
 # ============================================
-def create_jwt_token(data: dict):
-    to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=config.settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, config.settings.SECRET_KEY, algorithm=config.settings.ALGORITHM)
-    return encoded_jwt
-
-def decode_jwt_token(token: str):
-    try:
-        payload = jwt.decode(token, config.settings.SECRET_KEY, algorithms=[config.settings.ALGORITHM])
-        return payload
-    except jwt.PyJWTError:
-        return None
+# 上传接口直接读取请求体流，在 OpenAPI 文档中手动声明表单结构
+UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                    "required": ["file"],
+                }
+            }
+        },
+    }
+}
 
 
-# ============================================
-# 公共接口 (无需鉴权)
-# ============================================
-@router.post("/upload", response_model=dict)
+@router.post("/upload", response_model=dict, openapi_extra=UPLOAD_OPENAPI)
 async def upload_image(
-    file: UploadFile = File(...),
-    authorization: Optional[str] = Header(None)
+    request: Request,
+    authorization: Optional[str] = Header(None),
+    db: AsyncSession = Depends(database.get_db)
 ):
-    """上传图片 - 按周分文件夹存储
+    """上传图片 - 按周分文件夹存储，相同内容只保存一份
     
-    普通用户限制: 10MB/张
+    普通用户限制: UPLOAD_MAX_SIZE_MB (默认 10MB)/张
     Admin用户: 无限制
+    请求体流式写入存储后端，超出限制时立即中止
     """
     # Check if user is admin
-    is_admin = False
-    if authorization and authorization.startswith("Bearer "):
-        token = authorization.replace("Bearer ", "")
-        try:
-            payload = jwt.decode(token, config.settings.SECRET_KEY, algorithms=[config.settings.ALGORITHM])
-            if payload.get("role") == "admin":
-                is_admin = True
-        except jwt.PyJWTError:
-            pass
+    is_admin = await is_admin_authorization(authorization)
     
     # File size validation for non-admin users
-    MAX_SIZE = 10 * 1024 * 1024  # 10MB
-    if not is_admin:
-        # Read file size
-        file.file.seek(0, 2)  # Seek to end
-        file_size = file.file.tell()
-        file.file.seek(0)  # Reset to beginning
-        
-        if file_size > MAX_SIZE:
-            raise HTTPException(
-                status_code=413,
-                detail=f"文件大小超过限制（最大10MB），当前: {file_size / 1024 / 1024:.1f}MB"
-            )
-    
-    file_path, url_path = get_upload_path(file.filename)
+    max_size = None if is_admin else config.settings.UPLOAD_MAX_SIZE_MB * 1024 * 1024
+    try:
+        saved = await save_upload_stream(request, field_name="file", max_size=max_size)
+    except UploadTooLarge:
+        metrics.uploads.inc(result="too_large")
+        raise HTTPException(
+            status_code=413,
+            detail=f"文件大小超过限制（最大{config.settings.UPLOAD_MAX_SIZE_MB}MB）"
+        )
+    except UploadError as e:
+        metrics.uploads.inc(result="invalid")
+        raise HTTPException(status_code=400, detail=str(e))
     
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-        
+    url_path, is_new = await register_upload(db, saved)
+    metrics.upload_bytes.inc(saved["size"])
+    metrics.uploads.inc(result="new" if is_new else "duplicate")
+    if is_new:
+        schedule_variants(url_path)
     return {"url": url_path}
 
 
 @router.post("/questions", response_model=schemas.Token)
 async def create_question(question: schemas.QuestionCreate, db: AsyncSession = Depends(database.get_db)):
     """提交新问题"""
-    new_question = models.Question(**question.model_dump())
-    db.add(new_question)
-    await db.commit()
-    await db.refresh(new_question)
+    # ID 在应用内生成，写入后无需再查询；开启写入合并时与其他提交共用一个事务
+    try:
+        question_id = await write_question(db, question.content, question.images)
+    except MissingUploads:
+        raise HTTPException(status_code=400, detail="图片已失效，请重新上传")
     
     # Generate JWT for the user (to serve as ownership proof for revocation)
-    token = create_jwt_token({"sub": str(new_question.id), "type": "asker"})
+    token = create_question_token(question_id)
+    
+    return {"access_token": token, "token_type": "bearer", "question_id": question_id}
+
+
+@router.get("/questions/events")
+async def question_events(
+    ids: Optional[str] = None,
+    tokens: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None)
+):
+    """订阅问题状态变化 (Server-Sent Events)
+    
+    ids: 逗号分隔的问题 ID；tokens: 逗号分隔的提问 token (二选一或同时使用)
+    事件类型: answered / updated / deleted，data 为 JSON
+    """
+    question_ids = {qid.strip() for qid in (ids or "").split(",") if qid.strip()}
+    for token in (tokens or "").split(","):
+        if not token.strip():
+            continue
+        verified = await authenticate(token.strip(), "asker")
+        if not verified:
+            raise HTTPException(status_code=401, detail="Invalid token")
+        question_ids.add(verified.payload["sub"])
+    
+    if not question_ids:
+        raise HTTPException(status_code=400, detail="No question IDs")
+    if len(question_ids) > 100:
+        raise HTTPException(status_code=400, detail="Too many IDs")
     
-    return {"access_token": token, "token_type": "bearer", "question_id": new_question.id}
+    after_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    return StreamingResponse(
+        event_stream(sorted(question_ids), after_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/questions/{question_id}", response_model=schemas.QuestionOut)
-async def get_question(question_id: str, db: AsyncSession = Depends(database.get_db)):
+async def get_question(question_id: str, db: AsyncSession = Depends(database.get_read_db)):
     """获取单个问题详情"""
     result = await db.execute(select(models.Question).where(models.Question.id == question_id))
     question = result.scalars().first()
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
+    await attach_srcsets(db, [question])
     return question
 
 
 @router.post("/questions/revoke")
 async def revoke_question(revoke_data: schemas.RevokeRequest, db: AsyncSession = Depends(database.get_db)):
     """撤回问题 (需要提问时返回的 token)"""
-    payload = decode_jwt_token(revoke_data.token)
-    if not payload or payload.get("type") != "asker":
+    verified = await authenticate(revoke_data.token, "asker")
+    if not verified:
         raise HTTPException(status_code=401, detail="Invalid token")
-        
-    question_id = payload.get("sub")
+    
+    question_id = verified.payload.get("sub")
     result = await db.execute(select(models.Question).where(models.Question.id == question_id))
     question = result.scalars().first()
     
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
-         
+    
     if question.is_answered:
         raise HTTPException(status_code=400, detail="Cannot revoke answered question")
-
+    
+    await release_references(db, question_image_urls(question))
     await db.delete(question)
+    await public_feed_cache.bump(db)
+    await broker.record(db, question.id, "deleted")
     await db.commit()
     return {"message": "Question revoked successfully"}
 
 
 @router.get("/public/questions", response_model=List[schemas.QuestionOut])
-async def list_public_questions(skip: int = 0, limit: int = 20, db: AsyncSession = Depends(database.get_db)):
-    """获取公开的已回答问题列表"""
-    result = await db.execute(
-        select(models.Question)
-        .where(models.Question.is_answered == True)
-        .where(models.Question.is_public == True)
-        .order_by(models.Question.answered_at.desc())
-        .offset(skip)
-        .limit(limit)
-    )
-    return result.scalars().all()
+async def list_public_questions(
+    skip: int = 0,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    view: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(database.get_read_db)
+):
+    """获取公开的已回答问题列表
+    
+    传入 cursor 时使用游标分页 (忽略 skip)，下一页游标通过 X-Next-Cursor 响应头返回
+    fields (逗号分隔) 或 view=summary 时只查询和返回部分字段
+    响应按 (页码, 数量, 字段) 缓存并带 ETag，内容未变化时返回 304
+    """
+    try:
+        projection = parse_projection(fields, view)
+    except InvalidProjection as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    generation = await public_feed_cache.generation(db)
+    key = (generation, None if cursor else skip, limit, cursor, projection)
+    entry = public_feed_cache.get(key)
+    
+    if entry is None:
+        stmt = (
+            select(models.Question)
+            .where(models.Question.is_answered == True)
+            .where(models.Question.is_public == True)
+        )
+        stmt = apply_projection(stmt, projection, models.Question.answered_at)
+        try:
+            questions, next_cursor = await paginate(
+                db, stmt, models.Question.answered_at, limit, skip=skip, cursor=cursor
+            )
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        
+        if wants_srcset(projection):
+            questions = await attach_srcsets(db, questions)
+        body = questions_json(questions, fields=projection)
+        entry = public_feed_cache.put(key, body, next_cursor)
+    
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if entry.next_cursor:
+        headers["X-Next-Cursor"] = entry.next_cursor
+    if etag_matches(if_none_match, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+@router.get("/public/questions/search", response_model=List[schemas.QuestionSearchHit])
+async def search_public_questions(
+    q: str,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    response: Response = None,
+    db: AsyncSession = Depends(database.get_read_db)
+):
+    """全文检索已公开的问答，按相关度排序
+    
+    q: 检索词，多个词用空格分隔 (同时包含)；下一页游标通过 X-Next-Cursor 响应头返回
+    """
+    try:
+        questions, next_cursor = await search_questions(db, q, limit, cursor=cursor, public_only=True)
+    except InvalidSearchQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return questions_response(await attach_srcsets(db, questions), response.headers, search=True)
 
 
 @router.post("/questions/batch", response_model=List[schemas.QuestionOut])
-async def get_questions_batch(question_ids: List[str], db: AsyncSession = Depends(database.get_db)):
+async def get_questions_batch(
+    question_ids: List[str],
+    fields: Optional[str] = None,
+    view: Optional[str] = None,
+    db: AsyncSession = Depends(database.get_read_db)
+):
     """批量获取问题状态 (用于前端刷新我的问题列表)
     
+    只需要状态时可传 fields=is_answered,answered_at 或 view=summary
     注意: 已删除的问题不会在结果中返回，前端需要处理这种情况
     """
     if len(question_ids) > 100:
         raise HTTPException(status_code=400, detail="Too many IDs")
-         
-    result = await db.execute(
+    try:
+        projection = parse_projection(fields, view)
+    except InvalidProjection as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    stmt = (
         select(models.Question)
         .where(models.Question.id.in_(question_ids))
         .order_by(models.Question.created_at.desc())
     )
+    result = await db.execute(apply_projection(stmt, projection))
     # 返回找到的问题，不存在的ID会被自动忽略
-    return result.scalars().all()
+    questions = result.scalars().all()
+    if wants_srcset(projection):
+        questions = await attach_srcsets(db, questions)
+    return questions_response(questions, fields=projection)
 
 
 # ============================================
@@ -174,6 +297,17 @@ async def admin_login(credentials: schemas.AdminLogin):
     return token_data
 
 
+@router.post(f"{ADMIN_PREFIX}/logout")
+async def admin_logout(
+    db: AsyncSession = Depends(database.get_db),
+    admin: dict = Depends(get_current_admin)
+):
+    """注销: 吊销当前 Token (及其续期签发的新 Token)，所有 worker 上随即失效"""
+    await revoke_token(db, admin["token"])
+    await db.commit()
+    return {"message": "Logged out"}
+
+
 @router.post(f"{ADMIN_PREFIX}/verify")
 async def verify_token(admin: dict = Depends(get_current_admin)):
     """验证 Token 有效性，并返回续期后的新 Token (如果需要)"""
@@ -187,26 +321,178 @@ async def verify_token(admin: dict = Depends(get_current_admin)):
 # ============================================
 # Admin 管理接口 (需要鉴权)
 # ============================================
+@router.get(f"{ADMIN_PREFIX}/stats", response_model=schemas.QuestionStats)
+async def admin_stats(
+    response: Response = None,
+    db: AsyncSession = Depends(database.get_read_db),
+    admin: dict = Depends(get_current_admin)
+):
+    """[Admin] 问题总数及已回答/待回答/公开/私密数量
+    
+    读取触发器维护的计数器，耗时与问题总数无关
+    """
+    if admin.get("new_token"):
+        response.headers["X-New-Token"] = admin["new_token"]
+    
+    return await get_stats(db)
+
+
 @router.get(f"{ADMIN_PREFIX}/questions", response_model=List[schemas.QuestionOut])
 async def admin_list_questions(
     skip: int = 0, 
     limit: int = 100, 
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    view: Optional[str] = None,
     response: Response = None,
     db: AsyncSession = Depends(database.get_db),
     admin: dict = Depends(get_current_admin)
 ):
-    """[Admin] 获取所有问题列表"""
+    """[Admin] 获取所有问题列表
+    
+    传入 cursor 时使用游标分页 (忽略 skip)，下一页游标通过 X-Next-Cursor 响应头返回
+    fields (逗号分隔) 或 view=summary 时只查询和返回部分字段
+    """
     # 如果有新 Token，通过响应头返回
     if admin.get("new_token"):
         response.headers["X-New-Token"] = admin["new_token"]
     
-    result = await db.execute(
-        select(models.Question)
-        .order_by(models.Question.created_at.desc())
-        .offset(skip)
-        .limit(limit)
+    try:
+        projection = parse_projection(fields, view)
+    except InvalidProjection as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    stmt = apply_projection(select(models.Question), projection, models.Question.created_at)
+    try:
+        questions, next_cursor = await paginate(
+            db, stmt, models.Question.created_at, limit,
+            skip=skip, cursor=cursor
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if wants_srcset(projection):
+        questions = await attach_srcsets(db, questions)
+    return questions_response(questions, response.headers, fields=projection)
+
+
+@router.get(f"{ADMIN_PREFIX}/questions/search", response_model=List[schemas.QuestionSearchHit])
+async def admin_search_questions(
+    q: str,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    response: Response = None,
+    db: AsyncSession = Depends(database.get_db),
+    admin: dict = Depends(get_current_admin)
+):
+    """[Admin] 全文检索所有问题和回答，按相关度排序
+    
+    下一页游标通过 X-Next-Cursor 响应头返回
+    """
+    if admin.get("new_token"):
+        response.headers["X-New-Token"] = admin["new_token"]
+    
+    try:
+        questions, next_cursor = await search_questions(db, q, limit, cursor=cursor)
+    except InvalidSearchQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return questions_response(await attach_srcsets(db, questions), response.headers, search=True)
+
+
+@router.post(f"{ADMIN_PREFIX}/questions/bulk", response_model=schemas.BulkResponse)
+async def admin_bulk_operations(
+    bulk: schemas.BulkRequest,
+    response: Response = None,
+    db: AsyncSession = Depends(database.get_db),
+    admin: dict = Depends(get_current_admin)
+):
+    """[Admin] 批量公开/取消公开/标记已回答/删除问题
+    
+    所有操作在同一事务中执行，任一失败则全部回滚；
+    不再被引用的图片文件由上传回收任务在宽限期后删除
+    """
+    if admin.get("new_token"):
+        response.headers["X-New-Token"] = admin["new_token"]
+    
+    try:
+        results, unreferenced = await apply_bulk_operations(db, bulk.operations)
+    except TooManyBulkIds as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {"results": results, "pending_image_deletions": len(unreferenced)}
+
+
+# 导入接口直接读取请求体流，在 OpenAPI 文档中手动声明
+IMPORT_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/x-ndjson": {"schema": {"type": "string", "format": "binary"}},
+            "application/gzip": {"schema": {"type": "string", "format": "binary"}},
+        },
+    }
+}
+
+
+@router.get(f"{ADMIN_PREFIX}/questions/export")
+async def admin_export_questions(
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    answered_from: Optional[datetime] = None,
+    answered_to: Optional[datetime] = None,
+    compress: bool = False,
+    admin: dict = Depends(get_current_admin)
+):
+    """[Admin] 导出问题为 NDJSON (每行一个问题，按创建时间排序)
+    
+    时间范围为左闭右开，可组合使用；compress=true 时输出 gzip
+    边查询边输出，服务端内存占用与导出行数无关
+    """
+    headers = {}
+    if admin.get("new_token"):
+        headers["X-New-Token"] = admin["new_token"]
+    
+    stmt = export_statement(created_from, created_to, answered_from, answered_to)
+    filename = f"questions_{datetime.utcnow():%Y%m%d_%H%M%S}.ndjson"
+    if compress:
+        filename += ".gz"
+    headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return StreamingResponse(
+        export_questions(stmt, compress),
+        media_type="application/gzip" if compress else "application/x-ndjson",
+        headers=headers,
     )
-    return result.scalars().all()
+
+
+@router.post(
+    f"{ADMIN_PREFIX}/questions/import",
+    response_model=schemas.ImportResponse,
+    openapi_extra=IMPORT_OPENAPI,
+)
+async def admin_import_questions(
+    request: Request,
+    response: Response = None,
+    admin: dict = Depends(get_current_admin)
+):
+    """[Admin] 从 NDJSON 导入问题 (导出接口的格式，可为 gzip)
+    
+    每 IMPORT_BATCH_ROWS 行在一个事务中写入，ID 已存在的问题跳过；
+    格式错误的行跳过并在 errors 中列出
+    """
+    if admin.get("new_token"):
+        response.headers["X-New-Token"] = admin["new_token"]
+    
+    try:
+        return await import_questions(request.stream())
+    except InvalidImport as e:
+        raise HTTPException(status_code=400, detail={"message": str(e), **e.summary})
 
 
 @router.put(f"{ADMIN_PREFIX}/questions/{{question_id}}")
@@ -230,7 +516,15 @@ async def admin_update_question(
         question.is_public = update_data.is_public
     if update_data.is_answered is not None:
         question.is_answered = update_data.is_answered
-        
+        # 公开列表按 answered_at 排序分页，标记为已回答时补齐时间
+        if question.is_answered and question.answered_at is None:
+            question.answered_at = datetime.utcnow()
+    
+    await public_feed_cache.bump(db)
+    await broker.record(
+        db, question.id, "updated",
+        is_answered=question.is_answered, is_public=question.is_public
+    )
     await db.commit()
     await db.refresh(question)
     return question
@@ -252,12 +546,19 @@ async def admin_answer_question(
     question = result.scalars().first()
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
-        
+    
+    old_urls = question_image_urls(question)
     question.answer_content = answer.answer_content
     question.answer_images = answer.answer_images
     question.is_answered = True
     question.is_public = answer.is_public
     question.answered_at = datetime.utcnow()
+    try:
+        await update_references(db, old_urls, question_image_urls(question))
+    except MissingUploads:
+        raise HTTPException(status_code=400, detail="图片已失效，请重新上传")
+    await public_feed_cache.bump(db)
+    await broker.record(db, question.id, "answered", is_answered=True, is_public=question.is_public)
     
     await db.commit()
     await db.refresh(question)
@@ -271,7 +572,7 @@ async def admin_delete_question(
     db: AsyncSession = Depends(database.get_db),
     admin: dict = Depends(get_current_admin)
 ):
-    """[Admin] 删除问题，同时删除关联的图片文件"""
+    """[Admin] 删除问题，不再被引用的图片文件由上传回收任务在宽限期后删除"""
     if admin.get("new_token"):
         response.headers["X-New-Token"] = admin["new_token"]
     
@@ -280,36 +581,45 @@ async def admin_delete_question(
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
     
-    # 收集所有需要删除的图片URL
-    image_urls = []
-    if question.images:
-        image_urls.extend(question.images)
-    if question.answer_images:
-        image_urls.extend(question.answer_images)
-    
-    # 删除本地图片文件
-    deleted_count = 0
-    for url in image_urls:
-        # URL格式: /uploads/YYYY-MM-DD/filename.ext
-        if url.startswith("/uploads/"):
-            # 构建完整文件路径
-            relative_path = url.lstrip("/")  # 去掉开头的 /
-            file_path = Path(config.settings.UPLOAD_DIR).parent / relative_path
-            
-            # 删除文件
-            try:
-                if file_path.exists() and file_path.is_file():
-                    file_path.unlink()
-                    deleted_count += 1
-            except Exception as e:
-                # 记录错误但不阻止删除操作
-                print(f"Failed to delete image file {file_path}: {e}")
+    # 释放图片引用 (不再被任何问题引用的文件留给上传回收任务)
+    unreferenced = await release_references(db, question_image_urls(question))
     
     # 删除数据库记录
     await db.delete(question)
+    await public_feed_cache.bump(db)
+    await broker.record(db, question.id, "deleted")
     await db.commit()
     
     return {
         "message": "Question deleted successfully",
-        "deleted_images": deleted_count
+        "pending_image_deletions": len(unreferenced)
     }
+
+
+@router.get(f"{ADMIN_PREFIX}/slow-queries", response_model=List[schemas.SlowQuery])
+async def admin_slow_queries(
+    limit: int = 50,
+    response: Response = None,
+    admin: dict = Depends(get_current_admin)
+):
+    """[Admin] 最近的慢查询 (新的在前)，包含参数和 EXPLAIN QUERY PLAN
+    
+    每个 worker 各自记录，返回的是响应本请求的 worker 的记录 (见 pid 字段)
+    """
+    if admin.get("new_token"):
+        response.headers["X-New-Token"] = admin["new_token"]
+    
+    return slow_query_log.entries(max(1, limit))
+
+
+@router.delete(f"{ADMIN_PREFIX}/slow-queries")
+async def admin_clear_slow_queries(
+    response: Response = None,
+    admin: dict = Depends(get_current_admin)
+):
+    """[Admin] 清空当前 worker 的慢查询记录"""
+    if admin.get("new_token"):
+        response.headers["X-New-Token"] = admin["new_token"]
+    
+    slow_query_log.clear()
+    return {"message": "Slow query log cleared"}
@@ -0,0 +1,345 @@
+"""
+运行指标 (Prometheus 文本格式，GET /metrics)
+- 每个 worker 在内存中累计计数器、直方图和仪表值，热路径上只做字典更新
+- 每 METRICS_FLUSH_SECONDS 秒将快照写入 METRICS_DIR/worker_<pid>_<随机串>.json
+- /metrics 由任意 worker 响应: 合并本进程的实时值和其他 worker 的快照
+  - 计数器和直方图: 求和；已退出 worker 的快照保留，合计值保持单调递增
+  - 仪表值: 按 mode 求和 (只统计最近仍在刷新的 worker) 或取最大值
+- 已退出 worker 的快照会被合并进 archive.json，目录中的文件数不会无限增长
+"""
+import os
+import json
+import time
+import uuid
+import fcntl
+import asyncio
+import logging
+import threading
+from pathlib import Path
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+BACKUP_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+ARCHIVE_NAME = "archive.json"
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, registry: "Registry", name: str, help_text: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.values: dict[tuple[str, ...], object] = {}
+        self._lock = registry.lock
+        registry.register(self)
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, mode: str = "sum", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.mode = mode  # sum: 各 worker 求和；max: 取最大值
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self.values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: tuple[float, ...] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = buckets
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            # [各桶计数 (非累计)..., +Inf 桶计数, 总和]
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            else:
+                state[len(self.buckets)] += 1
+            state[-1] += value
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics: dict[str, Metric] = {}
+        self._worker_id = f"worker_{os.getpid()}_{uuid.uuid4().hex[:8]}"
+        self._task: asyncio.Task | None = None
+
+    def register(self, metric: Metric):
+        self.metrics[metric.name] = metric
+
+    # ---------- 快照 ----------
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                name: [[list(key), value if not isinstance(value, list) else list(value)]
+                       for key, value in metric.values.items()]
+                for name, metric in self.metrics.items()
+            }
+
+    def _merge(self, totals: dict, snapshot: dict, include_live_gauges: bool):
+        for name, samples in snapshot.items():
+            metric = self.metrics.get(name)
+            if metric is None:
+                continue
+            target = totals.setdefault(name, {})
+            for key, value in samples:
+                key = tuple(key)
+                if isinstance(metric, Histogram):
+                    if len(value) != len(metric.buckets) + 2:
+                        continue  # 桶定义已变化的旧快照
+                    current = target.get(key) or [0] * len(value)
+                    target[key] = [a + b for a, b in zip(current, value)]
+                elif isinstance(metric, Gauge) and metric.mode == "max":
+                    target[key] = max(target.get(key, value), value)
+                elif isinstance(metric, Gauge):
+                    if include_live_gauges:
+                        target[key] = target.get(key, 0) + value
+                else:
+                    target[key] = target.get(key, 0) + value
+
+    @property
+    def directory(self) -> Path | None:
+        return Path(settings.METRICS_DIR) if settings.METRICS_DIR else None
+
+    def flush(self):
+        """写入本 worker 的快照 (原子替换)，并归档已退出 worker 的快照"""
+        directory = self.directory
+        if directory is None:
+            return
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{self._worker_id}.json"
+        tmp = directory / f".{self._worker_id}.tmp"
+        tmp.write_text(json.dumps({"pid": os.getpid(), "metrics": self.snapshot()}))
+        os.replace(tmp, path)
+        self._compact(directory)
+
+    def _compact(self, directory: Path):
+        stale_after = max(60, settings.METRICS_FLUSH_SECONDS * 10)
+        now = time.time()
+        stale = []
+        for path in directory.glob("worker_*.json"):
+            if path.stem == self._worker_id:
+                continue
+            try:
+                if now - path.stat().st_mtime < stale_after:
+                    continue
+                data = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            if not _pid_alive(data.get("pid")):
+                stale.append((path, data.get("metrics", {})))
+        if not stale:
+            return
+
+        with open(directory / ".lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            archive_path = directory / ARCHIVE_NAME
+            totals: dict = {}
+            if archive_path.exists():
+                self._merge(totals, json.loads(archive_path.read_text()), include_live_gauges=False)
+            for path, snapshot in stale:
+                if path.exists():
+                    self._merge(totals, snapshot, include_live_gauges=False)
+            tmp = directory / ".archive.tmp"
+            tmp.write_text(json.dumps(_to_snapshot(totals)))
+            os.replace(tmp, archive_path)
+            for path, _ in stale:
+                path.unlink(missing_ok=True)
+
+    def collect(self) -> dict:
+        """合并本进程实时值、其他 worker 快照和归档"""
+        totals: dict = {}
+        self._merge(totals, self.snapshot(), include_live_gauges=True)
+        directory = self.directory
+        if directory is None or not directory.exists():
+            return totals
+
+        live_window = max(settings.METRICS_FLUSH_SECONDS * 3, 1)
+        now = time.time()
+        for path in directory.glob("*.json"):
+            if path.stem == self._worker_id:
+                continue
+            try:
+                mtime = path.stat().st_mtime
+                data = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue  # 正在被归档或替换
+            if path.name == ARCHIVE_NAME:
+                self._merge(totals, data, include_live_gauges=False)
+            else:
+                self._merge(totals, data.get("metrics", {}), include_live_gauges=now - mtime < live_window)
+        return totals
+
+    # ---------- 输出 ----------
+
+    def render(self) -> str:
+        totals = self.collect()
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for key, value in sorted(totals.get(name, {}).items()):
+                labels = dict(zip(metric.labelnames, key))
+                if isinstance(metric, Histogram):
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets + (float("inf"),), value):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{name}_bucket{_labels({**labels, 'le': le})} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(labels)} {value[-1]}")
+                    lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+                else:
+                    lines.append(f"{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    # ---------- 后台刷新 ----------
+
+    def start_flush(self):
+        if self.directory is None or self._task is not None:
+            return
+
+        async def flush_loop():
+            while True:
+                await asyncio.sleep(settings.METRICS_FLUSH_SECONDS)
+                try:
+                    await asyncio.to_thread(self.flush)
+                except Exception as e:
+                    logger.error(f"Failed to flush metrics: {e}")
+
+        self._task = asyncio.create_task(flush_loop())
+
+    def stop_flush(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Failed to flush metrics: {e}")
+
+
+def _pid_alive(pid) -> bool:
+    if not isinstance(pid, int):
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _to_snapshot(totals: dict) -> dict:
+    return {name: [[list(key), value] for key, value in samples.items()] for name, samples in totals.items()}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def statement_type(statement: str) -> str:
+    """SQL 语句类型 (用作标签，取值有限)"""
+    keyword = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else ""
+    return keyword if keyword in ("select", "insert", "update", "delete", "pragma", "begin", "create") else "other"
+
+
+def instrument_engine(sync_engine):
+    """通过 SQLAlchemy 引擎事件统计每条 SQL 的执行耗时"""
+    from sqlalchemy import event
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_metrics_started", None)
+        if started is not None:
+            db_query_duration.observe(time.perf_counter() - started, statement=statement_type(statement))
+
+
+registry = Registry()
+
+http_requests = Counter(
+    registry, "qa_box_http_requests_total", "HTTP requests by route template and status",
+    ("method", "route", "status"),
+)
+http_duration = Histogram(
+    registry, "qa_box_http_request_duration_seconds", "HTTP request latency until the response body is sent",
+    ("method", "route"), buckets=LATENCY_BUCKETS,
+)
+http_in_flight = Gauge(registry, "qa_box_http_requests_in_flight", "HTTP requests currently being served")
+upload_bytes = Counter(registry, "qa_box_upload_bytes_total", "Bytes received by the image upload endpoint")
+uploads = Counter(registry, "qa_box_uploads_total", "Image uploads by result", ("result",))
+db_query_duration = Histogram(
+    registry, "qa_box_db_query_duration_seconds", "SQL statement execution time by statement type",
+    ("statement",), buckets=DB_BUCKETS,
+)
+question_batch_size = Histogram(
+    registry, "qa_box_question_batch_size", "Questions written per group commit (QUESTION_WRITE_BATCHING)",
+    buckets=BATCH_SIZE_BUCKETS,
+)
+question_batch_duration = Histogram(
+    registry, "qa_box_question_batch_duration_seconds", "Time to insert and commit one question batch",
+    buckets=DB_BUCKETS,
+)
+upload_gc_deleted_files = Counter(
+    registry, "qa_box_upload_gc_deleted_files_total", "Orphaned upload files deleted by the upload GC",
+)
+upload_gc_deleted_bytes = Counter(
+    registry, "qa_box_upload_gc_deleted_bytes_total", "Bytes freed by the upload GC",
+)
+backup_duration = Histogram(
+    registry, "qa_box_backup_duration_seconds", "Database backup duration by result",
+    ("result",), buckets=BACKUP_BUCKETS,
+)
+backup_last_success = Gauge(
+    registry, "qa_box_backup_last_success_timestamp_seconds", "Unix time of the last successful backup",
+    mode="max",
+)
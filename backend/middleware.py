@@ -1,42 +1,94 @@
 import time
 import logging
-import sys
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from . import metrics
 
-# Configure logger
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler("backend.log")
-    ]
-)
+# 日志 handler 由 logging_config.configure_logging() 在 main.py 中安装
 logger = logging.getLogger("qa_box")
 
-class LogMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
+class LogMiddleware:
+    """访问日志 (纯 ASGI 中间件)
+    
+    直接包装 send 读取响应状态码，不像 BaseHTTPMiddleware 那样为每个请求
+    创建任务和内存流；耗时统计到响应体发送完毕为止。
+    """
+    def __init__(self, app: ASGIApp, access_logger: logging.Logger | None = None):
+        self.app = app
+        self.logger = access_logger or logger
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        # Process the request
-        response = await call_next(request)
+        start_time = time.perf_counter()
+        status_code = 500  # 响应开始前抛出异常时按 500 记录
         
-        process_time = time.time() - start_time
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
         
-        # Unified log format
-        # Time | Method | Path | Status | Client IP | Duration
-        log_msg = (
-            f"{request.method} {request.url.path} "
-            f"- {response.status_code} "
-            f"- {request.client.host} "
-            f"- {process_time:.4f}s"
-        )
-        
-        if response.status_code >= 400:
-            logger.error(log_msg)
-        else:
-            logger.info(log_msg)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            process_time = time.perf_counter() - start_time
+            client = scope.get("client")
+            
+            # Unified log format
+            # Time | Method | Path | Status | Client IP | Duration
+            log_msg = (
+                f"{scope['method']} {scope['path']} "
+                f"- {status_code} "
+                f"- {client[0] if client else '-'} "
+                f"- {process_time:.4f}s"
+            )
             
-        return response
+            if status_code >= 400:
+                self.logger.error(log_msg)
+            else:
+                self.logger.info(log_msg)
+
+
+KNOWN_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+def route_label(scope: Scope, root_path: str) -> str:
+    """路由模板 (如 /api/questions/{question_id})，避免按实际路径产生大量标签"""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # 挂载的子应用 (如 /uploads 静态文件) 只记录挂载点
+    if scope.get("root_path", "") != root_path:
+        return f"{scope['root_path']}/*"
+    return "<unmatched>"
+
+class MetricsMiddleware:
+    """按路由统计请求数、延迟和并发请求数 (纯 ASGI 中间件)"""
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start_time = time.perf_counter()
+        status_code = 500
+        root_path = scope.get("root_path", "")
+        
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        metrics.http_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.http_in_flight.dec()
+            method = scope["method"] if scope["method"] in KNOWN_METHODS else "OTHER"
+            route = route_label(scope, root_path)
+            metrics.http_requests.inc(method=method, route=route, status=status_code)
+            metrics.http_duration.observe(time.perf_counter() - start_time, method=method, route=route)
@@ -0,0 +1,242 @@
+"""
+数据库结构迁移模块
+- 使用 SQLite 的 PRAGMA user_version 记录当前结构版本
+- 启动时按顺序执行尚未应用的迁移
+- 迁移在写锁内执行，多个 worker 同时启动时不会重复执行
+- 每个迁移仍应尽量可重复执行 (例如手动修改过结构的数据库)
+- 表和索引使用固定的 CREATE TABLE / CREATE INDEX 语句 (与引入该迁移时的模型一致)，不从模型读取:
+  迁移的效果不随模型的后续修改而变化，新库与逐步升级的旧库得到相同的结构
+"""
+import logging
+from typing import Callable
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+# (版本号, 描述, 迁移函数)，版本号必须递增
+MIGRATIONS: list[tuple[int, str, Callable[[Connection], None]]] = []
+
+
+def migration(version: int, description: str):
+    """注册一个迁移步骤"""
+    def decorator(func: Callable[[Connection], None]):
+        if MIGRATIONS and version <= MIGRATIONS[-1][0]:
+            raise ValueError(f"Migration version {version} must be greater than {MIGRATIONS[-1][0]}")
+        MIGRATIONS.append((version, description, func))
+        return func
+    return decorator
+
+
+@migration(1, "baseline schema")
+def _baseline_schema(conn: Connection):
+    # 引入迁移之前由 create_all 创建的两张表，已存在时跳过
+    conn.exec_driver_sql(
+        """
+        CREATE TABLE IF NOT EXISTS questions (
+            id VARCHAR(36) NOT NULL,
+            content TEXT NOT NULL,
+            images VARCHAR,
+            created_at DATETIME,
+            is_answered BOOLEAN,
+            is_public BOOLEAN,
+            answer_content TEXT,
+            answer_images VARCHAR,
+            answered_at DATETIME,
+            PRIMARY KEY (id)
+        )
+        """
+    )
+    conn.exec_driver_sql(
+        """
+        CREATE TABLE IF NOT EXISTS admin_users (
+            id VARCHAR(36) NOT NULL,
+            username VARCHAR NOT NULL,
+            hashed_password VARCHAR NOT NULL,
+            PRIMARY KEY (id),
+            UNIQUE (username)
+        )
+        """
+    )
+
+
+@migration(2, "question list indexes")
+def _question_list_indexes(conn: Connection):
+    # 公开列表: WHERE is_answered AND is_public ORDER BY answered_at DESC, id DESC
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_questions_public_feed ON questions (answered_at, id) "
+        "WHERE is_answered = 1 AND is_public = 1"
+    )
+    # 管理列表: ORDER BY created_at DESC, id DESC
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_questions_created_at_id ON questions (created_at, id)")
+
+
+@migration(3, "content-addressed upload registry")
+def _upload_registry(conn: Connection):
+    # variants 列由迁移 4 添加
+    conn.exec_driver_sql(
+        """
+        CREATE TABLE IF NOT EXISTS uploads (
+            url VARCHAR NOT NULL,
+            sha256 VARCHAR(64),
+            size INTEGER,
+            ref_count INTEGER NOT NULL,
+            created_at DATETIME,
+            PRIMARY KEY (url),
+            UNIQUE (sha256)
+        )
+        """
+    )
+    # 为已有问题引用的旧文件登记引用数 (每个问题内去重)
+    conn.exec_driver_sql(
+        """
+        INSERT OR IGNORE INTO uploads (url, ref_count, created_at)
+        SELECT url, COUNT(*), CURRENT_TIMESTAMP FROM (
+            SELECT DISTINCT q.id, j.value AS url
+            FROM questions q, json_each(
+                CASE WHEN json_valid(q.images) THEN q.images ELSE '[]' END
+            ) j
+            UNION
+            SELECT DISTINCT q.id, j.value AS url
+            FROM questions q, json_each(
+                CASE WHEN json_valid(q.answer_images) THEN q.answer_images ELSE '[]' END
+            ) j
+        )
+        WHERE url LIKE '/uploads/%'
+        GROUP BY url
+        """
+    )
+
+
+@migration(4, "upload image variants")
+def _upload_variants(conn: Connection):
+    columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(uploads)")}
+    if "variants" not in columns:
+        conn.exec_driver_sql("ALTER TABLE uploads ADD COLUMN variants VARCHAR")
+
+
+@migration(5, "cache generations")
+def _cache_generations(conn: Connection):
+    conn.exec_driver_sql(
+        """
+        CREATE TABLE IF NOT EXISTS generations (
+            name VARCHAR NOT NULL,
+            value INTEGER NOT NULL,
+            PRIMARY KEY (name)
+        )
+        """
+    )
+    conn.exec_driver_sql("INSERT OR IGNORE INTO generations (name, value) VALUES ('public_feed', 0)")
+
+
+@migration(6, "question event outbox")
+def _question_event_outbox(conn: Connection):
+    conn.exec_driver_sql(
+        """
+        CREATE TABLE IF NOT EXISTS question_events (
+            id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+            question_id VARCHAR(36) NOT NULL,
+            kind VARCHAR(16) NOT NULL,
+            payload VARCHAR,
+            created_at DATETIME
+        )
+        """
+    )
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_question_events_question_id_id ON question_events (question_id, id)"
+    )
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_question_events_created_at ON question_events (created_at)"
+    )
+
+
+@migration(7, "full-text search index")
+def _question_search_index(conn: Connection):
+    from .search import create_search_index
+    create_search_index(conn)
+
+
+@migration(8, "token revocation list")
+def _token_revocation_list(conn: Connection):
+    # generation 列由迁移 11 添加
+    conn.exec_driver_sql(
+        """
+        CREATE TABLE IF NOT EXISTS revoked_tokens (
+            key VARCHAR NOT NULL,
+            expires_at DATETIME NOT NULL,
+            revoked_at DATETIME,
+            PRIMARY KEY (key)
+        )
+        """
+    )
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_revoked_tokens_expires_at ON revoked_tokens (expires_at)"
+    )
+    conn.exec_driver_sql("INSERT OR IGNORE INTO generations (name, value) VALUES ('revoked_tokens', 0)")
+
+
+@migration(9, "answered_at index for upload GC")
+def _answered_at_index(conn: Connection):
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_questions_answered_at ON questions (answered_at) "
+        "WHERE answered_at IS NOT NULL"
+    )
+
+
+@migration(10, "question counters")
+def _question_counters(conn: Connection):
+    from .question_stats import create_counters
+    create_counters(conn)
+
+
+@migration(11, "incremental token revocation list")
+def _revocation_generation(conn: Connection):
+    columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(revoked_tokens)")}
+    if "generation" not in columns:
+        conn.exec_driver_sql("ALTER TABLE revoked_tokens ADD COLUMN generation INTEGER NOT NULL DEFAULT 0")
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_revoked_tokens_generation ON revoked_tokens (generation)"
+    )
+    # 问题 ID 不会重复使用，删除问题后不再需要吊销其提问者 Token
+    conn.exec_driver_sql("DELETE FROM revoked_tokens WHERE key LIKE 'asker:%'")
+
+
+def get_schema_version(conn: Connection) -> int:
+    """读取当前数据库结构版本"""
+    return conn.exec_driver_sql("PRAGMA user_version").scalar() or 0
+
+
+def upgrade(conn: Connection) -> int:
+    """执行所有未应用的迁移，返回升级后的版本号
+
+    先获取写锁再读取版本号: 多个 worker 同时启动时只有一个会执行迁移，
+    其余的在 busy_timeout 内等待，随后看到最新版本直接跳过。
+    SQLite 的 DDL 是事务性的，迁移失败会整体回滚。
+    """
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+    current = get_schema_version(conn)
+    for version, description, func in MIGRATIONS:
+        if version <= current:
+            continue
+        logger.info(f"Applying migration {version}: {description}")
+        func(conn)
+        conn.exec_driver_sql(f"PRAGMA user_version = {int(version)}")
+        current = version
+    return current
+
+
+async def run_migrations(engine: AsyncEngine) -> int:
+    """启动时调用: 将数据库升级到最新结构
+
+    先不加锁读取版本号，已是最新时直接返回，多个 worker 同时启动时不必依次等待写锁
+    """
+    async with engine.connect() as conn:
+        version = await conn.run_sync(get_schema_version)
+    if version >= MIGRATIONS[-1][0]:
+        logger.info(f"Database schema at version {version}")
+        return version
+    async with engine.begin() as conn:
+        version = await conn.run_sync(upgrade)
+    logger.info(f"Database schema at version {version}")
+    return version
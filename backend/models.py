@@ -1,25 +1,26 @@
 import uuid
-import json
 from datetime import datetime
 from typing import List, Optional
-from sqlalchemy import Column, String, DateTime, Text, Boolean
+from sqlalchemy import Column, String, DateTime, Text, Boolean, Integer, Index, text
+from sqlalchemy.orm import query_expression
 from sqlalchemy.types import TypeDecorator, VARCHAR
 from .database import Base
+from . import serialization
 
 # Custom JSON type for SQLite
 class JSONType(TypeDecorator):
-    """JSON type for SQLite."""
+    """JSON type for SQLite (编解码见 serialization，安装 orjson 时使用 orjson)"""
     impl = VARCHAR
     cache_ok = True
 
     def process_bind_param(self, value, dialect):
         if value is not None:
-            return json.dumps(value)
+            return serialization.dumps(value).decode("utf-8")
         return value
 
     def process_result_value(self, value, dialect):
         if value is not None:
-            return json.loads(value)
+            return serialization.loads(value)
         return value
 
 class Question(Base):
@@ -37,6 +38,76 @@ class Question(Base):
     answer_images = Column(JSONType, default=lambda: []) # New: List of answer image URLs/paths
     answered_at = Column(DateTime, nullable=True)
 
+    # 列表摘要的正文/回答前缀，只在查询时通过 with_expression 填充 (见 projection.py)
+    content_preview = query_expression()
+    answer_preview = query_expression()
+
+    __table_args__ = (
+        # 公开列表: WHERE is_answered AND is_public ORDER BY answered_at DESC, id DESC
+        Index(
+            "ix_questions_public_feed", "answered_at", "id",
+            sqlite_where=text("is_answered = 1 AND is_public = 1"),
+        ),
+        # 管理列表: ORDER BY created_at DESC, id DESC
+        Index("ix_questions_created_at_id", "created_at", "id"),
+        # 上传文件回收: 查找某天之后回答的问题引用的图片
+        Index(
+            "ix_questions_answered_at", "answered_at",
+            sqlite_where=text("answered_at IS NOT NULL"),
+        ),
+    )
+
+class Upload(Base):
+    """上传文件 (内容寻址)，记录被问题引用的次数"""
+    __tablename__ = "uploads"
+
+    url = Column(String, primary_key=True)  # /uploads/YYYY-MM-DD/<sha256>.<ext>
+    sha256 = Column(String(64), unique=True, nullable=True)  # 迁移前的旧文件为空
+    size = Column(Integer, nullable=True)
+    ref_count = Column(Integer, default=0, nullable=False)  # 引用该文件的问题数
+    variants = Column(JSONType, nullable=True)  # 已生成的缩略图宽度列表
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class Generation(Base):
+    """缓存代数，写操作递增，用于跨 worker 失效进程内缓存"""
+    __tablename__ = "generations"
+
+    name = Column(String, primary_key=True)
+    value = Column(Integer, default=0, nullable=False)
+
+class QuestionCounter(Base):
+    """问题统计计数器，由 questions 表上的触发器维护 (见 question_stats.py)"""
+    __tablename__ = "question_counters"
+
+    name = Column(String, primary_key=True)
+    value = Column(Integer, default=0, nullable=False)
+
+class QuestionEvent(Base):
+    """问题状态变化事件 (发件箱)，用于跨 worker 推送 SSE"""
+    __tablename__ = "question_events"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    question_id = Column(String(36), nullable=False)
+    kind = Column(String(16), nullable=False)  # answered / updated / deleted
+    payload = Column(JSONType, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_question_events_question_id_id", "question_id", "id"),
+        Index("ix_question_events_created_at", "created_at"),
+        # 清理旧事件后 ID 也不能复用，否则中继会漏掉事件
+        {"sqlite_autoincrement": True},
+    )
+
+class RevokedToken(Base):
+    """已吊销的 Token (单个 Token 或某个主体的全部 Token)，过期后可删除"""
+    __tablename__ = "revoked_tokens"
+
+    key = Column(String, primary_key=True)  # token:<sha256>、<type>:<sub> 或 session:<会话 ID>
+    expires_at = Column(DateTime, nullable=False, index=True)  # 被吊销的 Token 最晚的过期时间
+    revoked_at = Column(DateTime, default=datetime.utcnow)
+    generation = Column(Integer, default=0, nullable=False, index=True)  # 写入时 revoked_tokens 的代数
+
 class AdminUser(Base):
     __tablename__ = "admin_users"
     # Simple admin table
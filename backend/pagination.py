@@ -0,0 +1,129 @@
+"""
+游标分页工具模块
+- 基于 (排序时间, id) 的 keyset 分页，深翻页代价与第一页相同
+- 全文检索按 (相关度, rowid) 分页，使用 encode_rank_cursor / decode_rank_cursor
+- 游标对客户端不透明 (base64url 编码的 JSON)
+"""
+import json
+import base64
+import binascii
+from datetime import datetime
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models
+
+
+class InvalidCursor(ValueError):
+    """游标格式错误或已被篡改"""
+
+
+def _encode_payload(payload: dict) -> str:
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_payload(cursor: str) -> dict:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    if not isinstance(payload, dict):
+        raise TypeError("cursor payload must be an object")
+    return payload
+
+
+def encode_cursor(sort_value: datetime | None, row_id: str) -> str:
+    """将最后一行的 (排序值, id) 编码为不透明游标"""
+    return _encode_payload({
+        "t": sort_value.isoformat() if sort_value is not None else None,
+        "i": row_id,
+    })
+
+
+def decode_cursor(cursor: str) -> tuple[datetime | None, str]:
+    """解码游标，返回 (排序值, id)"""
+    try:
+        payload = _decode_payload(cursor)
+        sort_value = payload["t"]
+        row_id = payload["i"]
+        if not isinstance(row_id, str):
+            raise TypeError("id must be a string")
+        if sort_value is not None:
+            sort_value = datetime.fromisoformat(sort_value)
+        return sort_value, row_id
+    except (binascii.Error, ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(str(e)) from e
+
+
+def encode_rank_cursor(rank: float, rowid: int) -> str:
+    """将检索结果最后一行的 (相关度, rowid) 编码为不透明游标"""
+    return _encode_payload({"r": rank, "n": rowid})
+
+
+def decode_rank_cursor(cursor: str) -> tuple[float, int]:
+    """解码检索游标，返回 (相关度, rowid)"""
+    try:
+        payload = _decode_payload(cursor)
+        rank = payload["r"]
+        rowid = payload["n"]
+        if not isinstance(rank, (int, float)) or isinstance(rank, bool):
+            raise TypeError("rank must be a number")
+        if not isinstance(rowid, int) or isinstance(rowid, bool):
+            raise TypeError("rowid must be an integer")
+        return float(rank), rowid
+    except (binascii.Error, ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(str(e)) from e
+
+
+async def paginate(
+    db: AsyncSession,
+    stmt: Select,
+    sort_column,
+    limit: int,
+    skip: int = 0,
+    cursor: str | None = None,
+) -> tuple[list, str | None]:
+    """按 (sort_column DESC, id DESC) 分页查询
+
+    - 传入 cursor 时使用 keyset 分页，忽略 skip
+    - 否则保持原有的 offset 分页
+    两种模式都会在还有下一页时返回 next_cursor。
+
+    SQLite 在 DESC 排序中把 NULL 放在最后，因此排序值为 NULL 的行
+    作为第二段单独按 id 翻页。
+    """
+    id_column = models.Question.id
+    fetch = limit + 1
+
+    if cursor is None:
+        result = await db.execute(
+            stmt.order_by(sort_column.desc(), id_column.desc())
+            .offset(skip)
+            .limit(fetch)
+        )
+        rows = list(result.scalars().all())
+    else:
+        sort_value, last_id = decode_cursor(cursor)
+        rows = []
+        if sort_value is not None:
+            result = await db.execute(
+                stmt.where(tuple_(sort_column, id_column) < tuple_(sort_value, last_id))
+                .order_by(sort_column.desc(), id_column.desc())
+                .limit(fetch)
+            )
+            rows = list(result.scalars().all())
+            last_id = None
+
+        if len(rows) < fetch:
+            null_stmt = stmt.where(sort_column.is_(None))
+            if last_id is not None:
+                null_stmt = null_stmt.where(id_column < last_id)
+            result = await db.execute(
+                null_stmt.order_by(id_column.desc()).limit(fetch - len(rows))
+            )
+            rows.extend(result.scalars().all())
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), last.id)
+    return rows, next_cursor
@@ -0,0 +1,121 @@
+"""
+问题列表的字段投影
+- fields=id,is_answered,... 只返回指定字段；view=summary 返回 ID、状态、时间和正文/回答的纯文本预览
+- 只 SELECT 需要的列 (load_only)，不读取、不解码未请求的富文本和图片列表；
+  预览在 SQL 中截取正文开头 (query_expression)，不加载完整正文
+- 未指定时保持完整的 QuestionOut 输出
+"""
+import re
+import html
+from sqlalchemy import Select, func
+from sqlalchemy.orm import load_only, with_expression
+from . import models
+from .serialization import dumps
+
+# 预览的最大字符数 (去掉 HTML 标签之后)
+PREVIEW_LENGTH = 120
+# 从数据库读取的正文前缀长度，需要为标签和实体留出余量
+PREVIEW_SOURCE_LENGTH = PREVIEW_LENGTH * 4
+
+PREVIEW_FIELDS = {
+    "content_preview": models.Question.content,
+    "answer_preview": models.Question.answer_content,
+}
+# 输出字段 -> 需要加载的列
+FIELD_COLUMNS = {
+    "id": [models.Question.id],
+    "content": [models.Question.content],
+    "images": [models.Question.images],
+    "created_at": [models.Question.created_at],
+    "is_answered": [models.Question.is_answered],
+    "is_public": [models.Question.is_public],
+    "answer_content": [models.Question.answer_content],
+    "answer_images": [models.Question.answer_images],
+    "answered_at": [models.Question.answered_at],
+    # 缩略图由 attach_srcsets 根据两个图片列表查询
+    "srcset": [models.Question.images, models.Question.answer_images],
+    "content_preview": [],
+    "answer_preview": [],
+}
+SUMMARY_FIELDS = (
+    "id", "created_at", "is_answered", "is_public", "answered_at", "content_preview", "answer_preview",
+)
+
+_TAG_RE = re.compile(r"<[^>]*>?")
+
+
+class InvalidProjection(ValueError):
+    """fields / view 参数无效"""
+
+
+def parse_projection(fields: str | None, view: str | None) -> tuple[str, ...] | None:
+    """解析 fields / view 参数，返回输出字段 (id 总是包含)；返回 None 表示完整输出"""
+    if fields and view:
+        raise InvalidProjection("Use either fields or view, not both")
+    if view is not None and view not in ("full", "summary"):
+        raise InvalidProjection(f"Unknown view: {view}")
+    if view == "summary":
+        return SUMMARY_FIELDS
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in FIELD_COLUMNS]
+    if unknown:
+        raise InvalidProjection(f"Unknown fields: {', '.join(unknown)}")
+    return tuple(dict.fromkeys(["id", *names]))
+
+
+def apply_projection(stmt: Select, fields: tuple[str, ...] | None, *extra_columns) -> Select:
+    """只加载输出字段需要的列 (以及排序/分页用到的 extra_columns)"""
+    if fields is None:
+        return stmt
+    columns = {models.Question.id, *extra_columns}
+    for name in fields:
+        columns.update(FIELD_COLUMNS[name])
+    options = [load_only(*columns)]
+    for name, column in PREVIEW_FIELDS.items():
+        if name in fields:
+            options.append(with_expression(
+                getattr(models.Question, name), func.substr(column, 1, PREVIEW_SOURCE_LENGTH)
+            ))
+    return stmt.options(*options)
+
+
+def wants_srcset(fields: tuple[str, ...] | None) -> bool:
+    """是否需要查询缩略图 (未加载图片列表时不能调用 attach_srcsets)"""
+    return fields is None or "srcset" in fields
+
+
+def text_preview(value: str | None) -> str | None:
+    """富文本的纯文本预览 (去掉标签、合并空白，超过 PREVIEW_LENGTH 时截断)"""
+    if value is None:
+        return None
+    text = _TAG_RE.sub(" ", value)
+    if "&" in text:
+        text = html.unescape(text)
+    # 合并空白只会缩短文本，先处理足够长的前缀，不够长时再处理全文
+    preview = " ".join(text[:PREVIEW_LENGTH * 2].split())
+    if len(preview) <= PREVIEW_LENGTH and len(text) > PREVIEW_LENGTH * 2:
+        preview = " ".join(text.split())
+    text = preview
+    if len(text) > PREVIEW_LENGTH:
+        text = text[:PREVIEW_LENGTH].rstrip() + "…"
+    return text
+
+
+def projected_dict(q, fields: tuple[str, ...]) -> dict:
+    out = {}
+    for name in fields:
+        if name in PREVIEW_FIELDS:
+            out[name] = text_preview(getattr(q, name))
+        elif name in ("images", "answer_images"):
+            out[name] = getattr(q, name) or []
+        elif name == "srcset":
+            out[name] = getattr(q, "srcset", None) or {}
+        else:
+            out[name] = getattr(q, name)
+    return out
+
+
+def projected_json(questions: list, fields: tuple[str, ...]) -> bytes:
+    return dumps([projected_dict(q, fields) for q in questions])
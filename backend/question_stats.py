@@ -0,0 +1,171 @@
+"""
+问题统计计数器 (管理后台仪表盘)
+- question_counters 表保存总数、已回答数、公开数等计数，由 questions 表上的触发器在同一事务中增减，
+  所有写入路径 (提交、批量写入、导入、回答、批量操作、删除、撤回) 都会覆盖，读取为 O(1)
+- 后台任务每 STATS_RECONCILE_INTERVAL_HOURS 小时按实际数据重新计数一次，修正绕过触发器
+  (例如手动修改数据库) 造成的偏差，并记录日志
+- 手动校正:
+    python -m backend.question_stats reconcile
+"""
+import asyncio
+import logging
+from sqlalchemy import select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models, database
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# 计数器名 -> 对一行问题的计数表达式 (触发器中以 new. / old. 为前缀)
+COUNTERS = {
+    "total": "1",
+    "answered": "{row}.is_answered",
+    "public": "{row}.is_public",
+    "answered_public": "({row}.is_answered AND {row}.is_public)",
+}
+
+
+def _delta_case(sign: str, row: str, old: str | None = None) -> str:
+    """UPDATE question_counters 的 SET 表达式: 按 name 选择对应计数器的增量"""
+    whens = []
+    for name, expr in COUNTERS.items():
+        delta = expr.format(row=row)
+        if old is not None:
+            delta = f"{delta} - {expr.format(row=old)}"
+        whens.append(f"WHEN '{name}' THEN {sign}({delta})")
+    return f"value + CASE name {' '.join(whens)} ELSE 0 END"
+
+
+COUNTER_TRIGGERS_DDL = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS questions_counters_ai AFTER INSERT ON questions BEGIN
+        UPDATE question_counters SET value = {_delta_case("+", "new")};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS questions_counters_ad AFTER DELETE ON questions BEGIN
+        UPDATE question_counters SET value = {_delta_case("-", "old")};
+    END
+    """,
+    # 只在回答/公开状态变化时触发，修改正文不触发
+    f"""
+    CREATE TRIGGER IF NOT EXISTS questions_counters_au AFTER UPDATE OF is_answered, is_public ON questions
+    WHEN new.is_answered IS NOT old.is_answered OR new.is_public IS NOT old.is_public BEGIN
+        UPDATE question_counters SET value = {_delta_case("+", "new", "old")};
+    END
+    """,
+]
+
+# 按实际数据计数 (全表扫描，只在校正时使用)
+ACTUAL_COUNTS = "SELECT " + ", ".join(
+    f"COALESCE(SUM({expr.format(row='q')}), 0) AS {name}" for name, expr in COUNTERS.items()
+) + " FROM questions AS q"
+
+# 只更新与实际数据不一致的计数器，返回被修正的计数器
+RECONCILE_SQL = text(f"""
+    WITH actual AS ({ACTUAL_COUNTS})
+    UPDATE question_counters SET value = CASE name
+        {' '.join(f"WHEN '{name}' THEN (SELECT {name} FROM actual)" for name in COUNTERS)}
+    END
+    WHERE value IS NOT CASE name
+        {' '.join(f"WHEN '{name}' THEN (SELECT {name} FROM actual)" for name in COUNTERS)}
+    END
+    RETURNING name, value
+""")
+
+
+def create_counters(conn: Connection):
+    """创建计数器表和触发器，并按已有数据初始化 (迁移时调用)"""
+    conn.exec_driver_sql(
+        """
+        CREATE TABLE IF NOT EXISTS question_counters (
+            name VARCHAR NOT NULL,
+            value INTEGER NOT NULL,
+            PRIMARY KEY (name)
+        )
+        """
+    )
+    for name in COUNTERS:
+        conn.exec_driver_sql(
+            "INSERT OR IGNORE INTO question_counters (name, value) VALUES (?, 0)", (name,)
+        )
+    for statement in COUNTER_TRIGGERS_DDL:
+        conn.exec_driver_sql(statement)
+    conn.execute(RECONCILE_SQL)
+
+
+async def get_stats(db: AsyncSession) -> dict:
+    """读取计数器 (不扫描 questions 表)"""
+    result = await db.execute(select(models.QuestionCounter.name, models.QuestionCounter.value))
+    counters = {name: 0 for name in COUNTERS}
+    counters.update(result.all())
+    return {
+        "total": counters["total"],
+        "answered": counters["answered"],
+        "unanswered": counters["total"] - counters["answered"],
+        "public": counters["public"],
+        "private": counters["total"] - counters["public"],
+        "answered_public": counters["answered_public"],
+    }
+
+
+async def reconcile(db: AsyncSession) -> dict[str, int]:
+    """按实际数据重新计数，返回被修正的计数器 (名称 -> 修正后的值)"""
+    result = await db.execute(RECONCILE_SQL)
+    corrected = dict(result.all())
+    await db.commit()
+    if corrected:
+        logger.warning(f"Question counters drifted, reconciled: {corrected}")
+    return corrected
+
+
+class CounterReconciler:
+    def __init__(self):
+        self._task = None
+
+    def start(self):
+        """启动定时校正任务 (STATS_RECONCILE_INTERVAL_HOURS 为 0 时不启动)"""
+        interval_hours = settings.STATS_RECONCILE_INTERVAL_HOURS
+        if interval_hours <= 0:
+            logger.info("Question counter reconcile disabled (interval <= 0)")
+            return
+
+        async def reconcile_loop():
+            while True:
+                await asyncio.sleep(interval_hours * 3600)
+                try:
+                    async with database.AsyncSessionLocal() as db:
+                        await reconcile(db)
+                except Exception as e:
+                    logger.error(f"Question counter reconcile failed: {e}")
+
+        self._task = asyncio.create_task(reconcile_loop())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+
+counter_reconciler = CounterReconciler()
+
+
+def main():
+    import sys
+
+    if sys.argv[1:] != ["reconcile"]:
+        print("usage: python -m backend.question_stats reconcile")
+        sys.exit(1)
+
+    async def run():
+        async with database.AsyncSessionLocal() as db:
+            corrected = await reconcile(db)
+            print(corrected or "Counters are up to date")
+            print(await get_stats(db))
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
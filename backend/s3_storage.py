@@ -0,0 +1,421 @@
+"""
+S3 兼容的对象存储后端 (STORAGE_BACKEND=s3)
+- 基于 httpx.AsyncClient，每个 worker 一个连接池 (S3_MAX_CONNECTIONS)，请求复用 keep-alive 连接
+- 请求使用 AWS Signature Version 4 签名，兼容 AWS S3、MinIO、Cloudflare R2 等
+- 流式写入: 数据攒够 S3_MULTIPART_CHUNK_MB 后转为分片上传，较小的文件直接 PUT
+- 批量删除使用 DeleteObjects，每个请求最多 1000 个键
+- 预签名 URL 的签名时间按有效期的一半取整，同一时间段内 URL 不变，浏览器可以缓存图片
+"""
+import hmac
+import time
+import base64
+import asyncio
+import hashlib
+from datetime import datetime, timezone
+from urllib.parse import quote, urlsplit
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+from .config import settings
+from .storage import Storage, StorageWriter, StoredObject, StorageError
+
+S3_NAMESPACE = "{http://s3.amazonaws.com/doc/2006-03-01/}"
+EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+# S3 限制: 除最后一个分片外每个分片至少 5MB；DeleteObjects 每次最多 1000 个键；ListObjectsV2 每页最多 1000 个
+MIN_PART_SIZE = 5 * 1024 * 1024
+DELETE_BATCH_SIZE = 1000
+LIST_PAGE_SIZE = 1000
+
+
+def _hmac(key: bytes, msg: str) -> bytes:
+    return hmac.new(key, msg.encode(), hashlib.sha256).digest()
+
+
+def _uri_encode(value: str, safe: str = "~") -> str:
+    return quote(value, safe=safe)
+
+
+def _canonical_query(params: dict[str, str]) -> str:
+    return "&".join(
+        f"{_uri_encode(k)}={_uri_encode(v)}" for k, v in sorted(params.items())
+    )
+
+
+def _signature(secret_key: str, region: str, amz_date: str, canonical_request: str) -> tuple[str, str]:
+    """返回 (credential scope, 签名)"""
+    date = amz_date[:8]
+    scope = f"{date}/{region}/s3/aws4_request"
+    string_to_sign = "\n".join([
+        "AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode()).hexdigest(),
+    ])
+    key = _hmac(("AWS4" + secret_key).encode(), date)
+    for part in (region, "s3", "aws4_request"):
+        key = _hmac(key, part)
+    return scope, hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+
+def sign_headers(
+    method: str, host: str, path: str, params: dict[str, str], headers: dict[str, str],
+    payload_hash: str, access_key: str, secret_key: str, region: str, now: datetime,
+) -> dict[str, str]:
+    """SigV4 请求头签名，返回需要附加的请求头 (包括 Authorization)"""
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    signed = {k.lower(): str(v).strip() for k, v in headers.items()}
+    signed.update({"host": host, "x-amz-content-sha256": payload_hash, "x-amz-date": amz_date})
+    names = sorted(signed)
+    canonical_request = "\n".join([
+        method,
+        _uri_encode(path, safe="/~"),
+        _canonical_query(params),
+        "".join(f"{name}:{signed[name]}\n" for name in names),
+        ";".join(names),
+        payload_hash,
+    ])
+    scope, signature = _signature(secret_key, region, amz_date, canonical_request)
+    return {
+        "x-amz-content-sha256": payload_hash,
+        "x-amz-date": amz_date,
+        "authorization": (
+            f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, "
+            f"SignedHeaders={';'.join(names)}, Signature={signature}"
+        ),
+    }
+
+
+def presign_query(
+    method: str, host: str, path: str, access_key: str, secret_key: str, region: str,
+    now: datetime, expires: int,
+) -> dict[str, str]:
+    """SigV4 预签名 URL 的查询参数"""
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    params = {
+        "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+        "X-Amz-Credential": f"{access_key}/{amz_date[:8]}/{region}/s3/aws4_request",
+        "X-Amz-Date": amz_date,
+        "X-Amz-Expires": str(expires),
+        "X-Amz-SignedHeaders": "host",
+    }
+    canonical_request = "\n".join([
+        method, _uri_encode(path, safe="/~"), _canonical_query(params),
+        f"host:{host}\n", "host", UNSIGNED_PAYLOAD,
+    ])
+    _, signature = _signature(secret_key, region, amz_date, canonical_request)
+    params["X-Amz-Signature"] = signature
+    return params
+
+
+def _find_text(element, name: str) -> str | None:
+    child = element.find(S3_NAMESPACE + name)
+    return child.text if child is not None else None
+
+
+class _MultipartWriter(StorageWriter):
+    """攒够一个分片再上传；只有一个分片时直接 PUT"""
+
+    def __init__(self, storage: "S3Storage", key: str, content_type: str | None):
+        self._storage = storage
+        self._key = key
+        self._content_type = content_type
+        self._buffer = bytearray()
+        self._upload_id: str | None = None
+        self._parts: list[str] = []  # ETag，按分片号排列
+
+    async def write(self, data: bytes):
+        self._buffer += data
+        while len(self._buffer) >= self._storage.part_size:
+            part = bytes(self._buffer[:self._storage.part_size])
+            del self._buffer[:self._storage.part_size]
+            await self._upload_part(part)
+
+    async def _upload_part(self, data: bytes):
+        if self._upload_id is None:
+            self._upload_id = await self._storage.create_multipart_upload(self._key, self._content_type)
+        etag = await self._storage.upload_part(self._key, self._upload_id, len(self._parts) + 1, data)
+        self._parts.append(etag)
+
+    async def close(self):
+        if self._upload_id is None:
+            await self._storage.put(self._key, bytes(self._buffer), self._content_type)
+            return
+        if self._buffer:
+            await self._upload_part(bytes(self._buffer))
+            self._buffer.clear()
+        await self._storage.complete_multipart_upload(self._key, self._upload_id, self._parts)
+
+    async def abort(self):
+        self._buffer.clear()
+        if self._upload_id is not None:
+            await self._storage.abort_multipart_upload(self._key, self._upload_id)
+
+
+class S3Storage(Storage):
+    def __init__(
+        self,
+        endpoint_url: str,
+        bucket: str,
+        access_key: str,
+        secret_key: str,
+        region: str = "us-east-1",
+        key_prefix: str = "",
+        addressing_style: str = "path",
+        public_url: str = "",
+        presign_expires: int = 3600,
+        max_connections: int = 20,
+        part_size: int = 8 * 1024 * 1024,
+        timeout: float = 30,
+    ):
+        try:
+            import httpx  # noqa: F401
+        except ImportError:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires httpx: pip install httpx")
+        if not endpoint_url or not bucket:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires S3_ENDPOINT_URL and S3_BUCKET")
+        endpoint = urlsplit(endpoint_url.rstrip("/"))
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.key_prefix = key_prefix.strip("/") + "/" if key_prefix.strip("/") else ""
+        if addressing_style == "virtual":
+            self.host = f"{bucket}.{endpoint.netloc}"
+            self.base_path = ""
+        else:
+            self.host = endpoint.netloc
+            self.base_path = f"/{bucket}"
+        self.base_url = f"{endpoint.scheme}://{self.host}"
+        self.public_url = public_url.rstrip("/")
+        self.presign_expires = presign_expires
+        self.max_connections = max_connections
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.timeout = timeout
+        self._client = None
+        self._client_loop = None
+
+    @classmethod
+    def from_settings(cls) -> "S3Storage":
+        return cls(
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            bucket=settings.S3_BUCKET,
+            access_key=settings.S3_ACCESS_KEY,
+            secret_key=settings.S3_SECRET_KEY,
+            region=settings.S3_REGION,
+            key_prefix=settings.S3_KEY_PREFIX,
+            addressing_style=settings.S3_ADDRESSING_STYLE,
+            public_url=settings.S3_PUBLIC_URL,
+            presign_expires=settings.S3_PRESIGN_EXPIRES_SECONDS,
+            max_connections=settings.S3_MAX_CONNECTIONS,
+            part_size=settings.S3_MULTIPART_CHUNK_MB * 1024 * 1024,
+            timeout=settings.S3_TIMEOUT_SECONDS,
+        )
+
+    # ---------------- 请求 ----------------
+    def _get_client(self):
+        """连接池绑定创建它的事件循环 (命令行工具可能多次 asyncio.run)"""
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+            self._client_loop = loop
+        return self._client
+
+    def _path(self, key: str = "") -> str:
+        return f"{self.base_path}/{self.key_prefix}{key}" if key else (self.base_path or "/")
+
+    async def _request(
+        self, method: str, key: str = "", params: dict[str, str] | None = None,
+        headers: dict[str, str] | None = None, content: bytes = b"", ok: tuple[int, ...] = (200,),
+    ):
+        params = params or {}
+        headers = headers or {}
+        path = self._path(key)
+        payload_hash = hashlib.sha256(content).hexdigest() if content else EMPTY_SHA256
+        signed = sign_headers(
+            method, self.host, path, params, headers, payload_hash,
+            self.access_key, self.secret_key, self.region, datetime.now(timezone.utc),
+        )
+        # 查询字符串按签名时的规范形式拼接，不交给 httpx 重新编码
+        url = self.base_url + _uri_encode(path, safe="/~")
+        if params:
+            url += "?" + _canonical_query(params)
+        response = await self._get_client().request(
+            method, url, headers={**headers, **signed}, content=content,
+        )
+        if response.status_code not in ok:
+            code = message = None
+            try:
+                error = ElementTree.fromstring(response.content)
+                code, message = error.findtext("Code"), error.findtext("Message")
+            except ElementTree.ParseError:
+                pass
+            raise StorageError(
+                f"S3 {method} {key or '/'} failed: {response.status_code} {code or ''} {message or ''}".strip()
+            )
+        return response
+
+    # ---------------- 对象 ----------------
+    async def put(self, key: str, data: bytes, content_type: str | None = None):
+        headers = {"content-type": content_type} if content_type else {}
+        await self._request("PUT", key, headers=headers, content=data)
+
+    async def open_writer(self, key: str, content_type: str | None = None) -> StorageWriter:
+        return _MultipartWriter(self, key, content_type)
+
+    async def get(self, key: str) -> bytes:
+        response = await self._request("GET", key, ok=(200, 404))
+        if response.status_code == 404:
+            raise FileNotFoundError(key)
+        return response.content
+
+    async def stat(self, key: str) -> StoredObject | None:
+        response = await self._request("HEAD", key, ok=(200, 404))
+        if response.status_code == 404:
+            return None
+        modified = response.headers.get("last-modified")
+        return StoredObject(
+            key,
+            int(response.headers.get("content-length", 0)),
+            _parse_http_date(modified) if modified else 0.0,
+        )
+
+    async def delete(self, keys: list[str]) -> list[str]:
+        """DeleteObjects 批量删除 (每个请求最多 1000 个键)"""
+        deleted = []
+        for start in range(0, len(keys), DELETE_BATCH_SIZE):
+            batch = keys[start:start + DELETE_BATCH_SIZE]
+            body = (
+                "<Delete><Quiet>false</Quiet>"
+                + "".join(f"<Object><Key>{escape(self.key_prefix + key)}</Key></Object>" for key in batch)
+                + "</Delete>"
+            ).encode()
+            response = await self._request(
+                "POST", params={"delete": ""}, content=body,
+                headers={"content-md5": base64.b64encode(hashlib.md5(body).digest()).decode()},
+            )
+            result = ElementTree.fromstring(response.content)
+            errors = [
+                f"{_find_text(e, 'Key')}: {_find_text(e, 'Code')}"
+                for e in result.iter(S3_NAMESPACE + "Error")
+            ]
+            if errors:
+                raise StorageError(f"S3 delete failed for {len(errors)} keys: {errors[:5]}")
+            deleted += [
+                _find_text(d, "Key")[len(self.key_prefix):]
+                for d in result.iter(S3_NAMESPACE + "Deleted")
+            ]
+        return deleted
+
+    async def move(self, src: str, dest: str):
+        """CopyObject + DeleteObject (对象存储没有重命名)"""
+        await self._request("PUT", dest, headers={
+            "x-amz-copy-source": _uri_encode(f"/{self.bucket}/{self.key_prefix}{src}", safe="/~"),
+        })
+        await self._request("DELETE", src, ok=(204, 200))
+
+    async def _list_pages(self, prefix: str, delimiter: str | None = None, start_after: str = "",
+                          max_keys: int | None = None):
+        params = {"list-type": "2", "prefix": self.key_prefix + prefix}
+        if delimiter:
+            params["delimiter"] = delimiter
+        if start_after:
+            params["start-after"] = self.key_prefix + start_after
+        if max_keys:
+            params["max-keys"] = str(max_keys)
+        while True:
+            response = await self._request("GET", params=params)
+            result = ElementTree.fromstring(response.content)
+            yield result
+            token = _find_text(result, "NextContinuationToken")
+            if _find_text(result, "IsTruncated") != "true" or not token:
+                return
+            params["continuation-token"] = token
+
+    async def list_objects(
+        self, prefix: str, start_after: str = "", limit: int | None = None,
+    ) -> list[StoredObject]:
+        """ListObjectsV2 本身按键排序，指定 limit 时读够一页即停止"""
+        objects = []
+        max_keys = min(limit, LIST_PAGE_SIZE) if limit else None
+        async for page in self._list_pages(prefix, start_after=start_after, max_keys=max_keys):
+            for item in page.iter(S3_NAMESPACE + "Contents"):
+                objects.append(StoredObject(
+                    _find_text(item, "Key")[len(self.key_prefix):],
+                    int(_find_text(item, "Size") or 0),
+                    _parse_iso_date(_find_text(item, "LastModified")),
+                ))
+            if limit and len(objects) >= limit:
+                return objects[:limit]
+        return objects
+
+    async def list_folders(self) -> list[str]:
+        folders = []
+        async for page in self._list_pages("", delimiter="/"):
+            for item in page.iter(S3_NAMESPACE + "CommonPrefixes"):
+                folders.append(_find_text(item, "Prefix")[len(self.key_prefix):].rstrip("/"))
+        return sorted(folders)
+
+    def url(self, key: str) -> str:
+        if self.public_url:
+            return f"{self.public_url}/{_uri_encode(self.key_prefix + key, safe='/~')}"
+        # 签名时间按半个有效期取整，同一时间段内生成的 URL 相同，剩余有效期不少于一半
+        step = max(self.presign_expires // 2, 1)
+        signed_at = datetime.fromtimestamp(int(time.time()) // step * step, timezone.utc)
+        path = self._path(key)
+        params = presign_query(
+            "GET", self.host, path, self.access_key, self.secret_key, self.region,
+            signed_at, self.presign_expires,
+        )
+        return f"{self.base_url}{_uri_encode(path, safe='/~')}?{_canonical_query(params)}"
+
+    # ---------------- 分片上传 ----------------
+    async def create_multipart_upload(self, key: str, content_type: str | None) -> str:
+        headers = {"content-type": content_type} if content_type else {}
+        response = await self._request("POST", key, params={"uploads": ""}, headers=headers)
+        return _find_text(ElementTree.fromstring(response.content), "UploadId")
+
+    async def upload_part(self, key: str, upload_id: str, number: int, data: bytes) -> str:
+        response = await self._request(
+            "PUT", key, params={"partNumber": str(number), "uploadId": upload_id}, content=data,
+        )
+        return response.headers["etag"]
+
+    async def complete_multipart_upload(self, key: str, upload_id: str, etags: list[str]):
+        body = (
+            "<CompleteMultipartUpload>"
+            + "".join(
+                f"<Part><PartNumber>{i}</PartNumber><ETag>{escape(etag)}</ETag></Part>"
+                for i, etag in enumerate(etags, 1)
+            )
+            + "</CompleteMultipartUpload>"
+        ).encode()
+        response = await self._request("POST", key, params={"uploadId": upload_id}, content=body)
+        # 合并失败时 S3 也可能返回 200，错误在响应体中
+        if b"<Error>" in response.content:
+            raise StorageError(f"S3 complete multipart upload failed for {key}: {response.text[:200]}")
+
+    async def abort_multipart_upload(self, key: str, upload_id: str):
+        await self._request("DELETE", key, params={"uploadId": upload_id}, ok=(204, 200, 404))
+
+    async def close(self):
+        client, loop = self._client, self._client_loop
+        self._client = self._client_loop = None
+        # 其他 (已结束的) 事件循环创建的连接池无法在这里关闭，直接丢弃
+        if client is not None and loop is asyncio.get_running_loop():
+            await client.aclose()
+
+
+def _parse_iso_date(value: str | None) -> float:
+    if not value:
+        return 0.0
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def _parse_http_date(value: str) -> float:
+    from email.utils import parsedate_to_datetime
+    return parsedate_to_datetime(value).timestamp()
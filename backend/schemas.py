@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Literal, Optional, Union
 from datetime import datetime
 
 class QuestionBase(BaseModel):
@@ -17,10 +17,22 @@ class QuestionOut(QuestionBase):
     answer_content: Optional[str] = None
     answer_images: List[str] = []
     answered_at: Optional[datetime] = None
+    # 图片 URL -> {宽度: WebP 缩略图 URL}，只包含已生成的缩略图
+    srcset: Dict[str, Dict[str, str]] = {}
 
     class Config:
         from_attributes = True
 
+class SnippetPart(BaseModel):
+    text: str
+    match: bool = False
+
+class QuestionSearchHit(QuestionOut):
+    # bm25 相关度，越小越相关；检索词都短于 3 个字符时为空 (按时间排序)
+    rank: Optional[float] = None
+    content_snippet: List[SnippetPart] = []
+    answer_snippet: List[SnippetPart] = []
+
 class AnswerCreate(BaseModel):
     answer_content: str
     answer_images: List[str] = []
@@ -30,6 +42,67 @@ class QuestionUpdate(BaseModel):
     is_public: Optional[bool] = None
     is_answered: Optional[bool] = None
 
+class BulkOperation(BaseModel):
+    action: Literal["publish", "unpublish", "mark_answered", "delete"]
+    ids: List[str]
+
+class BulkRequest(BaseModel):
+    # 按顺序在同一事务中执行
+    operations: List[BulkOperation]
+
+class BulkOperationResult(BaseModel):
+    action: str
+    requested: int
+    affected: int  # 实际存在并被修改/删除的问题数
+
+class BulkResponse(BaseModel):
+    results: List[BulkOperationResult]
+    pending_image_deletions: int  # 不再被引用、由上传回收任务在宽限期后删除的图片数
+
+class QuestionStats(BaseModel):
+    total: int
+    answered: int
+    unanswered: int
+    public: int
+    private: int
+    answered_public: int  # 公开列表中的问题数
+
+class QuestionRecord(BaseModel):
+    """导出 / 导入的一行 (NDJSON)，字段与 questions 表一致"""
+    id: str
+    content: str
+    images: List[str] = []
+    created_at: datetime
+    is_answered: bool = False
+    is_public: bool = False
+    answer_content: Optional[str] = None
+    answer_images: List[str] = []
+    answered_at: Optional[datetime] = None
+
+class ImportLineError(BaseModel):
+    line: int
+    error: str
+
+class ImportResponse(BaseModel):
+    lines: int
+    inserted: int
+    skipped: int  # ID 已存在的问题
+    invalid: int  # 格式错误的行
+    errors: List[ImportLineError]  # 最多列出前 100 条
+
+class SlowQuery(BaseModel):
+    recorded_at: datetime
+    duration_ms: float
+    statement: str
+    parameters: Optional[Union[List[Any], Dict[str, Any]]] = None  # executemany 时为第一组参数
+    executemany: bool
+    plan: Optional[List[str]] = None  # EXPLAIN QUERY PLAN，按层级缩进
+    plan_error: Optional[str] = None
+    full_scan: bool  # 计划中有不经索引的全表扫描
+    temp_b_tree: bool  # 计划中有为排序/分组建立的临时 B 树
+    database: Optional[str] = None
+    pid: int  # 记录该语句的 worker
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -0,0 +1,229 @@
+"""
+全文检索模块 (SQLite FTS5)
+- questions_fts 为外部内容表 (content='questions')，不重复存储正文，由触发器与 questions 同步
+- 使用 trigram 分词: 中文不需要分词词典，可按任意子串检索
+- trigram 只能匹配 3 个字符及以上的词；更短的词 (如两字中文词) 退化为 LIKE 过滤
+- 结果按 bm25 相关度排序，按 (相关度, rowid) 游标分页
+- 摘要在 Python 中生成，返回高亮片段列表而不是 HTML，前端按纯文本渲染
+- 重建索引 (例如手动修改过 questions 表之后):
+    python -m backend.search rebuild
+"""
+import re
+import logging
+from sqlalchemy import select, text, table, column, literal_column, or_, and_
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models
+from .pagination import paginate, encode_rank_cursor, decode_rank_cursor
+
+logger = logging.getLogger(__name__)
+
+MAX_QUERY_LENGTH = 100
+MAX_TERMS = 8
+MAX_LIMIT = 100
+TRIGRAM_MIN_LENGTH = 3
+SNIPPET_WIDTH = 60
+
+SEARCH_INDEX_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+        content, answer_content,
+        content='questions', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS questions_fts_ai AFTER INSERT ON questions BEGIN
+        INSERT INTO questions_fts(rowid, content, answer_content)
+        VALUES (new.rowid, new.content, new.answer_content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS questions_fts_ad AFTER DELETE ON questions BEGIN
+        INSERT INTO questions_fts(questions_fts, rowid, content, answer_content)
+        VALUES ('delete', old.rowid, old.content, old.answer_content);
+    END
+    """,
+    # 只在正文变化时重建索引，切换公开/回答状态不触发
+    """
+    CREATE TRIGGER IF NOT EXISTS questions_fts_au AFTER UPDATE OF content, answer_content ON questions BEGIN
+        INSERT INTO questions_fts(questions_fts, rowid, content, answer_content)
+        VALUES ('delete', old.rowid, old.content, old.answer_content);
+        INSERT INTO questions_fts(rowid, content, answer_content)
+        VALUES (new.rowid, new.content, new.answer_content);
+    END
+    """,
+]
+
+questions_fts = table("questions_fts", column("rowid"), column("rank"))
+
+_fts_available: bool | None = None
+
+
+class InvalidSearchQuery(ValueError):
+    """检索词为空或过长"""
+
+
+def create_search_index(conn: Connection) -> bool:
+    """创建检索索引和同步触发器，并为已有数据建立索引 (迁移时调用)
+
+    SQLite 不支持 FTS5 或 trigram 分词 (低于 3.34) 时跳过，检索退化为 LIKE。
+    """
+    try:
+        conn.exec_driver_sql(SEARCH_INDEX_DDL[0])
+    except OperationalError as e:
+        logger.warning(f"FTS5 trigram index unavailable, search will use LIKE: {e}")
+        return False
+    for statement in SEARCH_INDEX_DDL[1:]:
+        conn.exec_driver_sql(statement)
+    rebuild_search_index(conn)
+    return True
+
+
+def rebuild_search_index(conn: Connection):
+    """根据 questions 表重建全部索引"""
+    conn.exec_driver_sql("INSERT INTO questions_fts(questions_fts) VALUES ('rebuild')")
+
+
+async def fts_available(db: AsyncSession) -> bool:
+    """检索索引是否存在 (每个进程只查询一次)"""
+    global _fts_available
+    if _fts_available is None:
+        result = await db.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'questions_fts'")
+        )
+        _fts_available = result.scalar() is not None
+    return _fts_available
+
+
+def parse_query(q: str) -> list[str]:
+    """按空白拆分检索词 (去重，最多 MAX_TERMS 个)，多个词之间为 AND 关系"""
+    q = (q or "").strip()
+    if not q:
+        raise InvalidSearchQuery("Empty search query")
+    if len(q) > MAX_QUERY_LENGTH:
+        raise InvalidSearchQuery("Search query too long")
+    terms = list(dict.fromkeys(q.split()))
+    return terms[:MAX_TERMS]
+
+
+def fts_query(terms: list[str]) -> str:
+    """每个词作为一个短语，避免用户输入被解析为 FTS5 语法"""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def _contains(term: str):
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    pattern = f"%{escaped}%"
+    return or_(
+        models.Question.content.like(pattern, escape="\\"),
+        models.Question.answer_content.like(pattern, escape="\\"),
+    )
+
+
+def make_snippet(value: str | None, terms: list[str], width: int = SNIPPET_WIDTH) -> list[dict]:
+    """截取第一个命中词附近的文本，返回 [{"text", "match"}] 片段；没有命中时返回空列表"""
+    if not value:
+        return []
+    pattern = re.compile(
+        "|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True)), re.IGNORECASE
+    )
+    first = pattern.search(value)
+    if first is None:
+        return []
+
+    start = max(0, first.start() - width // 3)
+    end = min(len(value), max(start + width, first.end()))
+    start = max(0, min(start, end - width))
+    window = value[start:end]
+
+    parts = []
+    if start > 0:
+        parts.append({"text": "…", "match": False})
+    pos = 0
+    for m in pattern.finditer(window):
+        if m.start() > pos:
+            parts.append({"text": window[pos:m.start()], "match": False})
+        parts.append({"text": m.group(), "match": True})
+        pos = m.end()
+    if pos < len(window):
+        parts.append({"text": window[pos:], "match": False})
+    if end < len(value):
+        parts.append({"text": "…", "match": False})
+    return parts
+
+
+async def search_questions(
+    db: AsyncSession,
+    q: str,
+    limit: int = 20,
+    cursor: str | None = None,
+    public_only: bool = False,
+) -> tuple[list[models.Question], str | None]:
+    """检索问题和回答，返回 (问题列表, 下一页游标)
+
+    返回的问题对象上附加 rank / content_snippet / answer_snippet 属性 (供 QuestionSearchHit 序列化)。
+    所有检索词都短于 3 个字符时没有相关度，按时间倒序返回。
+    """
+    terms = parse_query(q)
+    limit = max(1, min(limit, MAX_LIMIT))
+
+    if await fts_available(db):
+        match_terms = [t for t in terms if len(t) >= TRIGRAM_MIN_LENGTH]
+    else:
+        match_terms = []
+    filters = [_contains(t) for t in terms if t not in match_terms]
+    if public_only:
+        filters += [models.Question.is_answered == True, models.Question.is_public == True]
+
+    if not match_terms:
+        sort_column = models.Question.answered_at if public_only else models.Question.created_at
+        questions, next_cursor = await paginate(
+            db, select(models.Question).where(*filters), sort_column, limit, cursor=cursor
+        )
+        ranks = [None] * len(questions)
+    else:
+        rank = questions_fts.c.rank
+        rowid = questions_fts.c.rowid
+        stmt = (
+            select(models.Question, rank, rowid)
+            .join(questions_fts, rowid == literal_column("questions.rowid"))
+            .where(literal_column("questions_fts").op("MATCH")(fts_query(match_terms)))
+            .where(*filters)
+        )
+        if cursor is not None:
+            last_rank, last_rowid = decode_rank_cursor(cursor)
+            stmt = stmt.where(or_(rank > last_rank, and_(rank == last_rank, rowid > last_rowid)))
+        result = await db.execute(stmt.order_by(rank, rowid).limit(limit + 1))
+        rows = result.all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_rank_cursor(rows[-1][1], rows[-1][2])
+        questions = [row[0] for row in rows]
+        ranks = [row[1] for row in rows]
+
+    for question, score in zip(questions, ranks):
+        question.rank = score
+        question.content_snippet = make_snippet(question.content, terms)
+        question.answer_snippet = make_snippet(question.answer_content, terms)
+    return questions, next_cursor
+
+
+if __name__ == "__main__":
+    import sys
+    import asyncio
+    from .database import engine
+
+    if sys.argv[1:] != ["rebuild"]:
+        print("usage: python -m backend.search rebuild")
+        sys.exit(2)
+
+    async def _rebuild():
+        async with engine.begin() as conn:
+            await conn.run_sync(rebuild_search_index)
+        await engine.dispose()
+
+    asyncio.run(_rebuild())
+    print("Search index rebuilt")
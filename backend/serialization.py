@@ -0,0 +1,92 @@
+"""
+JSON 序列化快速路径
+- 安装了 orjson 时使用 orjson 编解码 (比标准库快数倍)，否则回退到标准库 json
+- 问题列表直接从 ORM 对象构造输出字典，不再经过 Pydantic 的校验和二次转换；
+  输出字段与 schemas.QuestionOut / QuestionSearchHit 一致
+"""
+import json
+from datetime import datetime
+from typing import Any, Mapping
+from starlette.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # 可选依赖
+    orjson = None
+
+HAS_ORJSON = orjson is not None
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any) -> bytes:
+    """编码为紧凑的 UTF-8 JSON (datetime 输出为 ISO 8601，与 Pydantic 一致)"""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def loads(data: str | bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """使用 dumps 编码的 JSONResponse"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def question_dict(q) -> dict:
+    """QuestionOut 的字段 (srcset 由 attach_srcsets 设置)"""
+    return {
+        "content": q.content,
+        "images": q.images or [],
+        "id": q.id,
+        "created_at": q.created_at,
+        "is_answered": q.is_answered,
+        "is_public": q.is_public,
+        "answer_content": q.answer_content,
+        "answer_images": q.answer_images or [],
+        "answered_at": q.answered_at,
+        "srcset": getattr(q, "srcset", None) or {},
+    }
+
+
+def search_hit_dict(q) -> dict:
+    """QuestionSearchHit 的字段 (rank 和摘要由 search_questions 设置)"""
+    return {
+        **question_dict(q),
+        "rank": getattr(q, "rank", None),
+        "content_snippet": getattr(q, "content_snippet", None) or [],
+        "answer_snippet": getattr(q, "answer_snippet", None) or [],
+    }
+
+
+def questions_json(questions: list, search: bool = False, fields: tuple[str, ...] | None = None) -> bytes:
+    """fields 不为空时只输出这些字段 (见 projection.parse_projection)"""
+    if fields is not None:
+        # projection 依赖 models，models 依赖本模块
+        from .projection import projected_json
+        return projected_json(questions, fields)
+    to_dict = search_hit_dict if search else question_dict
+    return dumps([to_dict(q) for q in questions])
+
+
+def questions_response(questions: list, headers: Mapping[str, str] | None = None,
+                       search: bool = False, fields: tuple[str, ...] | None = None) -> Response:
+    """问题列表响应 (不经过 response_model 校验)
+
+    直接返回 Response 时 FastAPI 不会合并注入的 response 参数上的响应头，需要通过 headers 传入
+    """
+    return Response(
+        content=questions_json(questions, search, fields),
+        media_type="application/json",
+        headers=dict(headers or {}),
+    )
@@ -0,0 +1,135 @@
+"""
+慢查询记录
+- 通过 SQLAlchemy 引擎事件计时，超过 SLOW_QUERY_MS 的语句连同参数和 EXPLAIN QUERY PLAN 一起记录
+- 每个 worker 在内存中保留最近 SLOW_QUERY_LOG_SIZE 条 (环形缓冲)，
+  管理接口 GET {ADMIN_PREFIX}/slow-queries 返回响应该请求的 worker 的记录
+- 同时写一条 WARNING 日志，便于在日志文件中检索
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+MAX_STATEMENT_LENGTH = 4000
+MAX_PARAMETER_LENGTH = 200
+EXPLAINABLE = ("select", "insert", "update", "delete", "with", "replace")
+
+
+class SlowQueryLog:
+    def __init__(self, size: int):
+        self._entries: deque[dict] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, entry: dict):
+        with self._lock:
+            self._entries.append(entry)
+
+    def entries(self, limit: int | None = None) -> list[dict]:
+        """最近的记录，新的在前"""
+        with self._lock:
+            items = list(self._entries)
+        items.reverse()
+        return items[:limit] if limit else items
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def format_parameters(parameters) -> list | dict | None:
+    """参数转为可 JSON 序列化的值: 长字符串截断，二进制只记录长度"""
+    def value(v):
+        if v is None or isinstance(v, (bool, int, float)):
+            return v
+        if isinstance(v, (bytes, bytearray, memoryview)):
+            return f"<{len(v)} bytes>"
+        text = str(v)
+        return text if len(text) <= MAX_PARAMETER_LENGTH else text[:MAX_PARAMETER_LENGTH] + "..."
+
+    if parameters is None:
+        return None
+    if isinstance(parameters, dict):
+        return {k: value(v) for k, v in parameters.items()}
+    return [value(v) for v in parameters]
+
+
+def explain_query_plan(dbapi_connection, statement: str, parameters) -> list[str] | None:
+    """在同一连接上执行 EXPLAIN QUERY PLAN，返回按层级缩进的计划 (与 sqlite3 命令行输出一致)"""
+    if statement.lstrip().split(None, 1)[0].lower() not in EXPLAINABLE:
+        return None
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ())
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    depth = {0: -1}
+    plan = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        plan.append("  " * depth[node_id] + detail)
+    return plan
+
+
+def plan_flags(plan: list[str] | None) -> dict[str, bool]:
+    """计划中常见的问题: 全表扫描 (不经索引) 和为排序/分组建立的临时 B 树"""
+    details = [line.strip() for line in plan or ()]
+    return {
+        "full_scan": any(d.startswith("SCAN ") and " USING " not in d for d in details),
+        "temp_b_tree": any("USE TEMP B-TREE" in d for d in details),
+    }
+
+
+def instrument_engine(sync_engine, threshold_ms: float | None = None):
+    """记录超过阈值的语句 (阈值默认取 SLOW_QUERY_MS)"""
+    from sqlalchemy import event
+
+    threshold = (settings.SLOW_QUERY_MS if threshold_ms is None else threshold_ms) / 1000
+    database = sync_engine.url.database
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context._slow_query_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_slow_query_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        if elapsed < threshold:
+            return
+
+        # executemany 只记录第一组参数
+        first = parameters[0] if executemany and parameters else parameters
+        try:
+            plan = explain_query_plan(conn.connection, statement, first)
+            plan_error = None
+        except Exception as e:
+            plan, plan_error = None, str(e)
+
+        entry = {
+            "recorded_at": datetime.now(timezone.utc),
+            "duration_ms": round(elapsed * 1000, 3),
+            "statement": statement[:MAX_STATEMENT_LENGTH],
+            "parameters": format_parameters(first),
+            "executemany": bool(executemany),
+            "plan": plan,
+            "plan_error": plan_error,
+            **plan_flags(plan),
+            "database": database,
+            "pid": os.getpid(),
+        }
+        slow_query_log.add(entry)
+        logger.warning(
+            f"Slow query ({entry['duration_ms']:.1f}ms): {' '.join(statement.split())[:200]}"
+        )
+
+
+slow_query_log = SlowQueryLog(settings.SLOW_QUERY_LOG_SIZE)
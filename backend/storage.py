@@ -0,0 +1,311 @@
+"""
+上传文件存储后端
+- 以对象键 (如 2024-01-01/<sha256>.png、2024-01-01/variants/<sha256>_320.webp) 存取文件，
+  数据库中保存的 URL 仍为 /uploads/<对象键>，切换后端不需要改写数据
+- local (默认): 按周分文件夹保存在 UPLOAD_DIR，由 /uploads 静态文件挂载直接提供
+- s3: S3 兼容的对象存储 (AWS S3、MinIO、R2 等，见 s3_storage.py)，
+  /uploads/<对象键> 重定向到预签名 URL 或 S3_PUBLIC_URL，多个节点可以共享同一份上传文件
+- 所有方法都是异步的，本地文件操作在工作线程中执行
+"""
+import os
+import bisect
+import asyncio
+import tempfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import NamedTuple
+from .config import settings
+
+
+class StoredObject(NamedTuple):
+    key: str
+    size: int
+    modified: float  # 修改时间 (Unix 时间戳)
+
+
+class StorageError(Exception):
+    """存储后端返回错误"""
+
+
+class StorageWriter(ABC):
+    """流式写入一个对象: write() 若干次后 close()，出错时 abort() 丢弃已写入的部分"""
+
+    @abstractmethod
+    async def write(self, data: bytes): ...
+
+    @abstractmethod
+    async def close(self): ...
+
+    @abstractmethod
+    async def abort(self): ...
+
+
+class Storage(ABC):
+    """存储后端接口 (对象键不以 / 开头，不包含 . 或 .. 路径段)
+
+    缺少抽象方法的后端在实例化时即报错，而不是在处理请求时
+    """
+
+    # 是否可以通过 local_path 直接读写文件 (由 /uploads 静态文件挂载提供)
+    is_local = False
+
+    @abstractmethod
+    async def put(self, key: str, data: bytes, content_type: str | None = None): ...
+
+    @abstractmethod
+    async def open_writer(self, key: str, content_type: str | None = None) -> StorageWriter: ...
+
+    @abstractmethod
+    async def get(self, key: str) -> bytes:
+        """读取对象内容，不存在时抛出 FileNotFoundError"""
+
+    @abstractmethod
+    async def stat(self, key: str) -> StoredObject | None: ...
+
+    @abstractmethod
+    async def delete(self, keys: list[str]) -> list[str]:
+        """批量删除，返回已删除的键 (不存在的键忽略)"""
+
+    @abstractmethod
+    async def move(self, src: str, dest: str): ...
+
+    @abstractmethod
+    async def list_objects(
+        self, prefix: str, start_after: str = "", limit: int | None = None,
+    ) -> list[StoredObject]:
+        """prefix 下 (包括子目录) 键大于 start_after 的前 limit 个对象，按键排序
+
+        limit 为 None 时返回全部；分页读取时只获取这一页对象的大小和修改时间。
+        分页读取期间新增的对象不保证出现在后续页中 (本地存储按第一页时的快照分页)
+        """
+
+    @abstractmethod
+    async def list_folders(self) -> list[str]:
+        """顶层文件夹名，按名称排序"""
+
+    @abstractmethod
+    def url(self, key: str) -> str:
+        """浏览器可以直接访问的 URL (对象存储为预签名 URL)"""
+
+    def local_path(self, key: str) -> Path | None:
+        """对象在本机的文件路径，远程存储返回 None"""
+        return None
+
+    async def prune_folders(self, keep: str) -> int:
+        """清理空文件夹 (保留 keep)，返回删除的数量；对象存储没有文件夹，不需要清理"""
+        return 0
+
+    async def close(self):
+        pass
+
+
+def is_valid_key(key: str) -> bool:
+    return bool(key) and "\\" not in key and all(part not in ("", ".", "..") for part in key.split("/"))
+
+
+class _LocalWriter(StorageWriter):
+    def __init__(self, fh, path: Path):
+        self._fh = fh
+        self._path = path
+
+    async def write(self, data: bytes):
+        await asyncio.to_thread(self._fh.write, data)
+
+    async def close(self):
+        await asyncio.to_thread(self._fh.close)
+
+    async def abort(self):
+        await asyncio.to_thread(self._fh.close)
+        self._path.unlink(missing_ok=True)
+
+
+class LocalStorage(Storage):
+    """按对象键保存在本地目录中 (键中的 / 对应子目录)"""
+
+    is_local = True
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        # 分页列出时的键快照 (prefix, 排序后的键)，翻页时不再扫描目录
+        self._snapshot: tuple[str, list[str]] | None = None
+
+    def local_path(self, key: str) -> Path | None:
+        if not is_valid_key(key):
+            return None
+        root = self.root.resolve()
+        path = (root / key).resolve()
+        # 防止通过符号链接跳出上传目录
+        if root not in path.parents:
+            return None
+        return path
+
+    def _path(self, key: str) -> Path:
+        path = self.local_path(key)
+        if path is None:
+            raise StorageError(f"Invalid storage key: {key}")
+        return path
+
+    def _open(self, key: str):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return open(path, "wb"), path
+
+    async def open_writer(self, key: str, content_type: str | None = None) -> StorageWriter:
+        fh, path = await asyncio.to_thread(self._open, key)
+        return _LocalWriter(fh, path)
+
+    def _put(self, key: str, data: bytes):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # 先写入隐藏的临时文件再重命名，静态文件挂载不会读到写了一半的文件
+        fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    async def put(self, key: str, data: bytes, content_type: str | None = None):
+        await asyncio.to_thread(self._put, key, data)
+
+    async def get(self, key: str) -> bytes:
+        return await asyncio.to_thread(self._path(key).read_bytes)
+
+    def _stat(self, key: str) -> StoredObject | None:
+        try:
+            st = self._path(key).stat()
+        except FileNotFoundError:
+            return None
+        return StoredObject(key, st.st_size, st.st_mtime)
+
+    async def stat(self, key: str) -> StoredObject | None:
+        return await asyncio.to_thread(self._stat, key)
+
+    def _delete(self, keys: list[str]) -> list[str]:
+        deleted = []
+        for key in keys:
+            try:
+                self._path(key).unlink()
+                deleted.append(key)
+            except FileNotFoundError:
+                pass
+        return deleted
+
+    async def delete(self, keys: list[str]) -> list[str]:
+        if not keys:
+            return []
+        return await asyncio.to_thread(self._delete, keys)
+
+    def _move(self, src: str, dest: str):
+        dest_path = self._path(dest)
+        dest_path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(self._path(src), dest_path)
+
+    async def move(self, src: str, dest: str):
+        await asyncio.to_thread(self._move, src, dest)
+
+    def _scan(self, prefix: str) -> list[str]:
+        """prefix 下全部文件的键 (已排序)"""
+        # prefix 以 / 结尾时列出该目录，否则列出所在目录中以其开头的条目
+        directory, _, name_prefix = prefix.rpartition("/")
+        base = self.root / directory if directory else self.root
+        # 只收集文件名 (scandir 不需要 stat)，截取一页后再 stat
+        keys = []
+        stack = [(base, directory + "/" if directory else "")]
+        while stack:
+            path, key_prefix = stack.pop()
+            try:
+                entries = list(os.scandir(path))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            for entry in entries:
+                # 跳过隐藏文件 (写入中的临时文件、回收任务的状态文件)
+                if entry.name.startswith("."):
+                    continue
+                if path == base and not entry.name.startswith(name_prefix):
+                    continue
+                key = key_prefix + entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((Path(entry.path), key + "/"))
+                elif entry.is_file(follow_symlinks=False):
+                    keys.append(key)
+        keys.sort()
+        return keys
+
+    def _list(self, prefix: str, start_after: str, limit: int | None) -> list[StoredObject]:
+        """目录不能从某个文件名开始读取，分页时第一页 (start_after 为空) 扫描一次目录并保存快照，
+        之后的页从快照中截取，一遍分页读取的目录 I/O 与页数无关；
+        快照不包含之后新增的文件 (下一遍分页时会重新扫描)
+        """
+        snapshot = self._snapshot
+        if limit is not None and start_after and snapshot is not None and snapshot[0] == prefix:
+            keys = snapshot[1]
+        else:
+            keys = self._scan(prefix)
+        start = bisect.bisect_right(keys, start_after)
+        page = keys[start:] if limit is None else keys[start:start + limit]
+        if limit is not None:
+            # 读到不满一页 (最后一页) 后不再需要快照
+            self._snapshot = (prefix, keys) if start + limit <= len(keys) else None
+        objects = []
+        for key in page:
+            try:
+                st = os.stat(self.root / key, follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            objects.append(StoredObject(key, st.st_size, st.st_mtime))
+        return objects
+
+    async def list_objects(
+        self, prefix: str, start_after: str = "", limit: int | None = None,
+    ) -> list[StoredObject]:
+        return await asyncio.to_thread(self._list, prefix, start_after, limit)
+
+    def _list_folders(self) -> list[str]:
+        if not self.root.is_dir():
+            return []
+        return sorted(p.name for p in self.root.iterdir() if p.is_dir() and not p.name.startswith("."))
+
+    async def list_folders(self) -> list[str]:
+        return await asyncio.to_thread(self._list_folders)
+
+    def url(self, key: str) -> str:
+        return f"/uploads/{key}"
+
+    def _prune_folders(self, keep: str) -> int:
+        if not self.root.is_dir():
+            return 0
+        removed = 0
+        for folder in self.root.iterdir():
+            if not folder.is_dir() or folder.name == keep:
+                continue
+            variants = folder / "variants"
+            try:
+                if variants.is_dir() and not any(variants.iterdir()):
+                    variants.rmdir()
+                if not any(folder.iterdir()):
+                    folder.rmdir()
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+    async def prune_folders(self, keep: str) -> int:
+        """清理空的周文件夹 (包括只剩空 variants/ 的文件夹)
+
+        keep (当前周) 即使为空也保留: 上传时先建目录再写文件
+        """
+        return await asyncio.to_thread(self._prune_folders, keep)
+
+
+def create_storage() -> Storage:
+    """根据 STORAGE_BACKEND 创建存储后端"""
+    if settings.STORAGE_BACKEND == "s3":
+        from .s3_storage import S3Storage
+        return S3Storage.from_settings()
+    return LocalStorage(settings.UPLOAD_DIR)
+
+
+storage = create_storage()
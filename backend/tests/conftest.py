@@ -0,0 +1,56 @@
+"""
+测试公共设置
+- 导入 backend 之前把数据库、上传目录、备份目录等指向临时目录，测试不会写入仓库中的文件
+- 定时备份、上传回收、计数器校正等后台任务在测试中禁用
+- app 的生命周期 (迁移、启动任务) 在整个测试会话中只运行一次，各测试用唯一的数据区分彼此
+运行 (在仓库根目录):
+    python -m pytest backend/tests
+"""
+import os
+import tempfile
+import pytest
+
+TEST_DIR = tempfile.mkdtemp(prefix="qa_box_test_")
+os.environ.update({
+    "DATABASE_URL": f"sqlite+aiosqlite:///{TEST_DIR}/qa_box.db",
+    "UPLOAD_DIR": os.path.join(TEST_DIR, "uploads"),
+    "BACKUP_DIR": os.path.join(TEST_DIR, "backups"),
+    "METRICS_DIR": "",
+    "LOG_FILE": "",
+    "STORAGE_BACKEND": "local",
+    "IMAGE_VARIANT_WIDTHS": "",
+    "BACKUP_INTERVAL_HOURS": "0",
+    "UPLOAD_GC_INTERVAL_SECONDS": "0",
+    "STATS_RECONCILE_INTERVAL_HOURS": "0",
+    "ADMIN_USERNAME": "admin",
+    "ADMIN_PASSWORD": "test-password",
+})
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from backend.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def admin_prefix() -> str:
+    from backend.config import settings
+    return "/api" + settings.ADMIN_ROUTE_PREFIX
+
+
+@pytest.fixture
+def admin_headers(client, admin_prefix) -> dict:
+    """每个测试重新登录，注销等操作不影响其他测试"""
+    response = client.post(f"{admin_prefix}/login", json={"username": "admin", "password": "test-password"})
+    assert response.status_code == 200
+    return {"Authorization": "Bearer " + response.json()["access_token"]}
+
+
+@pytest.fixture
+def run_in_app(client):
+    """在 app 的事件循环中执行协程函数 (数据库连接池绑定该事件循环)"""
+    return client.portal.call
@@ -0,0 +1,120 @@
+"""Token 校验缓存与吊销列表: 注销立即生效，其他 worker 增量加载新的吊销记录"""
+import sqlite3
+from backend import auth, models
+from backend.config import settings
+from .conftest import TEST_DIR
+
+
+def _revoked_keys() -> set[str]:
+    with sqlite3.connect(f"{TEST_DIR}/qa_box.db") as conn:
+        return {row[0] for row in conn.execute("SELECT key FROM revoked_tokens")}
+
+
+def test_logout_revokes_token(client, admin_prefix, admin_headers):
+    assert client.get(f"{admin_prefix}/questions", headers=admin_headers).status_code == 200
+    assert client.post(f"{admin_prefix}/logout", headers=admin_headers).status_code == 200
+    assert client.get(f"{admin_prefix}/questions", headers=admin_headers).status_code == 401
+    token = admin_headers["Authorization"].split()[1]
+    assert auth.token_key(token) in _revoked_keys()
+
+
+def test_other_logins_stay_valid(client, admin_prefix, admin_headers):
+    other = client.post(
+        f"{admin_prefix}/login", json={"username": "admin", "password": "test-password"}
+    ).json()["access_token"]
+    client.post(f"{admin_prefix}/logout", headers=admin_headers)
+    assert client.get(f"{admin_prefix}/questions", headers={"Authorization": f"Bearer {other}"}).status_code == 200
+
+
+def test_invalid_tokens_are_rejected(client, admin_prefix):
+    question = client.post("/api/questions", json={"content": "auth"}).json()
+    for token in ["garbage", question["access_token"]]:
+        response = client.get(f"{admin_prefix}/questions", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 401
+
+
+def test_revocation_list_loads_incrementally(client, admin_prefix, run_in_app):
+    """模拟另一个 worker 的副本: 首次全量加载，之后只加载代数更新的记录"""
+    other_worker = auth.RevocationList(settings.AUTH_REVOCATION_TTL_MS / 1000)
+    run_in_app(other_worker.refresh)
+    loaded = dict(other_worker._keys)
+    generation = other_worker._generation
+
+    headers = {"Authorization": "Bearer " + client.post(
+        f"{admin_prefix}/login", json={"username": "admin", "password": "test-password"}
+    ).json()["access_token"]}
+    client.post(f"{admin_prefix}/logout", headers=headers)
+
+    queries = []
+
+    async def refresh_and_capture():
+        from sqlalchemy import event
+        from backend import database
+
+        def on_execute(conn, cursor, statement, parameters, context, executemany):
+            queries.append(statement)
+
+        engine = database.read_engine.sync_engine
+        event.listen(engine, "before_cursor_execute", on_execute)
+        try:
+            other_worker._checked_at = 0.0
+            await other_worker.refresh()
+        finally:
+            event.remove(engine, "before_cursor_execute", on_execute)
+
+    run_in_app(refresh_and_capture)
+    token_key = auth.token_key(headers["Authorization"].split()[1])
+    assert other_worker._generation > generation
+    assert token_key in other_worker._keys
+    assert loaded.keys() <= other_worker._keys.keys()
+    # 增量查询只读取新代数的记录
+    assert any(models.RevokedToken.__tablename__ in q and "generation >" in q for q in queries)
+
+
+def test_deleting_questions_does_not_grow_revocation_list(client, admin_prefix, admin_headers):
+    before = _revoked_keys()
+    created = [client.post("/api/questions", json={"content": f"delete {i}"}).json() for i in range(3)]
+    assert client.post("/api/questions/revoke", json={"token": created[0]["access_token"]}).status_code == 200
+    client.delete(f"{admin_prefix}/questions/{created[1]['question_id']}", headers=admin_headers)
+    client.post(f"{admin_prefix}/questions/bulk", headers=admin_headers, json={
+        "operations": [{"action": "delete", "ids": [created[2]["question_id"]]}],
+    })
+    assert _revoked_keys() == before
+    # 已删除问题的提问者 Token 无法再操作
+    assert client.post("/api/questions/revoke", json={"token": created[0]["access_token"]}).status_code == 404
+
+
+def _login(client, admin_prefix) -> str:
+    return client.post(
+        f"{admin_prefix}/login", json={"username": "admin", "password": "test-password"}
+    ).json()["access_token"]
+
+
+def test_refreshed_token_keeps_session(client, admin_prefix, monkeypatch):
+    token = _login(client, admin_prefix)
+    monkeypatch.setattr(settings, "ADMIN_TOKEN_REFRESH_DAYS", settings.ADMIN_TOKEN_EXPIRE_DAYS + 1)
+    response = client.get(f"{admin_prefix}/questions", headers={"Authorization": f"Bearer {token}"})
+    refreshed = response.headers["X-New-Token"]
+    assert refreshed != token
+    assert auth.decode_token(refreshed)["sid"] == auth.decode_token(token)["sid"]
+
+
+def test_logout_revokes_refresh_tokens_from_other_workers(client, admin_prefix):
+    """其他 worker 为同一会话续期签发的 Token 不在本 worker 的缓存中，注销时按会话吊销"""
+    token = _login(client, admin_prefix)
+    other = _login(client, admin_prefix)
+    session_id = auth.decode_token(token)["sid"]
+    refreshed_elsewhere = auth.create_admin_token("admin", session_id=session_id)["access_token"]
+
+    assert client.post(f"{admin_prefix}/logout", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+    for revoked in (token, refreshed_elsewhere):
+        assert client.get(f"{admin_prefix}/questions", headers={"Authorization": f"Bearer {revoked}"}).status_code == 401
+    assert client.get(f"{admin_prefix}/questions", headers={"Authorization": f"Bearer {other}"}).status_code == 200
+    assert auth.session_key(session_id) in _revoked_keys()
+
+
+def test_logout_with_refreshed_token_revokes_original(client, admin_prefix):
+    token = _login(client, admin_prefix)
+    refreshed = auth.create_admin_token("admin", session_id=auth.decode_token(token)["sid"])["access_token"]
+    client.post(f"{admin_prefix}/logout", headers={"Authorization": f"Bearer {refreshed}"})
+    assert client.get(f"{admin_prefix}/questions", headers={"Authorization": f"Bearer {token}"}).status_code == 401
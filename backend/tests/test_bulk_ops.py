@@ -0,0 +1,99 @@
+"""管理端批量操作: 按顺序在同一事务中执行，任一失败全部回滚，图片引用数随删除释放"""
+import sqlite3
+import uuid
+from types import SimpleNamespace
+import pytest
+from backend import bulk_ops, database
+from .conftest import TEST_DIR
+
+
+def _questions(client, count: int, images=()) -> list[str]:
+    return [
+        client.post("/api/questions", json={"content": "bulk", "images": list(images)}).json()["question_id"]
+        for _ in range(count)
+    ]
+
+
+def _state(ids: list[str]) -> dict:
+    with sqlite3.connect(f"{TEST_DIR}/qa_box.db") as conn:
+        marks = ",".join("?" * len(ids))
+        return {row[0]: row[1:] for row in conn.execute(
+            f"SELECT id, is_answered, is_public, answered_at IS NOT NULL FROM questions WHERE id IN ({marks})", ids
+        )}
+
+
+def _bulk(client, admin_prefix, headers, operations):
+    return client.post(f"{admin_prefix}/questions/bulk", headers=headers, json={"operations": operations})
+
+
+def test_operations_apply_in_order(client, admin_prefix, admin_headers):
+    ids = _questions(client, 4)
+    missing = str(uuid.uuid4())
+    response = _bulk(client, admin_prefix, admin_headers, [
+        {"action": "mark_answered", "ids": ids[:3] + [missing]},
+        {"action": "publish", "ids": ids[:3] + ids[:1]},
+        {"action": "unpublish", "ids": ids[2:3]},
+        {"action": "delete", "ids": ids[3:]},
+    ])
+    assert response.status_code == 200
+    assert response.json()["results"] == [
+        {"action": "mark_answered", "requested": 4, "affected": 3},
+        {"action": "publish", "requested": 3, "affected": 3},
+        {"action": "unpublish", "requested": 1, "affected": 1},
+        {"action": "delete", "requested": 1, "affected": 1},
+    ]
+    assert _state(ids) == {
+        ids[0]: (1, 1, 1),
+        ids[1]: (1, 1, 1),
+        ids[2]: (1, 0, 1),
+    }
+    # 已回答的问题出现在公开列表中
+    feed = client.get("/api/public/questions", params={"limit": 5}).json()
+    assert set(ids[:2]) <= {item["id"] for item in feed}
+
+
+def test_delete_releases_image_references(client, admin_prefix, admin_headers):
+    url = client.post(
+        "/api/upload", files={"file": ("a.png", b"\x89PNG\r\n\x1a\n" + uuid.uuid4().bytes * 16, "image/png")},
+    ).json()["url"]
+    ids = _questions(client, 2, images=[url, url])
+    with sqlite3.connect(f"{TEST_DIR}/qa_box.db") as conn:
+        assert conn.execute("SELECT ref_count FROM uploads WHERE url = ?", (url,)).fetchone() == (2,)
+
+    response = _bulk(client, admin_prefix, admin_headers, [{"action": "delete", "ids": ids}])
+    assert response.json()["pending_image_deletions"] == 1
+    with sqlite3.connect(f"{TEST_DIR}/qa_box.db") as conn:
+        assert conn.execute("SELECT ref_count FROM uploads WHERE url = ?", (url,)).fetchone() == (0,)
+
+
+def test_too_many_ids_rejected(client, admin_prefix, admin_headers, monkeypatch):
+    ids = _questions(client, 3)
+    monkeypatch.setattr(bulk_ops, "MAX_BULK_IDS", 2)
+    response = _bulk(client, admin_prefix, admin_headers, [
+        {"action": "publish", "ids": ids[:1]},
+        {"action": "delete", "ids": ids[1:]},
+    ])
+    assert response.status_code == 400
+    assert set(_state(ids)) == set(ids)
+    assert all(row == (0, 0, 0) for row in _state(ids).values())
+
+
+def test_failure_rolls_back_earlier_operations(client, run_in_app, monkeypatch):
+    ids = _questions(client, 2)
+
+    async def failing_delete(db, ids, released):
+        raise RuntimeError("delete failed")
+
+    monkeypatch.setattr(bulk_ops, "_apply_delete", failing_delete)
+    operations = [
+        SimpleNamespace(action="mark_answered", ids=ids[:1]),
+        SimpleNamespace(action="delete", ids=ids[1:]),
+    ]
+
+    async def apply():
+        async with database.AsyncSessionLocal() as db:
+            await bulk_ops.apply_bulk_operations(db, operations)
+
+    with pytest.raises(RuntimeError):
+        run_in_app(apply)
+    assert _state(ids) == {ids[0]: (0, 0, 0), ids[1]: (0, 0, 0)}
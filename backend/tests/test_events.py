@@ -0,0 +1,109 @@
+"""SSE 事件推送: Last-Event-ID 补发不重复，无法补发或连接积压溢出时发送 reset"""
+import asyncio
+import sqlite3
+from backend import events
+from backend.config import settings
+from .conftest import TEST_DIR
+
+
+def _event_ids(question_id: str) -> list[int]:
+    with sqlite3.connect(f"{TEST_DIR}/qa_box.db") as conn:
+        return [row[0] for row in conn.execute(
+            "SELECT id FROM question_events WHERE question_id = ? ORDER BY id", (question_id,)
+        )]
+
+
+def _question_with_events(client, admin_prefix, headers, count: int) -> str:
+    question_id = client.post("/api/questions", json={"content": "events"}).json()["question_id"]
+    for i in range(count):
+        client.put(f"{admin_prefix}/questions/{question_id}", headers=headers, json={"is_public": i % 2 == 0})
+    return question_id
+
+
+def _replay(run_in_app, question_ids, after_id):
+    from backend.database import ReadSessionLocal
+
+    async def replay():
+        async with ReadSessionLocal() as db:
+            return await events.broker.replay(db, question_ids, after_id)
+    return run_in_app(replay)
+
+
+def _read_stream(run_in_app, question_ids, last_event_id, publish=(), chunks=1):
+    """读取 event_stream 的前几段输出: 补发完成后发布 publish 中的事件，再读取 chunks 段"""
+    async def read():
+        stream = events.event_stream(question_ids, last_event_id)
+        try:
+            out = [await stream.__anext__()]  # retry: 之后订阅已生效
+            if last_event_id is not None:
+                out += [await asyncio.wait_for(stream.__anext__(), 5)
+                        for _ in _replayed(question_ids, last_event_id)]
+            for item in publish:
+                events.broker.publish(item)
+            for _ in range(chunks):
+                out.append(await asyncio.wait_for(stream.__anext__(), 5))
+            return out
+        finally:
+            await stream.aclose()
+    return run_in_app(read)
+
+
+def _replayed(question_ids, last_event_id):
+    with sqlite3.connect(f"{TEST_DIR}/qa_box.db") as conn:
+        marks = ",".join("?" * len(question_ids))
+        return conn.execute(
+            f"SELECT id FROM question_events WHERE id > ? AND question_id IN ({marks})",
+            (last_event_id, *question_ids),
+        ).fetchall()
+
+
+def test_replay_after_last_event_id(client, admin_prefix, admin_headers, run_in_app):
+    question_id = _question_with_events(client, admin_prefix, admin_headers, 3)
+    ids = _event_ids(question_id)
+    items, reset_id = _replay(run_in_app, [question_id], ids[0])
+    assert reset_id is None
+    assert [item["id"] for item in items] == ids[1:]
+    assert {item["question_id"] for item in items} == {question_id}
+
+
+def test_replay_resets_when_too_far_behind(client, admin_prefix, admin_headers, run_in_app, monkeypatch):
+    question_id = _question_with_events(client, admin_prefix, admin_headers, 4)
+    ids = _event_ids(question_id)
+    monkeypatch.setattr(settings, "EVENTS_QUEUE_SIZE", 2)
+    items, reset_id = _replay(run_in_app, [question_id], ids[0] - 1)
+    assert items == []
+    assert reset_id >= ids[-1]
+
+
+def test_replay_resets_when_events_were_pruned(client, admin_prefix, admin_headers, run_in_app):
+    question_id = _question_with_events(client, admin_prefix, admin_headers, 2)
+    ids = _event_ids(question_id)
+    with sqlite3.connect(f"{TEST_DIR}/qa_box.db") as conn:
+        conn.execute("DELETE FROM question_events WHERE id <= ?", (ids[0],))
+    items, reset_id = _replay(run_in_app, [question_id], ids[0] - 1)
+    assert items == []
+    assert reset_id >= ids[-1]
+
+
+def test_stream_drops_live_duplicates_of_replayed_events(client, admin_prefix, admin_headers, run_in_app):
+    question_id = _question_with_events(client, admin_prefix, admin_headers, 2)
+    ids = _event_ids(question_id)
+    # 补发期间已推送的事件再次从中继到达，应被丢弃；之后的新事件照常推送
+    duplicate = {"id": ids[-1], "question_id": question_id, "kind": "updated", "payload": {}}
+    fresh = {"id": ids[-1] + 10_000, "question_id": question_id, "kind": "answered", "payload": {}}
+    out = _read_stream(run_in_app, [question_id], ids[0] - 1, publish=[duplicate, fresh])
+    assert out[0].startswith("retry:")
+    assert [chunk.split("\n")[0] for chunk in out[1:]] == [f"id: {i}" for i in ids] + [f"id: {fresh['id']}"]
+
+
+def test_stream_sends_reset_when_subscriber_overflows(run_in_app, monkeypatch):
+    monkeypatch.setattr(settings, "EVENTS_QUEUE_SIZE", 2)
+    question_id = "overflow-question"
+    items = [
+        {"id": 900_000 + i, "question_id": question_id, "kind": "updated", "payload": {}} for i in range(5)
+    ]
+    out = _read_stream(run_in_app, [question_id], None, publish=items + [
+        {"id": 900_010, "question_id": question_id, "kind": "answered", "payload": {}},
+    ], chunks=1)
+    # 积压的事件被丢弃，发送 reset (ID 为丢弃的最大事件 ID)
+    assert out[1] == events.format_reset(900_010)
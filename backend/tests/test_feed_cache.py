@@ -0,0 +1,107 @@
+"""公开列表缓存: 响应带 ETag，未变化时返回 304；写操作递增代数，其他 worker 的写入在 TTL 后可见"""
+import sqlite3
+from backend import database, image_variants
+from backend.feed_cache import etag_matches, public_feed_cache
+from .conftest import TEST_DIR
+
+
+def _feed(client, etag: str | None = None):
+    headers = {"If-None-Match": etag} if etag else {}
+    return client.get("/api/public/questions", params={"limit": 5}, headers=headers)
+
+
+def _generation() -> int:
+    with sqlite3.connect(f"{TEST_DIR}/qa_box.db") as conn:
+        return conn.execute("SELECT value FROM generations WHERE name = 'public_feed'").fetchone()[0]
+
+
+def _answered_question(client, admin_prefix, headers, content: str) -> str:
+    question_id = client.post("/api/questions", json={"content": content}).json()["question_id"]
+    client.post(
+        f"{admin_prefix}/questions/{question_id}/answer", headers=headers,
+        json={"answer_content": "answer", "is_public": True},
+    )
+    return question_id
+
+
+def test_unchanged_feed_returns_304(client):
+    first = _feed(client)
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and etag.startswith(f'"{_generation()}-')
+
+    repeat = _feed(client, etag)
+    assert repeat.status_code == 304
+    assert repeat.headers["ETag"] == etag and repeat.content == b""
+    assert _feed(client, f'"stale", {etag}').status_code == 304
+    assert _feed(client, '"stale"').status_code == 200
+
+
+def test_writes_bump_generation_and_etag(client, admin_prefix, admin_headers):
+    etag = _feed(client).headers["ETag"]
+    before = _generation()
+    question_id = _answered_question(client, admin_prefix, admin_headers, "feed cache answered")
+    assert _generation() == before + 1
+
+    response = _feed(client, etag)
+    assert response.status_code == 200 and response.headers["ETag"] != etag
+    assert response.json()[0]["id"] == question_id
+
+    etag = response.headers["ETag"]
+    client.put(f"{admin_prefix}/questions/{question_id}", headers=admin_headers, json={"is_public": False})
+    response = _feed(client, etag)
+    assert response.status_code == 200
+    assert question_id not in [item["id"] for item in response.json()]
+
+    client.put(f"{admin_prefix}/questions/{question_id}", headers=admin_headers, json={"is_public": True})
+    etag = _feed(client).headers["ETag"]
+    client.delete(f"{admin_prefix}/questions/{question_id}", headers=admin_headers)
+    response = _feed(client, etag)
+    assert response.status_code == 200
+    assert question_id not in [item["id"] for item in response.json()]
+    assert _generation() == before + 4
+
+
+def test_other_worker_bump_visible_after_ttl(client, admin_prefix, admin_headers, monkeypatch):
+    question_id = _answered_question(client, admin_prefix, admin_headers, "other worker")
+    monkeypatch.setattr(public_feed_cache, "generation_ttl", 3600)
+    etag = _feed(client).headers["ETag"]
+    # 模拟另一个 worker 的写入: 只修改数据库，本 worker 的缓存不知情
+    with sqlite3.connect(f"{TEST_DIR}/qa_box.db") as conn:
+        conn.execute("UPDATE questions SET answer_content = 'changed elsewhere' WHERE id = ?", (question_id,))
+        conn.execute("UPDATE generations SET value = value + 1 WHERE name = 'public_feed'")
+    assert _feed(client, etag).status_code == 304
+
+    monkeypatch.setattr(public_feed_cache, "_checked_at", 0.0)
+    response = _feed(client, etag)
+    assert response.status_code == 200
+    assert response.headers["ETag"].startswith(f'"{_generation()}-')
+    assert response.json()[0]["answer_content"] == "changed elsewhere"
+
+
+def test_in_public_feed(client, admin_prefix, admin_headers, run_in_app):
+    url = client.post(
+        "/api/upload", files={"file": ("a.png", b"\x89PNG\r\n\x1a\n" + b"feed" * 64, "image/png")},
+    ).json()["url"]
+
+    async def in_feed():
+        async with database.AsyncSessionLocal() as db:
+            return await image_variants._in_public_feed(db, url)
+
+    assert not run_in_app(in_feed)
+    question_id = client.post("/api/questions", json={"content": "img", "images": [url]}).json()["question_id"]
+    assert not run_in_app(in_feed)  # 未回答
+    client.post(
+        f"{admin_prefix}/questions/{question_id}/answer", headers=admin_headers,
+        json={"answer_content": "answer", "is_public": False},
+    )
+    assert not run_in_app(in_feed)  # 未公开
+    client.put(f"{admin_prefix}/questions/{question_id}", headers=admin_headers, json={"is_public": True})
+    assert run_in_app(in_feed)
+
+
+def test_etag_matches():
+    assert etag_matches('"1-abc"', '"1-abc"')
+    assert etag_matches('"0-x", "1-abc"', '"1-abc"')
+    assert etag_matches("*", '"1-abc"')
+    assert not etag_matches(None, '"1-abc"')
+    assert not etag_matches('"0-abc"', '"1-abc"')
@@ -0,0 +1,93 @@
+"""启动任务: 同一数据库只有一个 leader worker 执行备份等后台任务，启动备份在后台进行且不重复"""
+import asyncio
+from collections import namedtuple
+import pytest
+from backend import backup
+from backend.backup import BackupManager
+from backend.config import settings
+from backend.leader import LeaderElection, default_lock_path, leader
+
+
+def test_lock_is_exclusive(tmp_path):
+    path = str(tmp_path / "qa_box.db.leader.lock")
+    first, second = LeaderElection(path, 0), LeaderElection(path, 0)
+    assert first.try_acquire() and first.try_acquire()
+    assert not second.try_acquire() and not second.is_leader
+    first.release()
+    assert second.try_acquire() and second.is_leader
+    second.release()
+
+
+def test_app_worker_holds_default_lock(client):
+    assert leader.is_leader
+    other = LeaderElection(default_lock_path(), 0)
+    assert not other.try_acquire()
+
+
+def test_follower_takes_over_after_leader_exits(tmp_path):
+    path = str(tmp_path / "leader.lock")
+    elected = []
+
+    async def run():
+        current, follower = LeaderElection(path, 0.01), LeaderElection(path, 0.01)
+        await current.start(lambda: _record(elected, "current"))
+        await follower.start(lambda: _record(elected, "follower"))
+        await asyncio.sleep(0.05)
+        assert elected == ["current"] and not follower.is_leader
+        current.stop()
+        for _ in range(100):
+            if follower.is_leader:
+                break
+            await asyncio.sleep(0.01)
+        follower.stop()
+
+    asyncio.run(run())
+    assert elected == ["current", "follower"]
+
+
+def test_no_retry_when_disabled(tmp_path):
+    path = str(tmp_path / "leader.lock")
+
+    async def run():
+        current, follower = LeaderElection(path, 0), LeaderElection(path, 0)
+        assert current.try_acquire()
+        await follower.start(lambda: _record([], "follower"))
+        assert follower._task is None
+        current.release()
+
+    asyncio.run(run())
+
+
+async def _record(elected: list, name: str):
+    elected.append(name)
+
+
+@pytest.fixture
+def manager(client, tmp_path, monkeypatch) -> BackupManager:
+    monkeypatch.setattr(settings, "BACKUP_DIR", str(tmp_path / "backups"))
+    monkeypatch.setattr(settings, "BACKUP_COMPRESSION", "gzip")
+    return BackupManager()
+
+
+def test_startup_backup_runs_in_background(manager, monkeypatch):
+    monkeypatch.setattr(settings, "BACKUP_INTERVAL_HOURS", 0)
+    assert not manager.backup_dir.exists()  # 第一次备份时才创建
+
+    async def run():
+        await manager.start_scheduled_backup(backup_now=True)
+        await manager._task
+        # 数据库没有变化时不重复备份
+        assert await manager.run_backup() is None
+
+    asyncio.run(run())
+    [created] = manager.list_backups()
+    assert created["name"].endswith(".db.gz")
+    assert manager.verify_backup(manager.backup_dir / created["name"]) == (True, ["ok"])
+
+
+def test_backup_checks_free_space(manager, monkeypatch):
+    Usage = namedtuple("Usage", "total used free")
+    monkeypatch.setattr(backup.shutil, "disk_usage", lambda path: Usage(0, 0, 1))
+    assert manager._required_space("gzip") == 2 * manager._required_space("none") > 0
+    assert manager.create_backup(force=True) is None
+    assert list(manager.backup_dir.iterdir()) == []
@@ -0,0 +1,71 @@
+"""结构迁移: 迁移使用固定的 DDL，新库的结构与模型一致，基线迁移只创建最初的两张表"""
+import sqlite3
+import pytest
+from sqlalchemy import create_engine
+from backend import migrations, models
+from backend.database import Base
+
+
+def _schema(path: str) -> dict:
+    """表 -> 列 (名称, 类型, 非空, 主键)，以及索引名"""
+    with sqlite3.connect(path) as conn:
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+            " AND name NOT LIKE 'questions_fts%'"
+        )]
+        schema = {
+            table: {(row[1], row[2], bool(row[3]), bool(row[5])) for row in conn.execute(f"PRAGMA table_info({table})")}
+            for table in tables
+        }
+        indexes = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"
+        )}
+    return {"tables": schema, "indexes": indexes}
+
+
+def _migrate(path: str, target: int | None = None):
+    engine = create_engine(f"sqlite:///{path}")
+    steps = migrations.MIGRATIONS
+    try:
+        if target is not None:
+            steps = [step for step in steps if step[0] <= target]
+        with engine.begin() as conn:
+            for version, _, func in steps:
+                func(conn)
+                conn.exec_driver_sql(f"PRAGMA user_version = {version}")
+    finally:
+        engine.dispose()
+
+
+def test_baseline_creates_only_original_tables(tmp_path):
+    path = str(tmp_path / "baseline.db")
+    _migrate(path, target=1)
+    assert set(_schema(path)["tables"]) == {"questions", "admin_users"}
+
+
+def test_migrated_schema_matches_models(tmp_path):
+    migrated, declared = str(tmp_path / "migrated.db"), str(tmp_path / "declared.db")
+    _migrate(migrated)
+    engine = create_engine(f"sqlite:///{declared}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+    actual, expected = _schema(migrated), _schema(declared)
+    assert models.Upload.__tablename__ in expected["tables"]
+    for table, columns in expected["tables"].items():
+        assert actual["tables"].get(table) == columns, table
+    assert expected["indexes"] <= actual["indexes"]
+
+
+@pytest.mark.parametrize("version", [m[0] for m in migrations.MIGRATIONS])
+def test_migrations_are_repeatable(tmp_path, version):
+    """每个迁移在已升级的库上重复执行不报错 (手动修改过结构的数据库)"""
+    path = str(tmp_path / "repeat.db")
+    _migrate(path)
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        with engine.begin() as conn:
+            func = next(f for v, _, f in migrations.MIGRATIONS if v == version)
+            func(conn)
+    finally:
+        engine.dispose()
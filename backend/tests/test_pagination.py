@@ -0,0 +1,121 @@
+"""游标分页: 翻页期间插入新问题不重复、不遗漏；排序值为 NULL 的行排在最后"""
+import uuid
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import insert, select
+from backend import models
+from backend.pagination import paginate, encode_cursor, InvalidCursor
+from backend.benchmarks.common import make_engine, make_sessionmaker, create_schema
+
+BASE_TIME = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """独立的临时数据库 (按生产环境的迁移建表)"""
+    engine = make_engine(str(tmp_path / "pagination.db"))
+    asyncio.run(create_schema(engine))
+    yield make_sessionmaker(engine)
+    asyncio.run(engine.dispose())
+
+
+def _question(created_at: datetime | None, **kwargs) -> dict:
+    return {"id": str(uuid.uuid4()), "content": "q", "created_at": created_at, **kwargs}
+
+
+async def _insert(session_factory, questions: list[dict]):
+    # 使用 Core INSERT: 显式的 None 写入 NULL，不会被 created_at 的默认值替换
+    async with session_factory() as db:
+        for question in questions:
+            await db.execute(insert(models.Question).values(**question))
+        await db.commit()
+
+
+async def _walk(session_factory, stmt, sort_column, limit: int, between_pages=None) -> list[str]:
+    """按游标翻完全部页，返回依次得到的问题 ID"""
+    ids = []
+    cursor = None
+    while True:
+        async with session_factory() as db:
+            rows, cursor = await paginate(db, stmt, sort_column, limit, cursor=cursor)
+        ids += [row.id for row in rows]
+        if cursor is None:
+            return ids
+        if between_pages is not None:
+            await between_pages()
+
+
+def _expected_order(questions: list[dict], sort_key: str) -> list[str]:
+    """(排序值 DESC, id DESC)，排序值为 NULL 的行按 id DESC 排在最后"""
+    with_value = sorted(
+        (q for q in questions if q.get(sort_key) is not None),
+        key=lambda q: (q[sort_key], q["id"]), reverse=True,
+    )
+    without_value = sorted((q for q in questions if q.get(sort_key) is None), key=lambda q: q["id"], reverse=True)
+    return [q["id"] for q in with_value + without_value]
+
+
+def test_cursor_pages_are_stable_under_concurrent_inserts(session_factory):
+    # 包含排序值相同的行 (按 id 区分先后) 和排序值为 NULL 的行
+    questions = [_question(BASE_TIME + timedelta(minutes=i // 3)) for i in range(23)]
+    questions += [_question(None) for _ in range(5)]
+    expected = _expected_order(questions, "created_at")
+    asyncio.run(_insert(session_factory, questions))
+
+    inserted = []
+
+    async def insert_newer():
+        newer = _question(datetime(2030, 1, 1) + timedelta(seconds=len(inserted)))
+        inserted.append(newer["id"])
+        await _insert(session_factory, [newer])
+
+    ids = asyncio.run(_walk(session_factory, select(models.Question), models.Question.created_at, 4, insert_newer))
+    assert inserted
+    assert ids == expected
+
+
+@pytest.mark.parametrize("limit", [1, 3, 7, 50])
+def test_null_sort_values_form_the_tail(session_factory, limit):
+    answered = [
+        _question(BASE_TIME, is_answered=True, is_public=True, answered_at=BASE_TIME + timedelta(hours=i))
+        for i in range(6)
+    ]
+    # 旧数据中已回答但没有 answered_at 的问题
+    legacy = [_question(BASE_TIME, is_answered=True, is_public=True, answered_at=None) for _ in range(4)]
+    hidden = [_question(BASE_TIME, is_answered=False, is_public=True)]
+    asyncio.run(_insert(session_factory, answered + legacy + hidden))
+
+    stmt = (
+        select(models.Question)
+        .where(models.Question.is_answered == True)
+        .where(models.Question.is_public == True)
+    )
+    ids = asyncio.run(_walk(session_factory, stmt, models.Question.answered_at, limit))
+    assert ids == _expected_order(answered + legacy, "answered_at")
+
+
+def test_offset_and_cursor_modes_agree(session_factory):
+    questions = [_question(BASE_TIME + timedelta(minutes=i % 4)) for i in range(10)] + [_question(None)]
+    asyncio.run(_insert(session_factory, questions))
+
+    async def first_pages():
+        async with session_factory() as db:
+            by_offset, _ = await paginate(db, select(models.Question), models.Question.created_at, 5, skip=5)
+            first, cursor = await paginate(db, select(models.Question), models.Question.created_at, 5)
+            by_cursor, _ = await paginate(db, select(models.Question), models.Question.created_at, 5, cursor=cursor)
+        return [q.id for q in by_offset], [q.id for q in by_cursor]
+
+    by_offset, by_cursor = asyncio.run(first_pages())
+    assert by_offset == by_cursor
+
+
+def test_invalid_cursor_is_rejected(session_factory):
+    async def fetch(cursor):
+        async with session_factory() as db:
+            await paginate(db, select(models.Question), models.Question.created_at, 5, cursor=cursor)
+
+    for cursor in ["not-a-cursor", encode_cursor(BASE_TIME, "x")[:-3] + "!!!"]:
+        with pytest.raises(InvalidCursor):
+            asyncio.run(fetch(cursor))
+
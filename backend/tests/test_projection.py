@@ -0,0 +1,89 @@
+"""字段投影: fields= / view=summary 只查询并返回请求的字段，未指定时输出完整问题"""
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from backend.projection import PREVIEW_LENGTH, SUMMARY_FIELDS, text_preview
+
+LONG_CONTENT = "<p>" + "字" * (PREVIEW_LENGTH + 50) + "</p>"
+
+
+@pytest.fixture
+def statements():
+    """记录执行的 SQL 语句"""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(Engine, "before_cursor_execute", record)
+
+
+def _question_selects(statements) -> list[str]:
+    return [s for s in statements if s.lstrip().startswith("SELECT") and "FROM questions" in s]
+
+
+@pytest.fixture
+def answered(client, admin_prefix, admin_headers) -> str:
+    question_id = client.post("/api/questions", json={"content": LONG_CONTENT}).json()["question_id"]
+    client.post(
+        f"{admin_prefix}/questions/{question_id}/answer", headers=admin_headers,
+        json={"answer_content": "<b>short</b> &amp; sweet", "is_public": True},
+    )
+    return question_id
+
+
+def test_batch_fields(client, answered, statements):
+    response = client.post("/api/questions/batch", params={"fields": "is_answered,answered_at"}, json=[answered])
+    assert response.status_code == 200
+    [item] = response.json()
+    assert set(item) == {"id", "is_answered", "answered_at"}
+    assert item["id"] == answered and item["is_answered"] is True
+    # 未请求的富文本列不会被查询
+    [select] = _question_selects(statements)
+    assert "questions.content" not in select and "questions.answer_content" not in select
+
+
+def test_summary_view(client, answered, statements):
+    response = client.post("/api/questions/batch", params={"view": "summary"}, json=[answered])
+    [item] = response.json()
+    assert tuple(item) == SUMMARY_FIELDS
+    assert item["content_preview"] == "字" * PREVIEW_LENGTH + "…"
+    assert item["answer_preview"] == "short & sweet"
+    [select] = _question_selects(statements)
+    assert "substr(questions.content" in select and "questions.images" not in select
+
+
+def test_public_and_admin_lists(client, admin_prefix, admin_headers, answered):
+    public = client.get("/api/public/questions", params={"limit": 1, "fields": "content"}).json()
+    assert public == [{"id": answered, "content": LONG_CONTENT}]
+
+    response = client.get(
+        f"{admin_prefix}/questions", headers=admin_headers, params={"limit": 1, "view": "summary"},
+    )
+    assert response.status_code == 200 and tuple(response.json()[0]) == SUMMARY_FIELDS
+    # 投影不影响游标分页
+    assert response.headers["X-Next-Cursor"]
+
+
+def test_full_output_by_default(client, answered):
+    [item] = client.post("/api/questions/batch", json=[answered]).json()
+    assert {"content", "images", "answer_content", "answer_images", "srcset"} <= set(item)
+
+
+@pytest.mark.parametrize("params", [
+    {"fields": "id,password"},
+    {"view": "compact"},
+    {"fields": "id", "view": "summary"},
+])
+def test_invalid_projection(client, admin_prefix, admin_headers, params):
+    assert client.get("/api/public/questions", params=params).status_code == 400
+    assert client.post("/api/questions/batch", params=params, json=[]).status_code == 400
+    assert client.get(f"{admin_prefix}/questions", headers=admin_headers, params=params).status_code == 400
+
+
+def test_text_preview():
+    assert text_preview(None) is None
+    assert text_preview("<p>a</p>\n\n<p>b   c</p>") == "a b c"
+    assert text_preview("x" * 10 + "<br>" * 500 + "y") == "x" * 10 + " y"
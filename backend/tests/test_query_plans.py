@@ -0,0 +1,64 @@
+"""列表热点查询的 EXPLAIN QUERY PLAN: 第一页、游标页和 NULL 段都命中对应索引，不需要临时 B-Tree 排序"""
+import asyncio
+import pytest
+from backend import models
+from backend.pagination import encode_cursor
+from backend.benchmarks.common import make_engine, make_sessionmaker, create_schema, seed_questions
+from backend.benchmarks.check_query_plans import HOT_QUERIES, capture_plans
+
+ROWS = 5000
+
+
+@pytest.fixture(scope="module")
+def plan_db(tmp_path_factory):
+    db_path = str(tmp_path_factory.mktemp("plans") / "plan.db")
+    engine = make_engine(db_path)
+    asyncio.run(create_schema(engine))
+    seed_questions(db_path, ROWS)
+
+    async def analyze():
+        async with engine.begin() as conn:
+            await conn.exec_driver_sql("ANALYZE")
+
+    asyncio.run(analyze())
+    yield engine, make_sessionmaker(engine)
+    asyncio.run(engine.dispose())
+
+
+@pytest.mark.parametrize("cursor_kind", ["first page", "cursor page", "null tail"])
+@pytest.mark.parametrize("name, build, sort_column, index_name", HOT_QUERIES, ids=[q[0] for q in HOT_QUERIES])
+def test_hot_queries_use_their_index(plan_db, cursor_kind, name, build, sort_column, index_name):
+    engine, session_factory = plan_db
+    stmt = build()
+
+    async def plans():
+        async with session_factory() as db:
+            result = await db.execute(
+                stmt.order_by(sort_column.desc(), models.Question.id.desc()).offset(ROWS // 4).limit(1)
+            )
+            middle = result.scalars().first()
+        cursor = {
+            "first page": None,
+            "cursor page": encode_cursor(getattr(middle, sort_column.key), middle.id),
+            "null tail": encode_cursor(None, middle.id),
+        }[cursor_kind]
+        return await capture_plans(engine, session_factory, stmt, sort_column, cursor)
+
+    captured = asyncio.run(plans())
+    assert captured
+    for statement, details in captured:
+        plan = " | ".join(details)
+        assert index_name in plan, plan
+        assert "TEMP B-TREE" not in plan, plan
+
+
+def test_migrations_create_list_indexes(plan_db):
+    engine, _ = plan_db
+
+    async def index_names():
+        async with engine.connect() as conn:
+            result = await conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'")
+            return {row[0] for row in result}
+
+    names = asyncio.run(index_names())
+    assert {"ix_questions_public_feed", "ix_questions_created_at_id", "ix_questions_answered_at"} <= names
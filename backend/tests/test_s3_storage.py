@@ -0,0 +1,392 @@
+"""S3 存储后端: 对一个校验 SigV4 签名的 MinIO 替身服务运行
+
+替身只实现 S3Storage 用到的接口 (对象读写、CopyObject、DeleteObjects、ListObjectsV2、分片上传、预签名 GET)，
+每个请求都按 AWS 的规则重新计算签名并比对，签名、分页或分片处理有误时测试失败
+"""
+import re
+import time
+import uuid
+import base64
+import asyncio
+import hashlib
+import socket
+import threading
+from datetime import datetime, timezone
+from email.utils import formatdate
+from urllib.parse import unquote, parse_qsl
+from xml.sax.saxutils import escape, unescape
+import httpx
+import pytest
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+from backend.s3_storage import S3Storage, sign_headers, presign_query, MIN_PART_SIZE, DELETE_BATCH_SIZE
+from backend.storage import StorageError
+
+ACCESS_KEY = "minio"
+SECRET_KEY = "minio-secret"
+REGION = "us-east-1"
+BUCKET = "qa-box"
+S3_NS = 'xmlns="http://s3.amazonaws.com/doc/2006-03-01/"'
+# 替身每页最多返回的条目数 (远小于 S3 的 1000)，测试中即可覆盖多页读取
+PAGE_SIZE = 3
+
+
+class FakeS3:
+    """内存中的 S3 兼容服务"""
+
+    def __init__(self):
+        self.objects: dict[tuple[str, str], tuple[bytes, float, str | None]] = {}
+        self.uploads: dict[str, dict[int, bytes]] = {}
+        self.requests: list[tuple[str, str, dict]] = []
+        self.app = Starlette(routes=[
+            Route("/{path:path}", self.handle, methods=["GET", "HEAD", "PUT", "POST", "DELETE"]),
+        ])
+
+    @staticmethod
+    def _error(code: str, status: int, message: str = "") -> Response:
+        return Response(
+            f"<Error><Code>{code}</Code><Message>{escape(message)}</Message></Error>",
+            status, media_type="application/xml",
+        )
+
+    @staticmethod
+    def _check_signature(request: Request, body: bytes) -> str | None:
+        """按收到的请求重新签名，返回不匹配的原因"""
+        path = unquote(request.scope["raw_path"].decode())
+        params = dict(parse_qsl(request.scope["query_string"].decode(), keep_blank_values=True))
+        if "X-Amz-Signature" in params:
+            signature = params.pop("X-Amz-Signature")
+            signed_at = datetime.strptime(params["X-Amz-Date"], "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+            expires = int(params["X-Amz-Expires"])
+            if time.time() > signed_at.timestamp() + expires:
+                return "presigned URL expired"
+            expected = presign_query(
+                request.method, request.headers["host"], path, ACCESS_KEY, SECRET_KEY, REGION, signed_at, expires,
+            )
+            return None if expected["X-Amz-Signature"] == signature else "presigned signature mismatch"
+        authorization = request.headers.get("authorization", "")
+        if not authorization:
+            return "missing authorization"
+        payload_hash = request.headers["x-amz-content-sha256"]
+        if payload_hash != hashlib.sha256(body).hexdigest():
+            return "payload hash mismatch"
+        signed_names = authorization.split("SignedHeaders=")[1].split(",")[0].split(";")
+        signed_at = datetime.strptime(request.headers["x-amz-date"], "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+        headers = {
+            name: request.headers[name] for name in signed_names
+            if name not in ("host", "x-amz-content-sha256", "x-amz-date")
+        }
+        expected = sign_headers(
+            request.method, request.headers["host"], path, params, headers, payload_hash,
+            ACCESS_KEY, SECRET_KEY, REGION, signed_at,
+        )
+        return None if expected["authorization"] == authorization else "signature mismatch"
+
+    async def handle(self, request: Request) -> Response:
+        body = await request.body()
+        problem = self._check_signature(request, body)
+        if problem:
+            return self._error("SignatureDoesNotMatch", 403, problem)
+        bucket, _, key = unquote(request.scope["raw_path"].decode()).lstrip("/").partition("/")
+        params = dict(parse_qsl(request.scope["query_string"].decode(), keep_blank_values=True))
+        method = request.method
+        self.requests.append((method, key, params))
+        if bucket != BUCKET:
+            return self._error("NoSuchBucket", 404)
+        if not key:
+            if method == "POST" and "delete" in params:
+                return self._delete_objects(request, body)
+            if method == "GET" and params.get("list-type") == "2":
+                return self._list_objects(params)
+        elif "uploads" in params and method == "POST":
+            upload_id = uuid.uuid4().hex
+            self.uploads[upload_id] = {}
+            return Response(
+                f"<InitiateMultipartUploadResult {S3_NS}><UploadId>{upload_id}</UploadId>"
+                f"</InitiateMultipartUploadResult>",
+                media_type="application/xml",
+            )
+        elif "uploadId" in params:
+            return self._multipart(method, key, params, body)
+        elif method == "PUT":
+            source = request.headers.get("x-amz-copy-source")
+            if source:
+                source_bucket, _, source_key = unquote(source).lstrip("/").partition("/")
+                if (source_bucket, source_key) not in self.objects:
+                    return self._error("NoSuchKey", 404)
+                data, _, content_type = self.objects[(source_bucket, source_key)]
+                self.objects[(bucket, key)] = (data, time.time(), content_type)
+                return Response(f"<CopyObjectResult {S3_NS}></CopyObjectResult>", media_type="application/xml")
+            self.objects[(bucket, key)] = (body, time.time(), request.headers.get("content-type"))
+            return Response(headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+        elif method in ("GET", "HEAD"):
+            if (bucket, key) not in self.objects:
+                return self._error("NoSuchKey", 404) if method == "GET" else Response(status_code=404)
+            data, modified, content_type = self.objects[(bucket, key)]
+            return Response(
+                data if method == "GET" else b"",
+                headers={"Last-Modified": formatdate(modified, usegmt=True), "Content-Length": str(len(data))},
+                media_type=content_type or "application/octet-stream",
+            )
+        elif method == "DELETE":
+            self.objects.pop((bucket, key), None)
+            return Response(status_code=204)
+        return self._error("NotImplemented", 501)
+
+    def _delete_objects(self, request: Request, body: bytes) -> Response:
+        if base64.b64encode(hashlib.md5(body).digest()).decode() != request.headers.get("content-md5"):
+            return self._error("BadDigest", 400)
+        keys = [unescape(k) for k in re.findall(r"<Key>(.*?)</Key>", body.decode())]
+        if len(keys) > DELETE_BATCH_SIZE:
+            return self._error("MalformedXML", 400, "too many keys")
+        for key in keys:
+            self.objects.pop((BUCKET, key), None)
+        deleted = "".join(f"<Deleted><Key>{escape(k)}</Key></Deleted>" for k in keys)
+        return Response(f"<DeleteResult {S3_NS}>{deleted}</DeleteResult>", media_type="application/xml")
+
+    def _list_objects(self, params: dict) -> Response:
+        prefix = params.get("prefix", "")
+        delimiter = params.get("delimiter")
+        after = max(params.get("continuation-token", ""), params.get("start-after", ""))
+        entries = {}
+        for bucket, key in self.objects:
+            if bucket != BUCKET or not key.startswith(prefix):
+                continue
+            rest = key[len(prefix):]
+            if delimiter and delimiter in rest:
+                common = prefix + rest.split(delimiter)[0] + delimiter
+                entries[common] = "prefix"
+            else:
+                entries[key] = "object"
+        names = sorted(name for name in entries if name > after)
+        page_size = min(PAGE_SIZE, int(params.get("max-keys", PAGE_SIZE)))
+        page, truncated = names[:page_size], len(names) > page_size
+        xml = [f"<ListBucketResult {S3_NS}><IsTruncated>{'true' if truncated else 'false'}</IsTruncated>"]
+        if truncated:
+            xml.append(f"<NextContinuationToken>{escape(page[-1])}</NextContinuationToken>")
+        for name in page:
+            if entries[name] == "prefix":
+                xml.append(f"<CommonPrefixes><Prefix>{escape(name)}</Prefix></CommonPrefixes>")
+                continue
+            data, modified, _ = self.objects[(BUCKET, name)]
+            last_modified = datetime.fromtimestamp(modified, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+            xml.append(
+                f"<Contents><Key>{escape(name)}</Key><Size>{len(data)}</Size>"
+                f"<LastModified>{last_modified}</LastModified></Contents>"
+            )
+        xml.append("</ListBucketResult>")
+        return Response("".join(xml), media_type="application/xml")
+
+    def _multipart(self, method: str, key: str, params: dict, body: bytes) -> Response:
+        upload_id = params["uploadId"]
+        if upload_id not in self.uploads:
+            return self._error("NoSuchUpload", 404)
+        if method == "PUT":
+            self.uploads[upload_id][int(params["partNumber"])] = body
+            return Response(headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+        if method == "DELETE":
+            del self.uploads[upload_id]
+            return Response(status_code=204)
+        parts = self.uploads.pop(upload_id)
+        numbers = sorted(parts)
+        if any(len(parts[n]) < MIN_PART_SIZE for n in numbers[:-1]):
+            return self._error("EntityTooSmall", 400)
+        self.objects[(BUCKET, key)] = (b"".join(parts[n] for n in numbers), time.time(), None)
+        return Response(
+            f"<CompleteMultipartUploadResult {S3_NS}><Key>{escape(key)}</Key></CompleteMultipartUploadResult>",
+            media_type="application/xml",
+        )
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def s3_server():
+    fake = FakeS3()
+    server = uvicorn.Server(uvicorn.Config(fake.app, host="127.0.0.1", port=_free_port(), log_level="warning", ws="none"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        assert time.monotonic() < deadline, "S3 stand-in did not start"
+        time.sleep(0.02)
+    fake.endpoint = f"http://127.0.0.1:{server.config.port}"
+    yield fake
+    server.should_exit = True
+    thread.join(timeout=10)
+
+
+@pytest.fixture
+def s3(s3_server):
+    """每个测试使用独立的键前缀，互不影响"""
+    s3_server.objects.clear()
+    s3_server.requests.clear()
+    return S3Storage(
+        s3_server.endpoint, BUCKET, ACCESS_KEY, SECRET_KEY, REGION,
+        key_prefix=f"test-{uuid.uuid4().hex[:8]}", presign_expires=600,
+    )
+
+
+def _run(storage: S3Storage, coro_fn):
+    """在新的事件循环中执行，结束时关闭连接池"""
+    async def main():
+        try:
+            return await coro_fn()
+        finally:
+            await storage.close()
+    return asyncio.run(main())
+
+
+def test_put_get_stat_delete(s3):
+    async def scenario():
+        await s3.put("2024-01-01/a b+c.png", b"png-bytes", "image/png")
+        assert await s3.get("2024-01-01/a b+c.png") == b"png-bytes"
+        info = await s3.stat("2024-01-01/a b+c.png")
+        assert info.key == "2024-01-01/a b+c.png" and info.size == 9
+        assert abs(info.modified - time.time()) < 60
+        assert await s3.stat("2024-01-01/missing.png") is None
+        with pytest.raises(FileNotFoundError):
+            await s3.get("2024-01-01/missing.png")
+        assert await s3.delete(["2024-01-01/a b+c.png", "2024-01-01/missing.png"]) == [
+            "2024-01-01/a b+c.png", "2024-01-01/missing.png",
+        ]
+        assert await s3.stat("2024-01-01/a b+c.png") is None
+
+    _run(s3, scenario)
+
+
+def test_keys_stored_under_prefix(s3, s3_server):
+    _run(s3, lambda: s3.put("2024-01-01/x.png", b"x"))
+    assert list(s3_server.objects) == [(BUCKET, s3.key_prefix + "2024-01-01/x.png")]
+
+
+def test_move(s3):
+    async def scenario():
+        await s3.put("staging/x.png", b"data", "image/png")
+        await s3.move("staging/x.png", "2024-01-01/x.png")
+        assert await s3.get("2024-01-01/x.png") == b"data"
+        assert await s3.stat("staging/x.png") is None
+
+    _run(s3, scenario)
+
+
+def test_delete_batches(s3, s3_server):
+    keys = [f"2024-01-01/{i:05d}.png" for i in range(DELETE_BATCH_SIZE + 5)]
+    for key in keys:
+        s3_server.objects[(BUCKET, s3.key_prefix + key)] = (b"", time.time(), None)
+    assert sorted(_run(s3, lambda: s3.delete(keys))) == keys
+    assert not s3_server.objects
+    batches = [r for r in s3_server.requests if r[0] == "POST" and "delete" in r[2]]
+    assert len(batches) == 2
+
+
+def test_list_objects_pages(s3, s3_server):
+    keys = [f"2024-01-01/{i:02d}.png" for i in range(8)] + ["2024-01-01/variants/00_320.webp"]
+    for key in keys + ["2024-01-08/other.png"]:
+        s3_server.objects[(BUCKET, s3.key_prefix + key)] = (b"abc", time.time(), None)
+
+    async def scenario():
+        everything = await s3.list_objects("2024-01-01/")
+        assert [o.key for o in everything] == sorted(keys)
+        assert all(o.size == 3 for o in everything)
+
+        # 带游标分页: 拼起来与一次性列出相同
+        seen, cursor = [], ""
+        for _ in range(len(keys)):
+            page = await s3.list_objects("2024-01-01/", start_after=cursor, limit=4)
+            seen += [o.key for o in page]
+            if len(page) < 4:
+                break
+            cursor = page[-1].key
+        assert seen == sorted(keys)
+
+        assert [o.key for o in await s3.list_objects("2024-01-01/", start_after="2024-01-01/05.png", limit=2)] == [
+            "2024-01-01/06.png", "2024-01-01/07.png",
+        ]
+        assert await s3.list_objects("2024-02-01/") == []
+        assert await s3.list_folders() == ["2024-01-01", "2024-01-08"]
+
+    _run(s3, scenario)
+    # limit 小于一页时只发一个请求
+    s3_server.requests.clear()
+    _run(s3, lambda: s3.list_objects("2024-01-01/", limit=2))
+    assert len(s3_server.requests) == 1
+    assert s3_server.requests[0][2]["max-keys"] == "2"
+
+
+def test_writer_small_object_uses_single_put(s3, s3_server):
+    async def scenario():
+        writer = await s3.open_writer("2024-01-01/small.bin", "application/octet-stream")
+        await writer.write(b"a" * 100)
+        await writer.write(b"b" * 100)
+        await writer.close()
+        return await s3.get("2024-01-01/small.bin")
+
+    assert _run(s3, scenario) == b"a" * 100 + b"b" * 100
+    assert [r[0] for r in s3_server.requests] == ["PUT", "GET"]
+
+
+def test_writer_multipart(s3, s3_server):
+    chunk = b"0123456789abcdef" * 65536  # 1MB
+
+    async def scenario():
+        writer = await s3.open_writer("2024-01-01/large.bin")
+        for _ in range(MIN_PART_SIZE // len(chunk) * 2 + 1):
+            await writer.write(chunk)
+        await writer.close()
+        return await s3.get("2024-01-01/large.bin")
+
+    data = _run(s3, scenario)
+    assert data == chunk * (MIN_PART_SIZE // len(chunk) * 2 + 1)
+    parts = [r for r in s3_server.requests if r[0] == "PUT" and "partNumber" in r[2]]
+    assert [r[2]["partNumber"] for r in parts] == ["1", "2"]
+    assert not s3_server.uploads
+
+
+def test_writer_abort(s3, s3_server):
+    async def scenario():
+        writer = await s3.open_writer("2024-01-01/aborted.bin")
+        await writer.write(b"x" * MIN_PART_SIZE)
+        await writer.abort()
+
+    _run(s3, scenario)
+    assert not s3_server.uploads
+    assert not s3_server.objects
+
+
+def test_bad_credentials_raise_storage_error(s3_server):
+    storage = S3Storage(s3_server.endpoint, BUCKET, ACCESS_KEY, "wrong-secret", REGION)
+    with pytest.raises(StorageError, match="403 SignatureDoesNotMatch"):
+        _run(storage, lambda: storage.put("2024-01-01/x.png", b"x"))
+    assert not s3_server.objects
+
+
+def test_presigned_url(s3):
+    _run(s3, lambda: s3.put("2024-01-01/photo 1.png", b"image-data", "image/png"))
+    url = s3.url("2024-01-01/photo 1.png")
+    # 同一时间段内 URL 不变，浏览器可以缓存
+    assert s3.url("2024-01-01/photo 1.png") == url
+
+    response = httpx.get(url)
+    assert response.status_code == 200
+    assert response.content == b"image-data"
+    assert response.headers["content-type"] == "image/png"
+
+    # 改动对象键后签名失效
+    tampered = url.replace("photo%201.png", "photo%202.png")
+    assert httpx.get(tampered).status_code == 403
+
+
+def test_public_url_skips_signing(s3_server):
+    storage = S3Storage(
+        s3_server.endpoint, BUCKET, ACCESS_KEY, SECRET_KEY, REGION,
+        key_prefix="media", public_url="https://cdn.example.com/",
+    )
+    assert storage.url("2024-01-01/a b.png") == "https://cdn.example.com/media/2024-01-01/a%20b.png"
@@ -0,0 +1,84 @@
+"""本地存储后端: 分页列出按第一页的目录快照翻页，每遍分页只扫描一次目录"""
+import os
+import asyncio
+import pytest
+from backend.storage import LocalStorage
+
+FOLDER = "2024-01-01"
+
+
+@pytest.fixture
+def local(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    for i in range(25):
+        storage._put(f"{FOLDER}/{i:02d}.png", b"x" * i)
+    storage._put(f"{FOLDER}/variants/00_320.webp", b"v")
+    storage._put(f"{FOLDER}/.gc_state.json", b"{}")
+    return storage
+
+
+@pytest.fixture
+def scandir_calls(monkeypatch):
+    calls = []
+    scandir = os.scandir
+
+    def counting(path):
+        calls.append(str(path))
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", counting)
+    return calls
+
+
+def _pages(storage: LocalStorage, limit: int) -> list[list[str]]:
+    async def read():
+        pages, after = [], ""
+        while True:
+            page = await storage.list_objects(f"{FOLDER}/", start_after=after, limit=limit)
+            pages.append([obj.key for obj in page])
+            if len(page) < limit:
+                return pages
+            after = page[-1].key
+    return asyncio.run(read())
+
+
+def test_pages_match_full_listing(local):
+    everything = asyncio.run(local.list_objects(f"{FOLDER}/"))
+    keys = [obj.key for obj in everything]
+    assert keys == sorted(keys) and len(keys) == 26
+    assert all(not os.path.basename(key).startswith(".") for key in keys)
+    assert everything[3].size == 3
+    assert sum(_pages(local, 10), []) == keys
+
+
+def test_directory_scanned_once_per_pass(local, scandir_calls):
+    pages = _pages(local, 5)
+    assert len(pages) == 6
+    # 文件夹和 variants 子目录各扫描一次，与页数无关
+    assert len(scandir_calls) == 2
+    assert local._snapshot is None
+
+    scandir_calls.clear()
+    _pages(local, 5)
+    assert len(scandir_calls) == 2
+
+
+def test_snapshot_tolerates_changes_between_pages(local):
+    async def read():
+        first = await local.list_objects(f"{FOLDER}/", limit=10)
+        local._delete([f"{FOLDER}/12.png"])
+        local._put(f"{FOLDER}/99.png", b"new")
+        return first, await local.list_objects(f"{FOLDER}/", start_after=first[-1].key, limit=10)
+
+    first, second = asyncio.run(read())
+    # 已删除的文件跳过，之后新增的文件留给下一遍
+    assert [obj.key for obj in second] == [f"{FOLDER}/{i:02d}.png" for i in (10, 11, 13, 14, 15, 16, 17, 18, 19)]
+    assert f"{FOLDER}/99.png" in sum(_pages(local, 10), [])
+
+
+def test_resume_without_snapshot_rescans(local):
+    """游标来自状态文件 (重启或其他 worker) 时重新扫描并从游标处继续"""
+    page = asyncio.run(local.list_objects(f"{FOLDER}/", start_after=f"{FOLDER}/20.png", limit=10))
+    assert [obj.key for obj in page] == [f"{FOLDER}/{i}.png" for i in range(21, 25)] + [
+        f"{FOLDER}/variants/00_320.webp",
+    ]
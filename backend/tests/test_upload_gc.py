@@ -0,0 +1,123 @@
+"""上传目录回收: 只删除过了宽限期且没有被引用的文件，游标逐页推进并在扫完全部文件夹后回到开头"""
+import os
+import sqlite3
+from datetime import datetime, timedelta
+from backend.upload_gc import UploadGC
+from .conftest import TEST_DIR
+
+UPLOAD_DIR = os.path.join(TEST_DIR, "uploads")
+OLD = datetime.utcnow() - timedelta(hours=48)
+
+
+def _file(folder: str, name: str, old: bool = True) -> str:
+    path = os.path.join(UPLOAD_DIR, folder, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"x" * 10)
+    if old:
+        os.utime(path, (OLD.timestamp(), OLD.timestamp()))
+    return path
+
+
+def _register(url: str, ref_count: int = 0, created_at: datetime = OLD):
+    with sqlite3.connect(f"{TEST_DIR}/qa_box.db") as conn:
+        conn.execute(
+            "INSERT INTO uploads (url, ref_count, created_at) VALUES (?, ?, ?)",
+            (url, ref_count, created_at.isoformat(sep=" ")),
+        )
+
+
+def _registered(url: str) -> bool:
+    with sqlite3.connect(f"{TEST_DIR}/qa_box.db") as conn:
+        return conn.execute("SELECT 1 FROM uploads WHERE url = ?", (url,)).fetchone() is not None
+
+
+def _gc(batch_size: int = 100, dry_run: bool = False) -> UploadGC:
+    return UploadGC(UPLOAD_DIR, batch_size=batch_size, grace_hours=24, dry_run=dry_run)
+
+
+def test_grace_period_and_references(client, run_in_app):
+    folder = "2001-01-01"
+    paths = {name: _file(folder, name) for name in (
+        "orphan.png", "released.png", "recent_release.png", "referenced.png", "unregistered_ref.png",
+    )}
+    paths["new.png"] = _file(folder, "new.png", old=False)
+
+    def url(name: str) -> str:
+        return f"/uploads/{folder}/{name}"
+
+    _register(url("released.png"))
+    _register(url("recent_release.png"), created_at=datetime.utcnow())
+    _register(url("referenced.png"), ref_count=1)
+    client.post("/api/questions", json={"content": "gc", "images": [url("unregistered_ref.png")]})
+    with sqlite3.connect(f"{TEST_DIR}/qa_box.db") as conn:
+        conn.execute("DELETE FROM uploads WHERE url = ?", (url("unregistered_ref.png"),))
+
+    report = run_in_app(_gc().run_once, {"folder": folder, "after": ""})
+    assert report["folder"] == folder and report["scanned"] == 6
+    assert report["referenced"] == [url("unregistered_ref.png")]
+    assert report["deleted"] == 2 and report["bytes_freed"] == 20
+    assert {name for name, path in paths.items() if os.path.exists(path)} == {
+        "new.png", "recent_release.png", "referenced.png", "unregistered_ref.png",
+    }
+    assert not _registered(url("released.png"))
+    assert _registered(url("recent_release.png"))
+
+
+def test_dry_run_deletes_nothing(client, run_in_app):
+    folder = "2001-01-08"
+    path = _file(folder, "orphan.png")
+    _register(f"/uploads/{folder}/orphan.png")
+    report = run_in_app(_gc(dry_run=True).run_once, {"folder": folder, "after": ""})
+    assert report["dry_run"] and report["deleted"] == 1
+    assert os.path.exists(path) and _registered(f"/uploads/{folder}/orphan.png")
+
+
+def test_orphan_variants(client, run_in_app):
+    folder = "2001-01-15"
+    _file(folder, "kept.png")
+    _register(f"/uploads/{folder}/kept.png", ref_count=1)
+    kept = _file(folder, "variants/kept_320.webp")
+    orphan = _file(folder, "variants/gone_320.webp")
+    report = run_in_app(_gc().run_once, {"folder": folder, "after": ""})
+    assert report["deleted"] == 1
+    assert os.path.exists(kept) and not os.path.exists(orphan)
+
+
+def test_cursor_pages_through_folders_and_wraps(client, run_in_app):
+    folders = ["2001-01-22", "2001-01-29"]
+    for folder in folders:
+        for i in range(3):
+            _file(folder, f"{i}.png", old=False)
+    gc = _gc(batch_size=2)
+    cursor = {"folder": folders[0], "after": ""}
+    pages = []
+    while True:
+        report = run_in_app(gc.run_once, cursor)
+        if report["wrapped"] or report["folder"] not in folders:
+            break
+        pages.append((report["folder"], report["scanned"], dict(cursor)))
+    assert pages == [
+        (folders[0], 2, {"folder": folders[0], "after": "1.png"}),
+        (folders[0], 1, {"folder": folders[0] + "\x00", "after": ""}),
+        (folders[1], 2, {"folder": folders[1], "after": "1.png"}),
+        (folders[1], 1, {"folder": folders[1] + "\x00", "after": ""}),
+    ]
+
+    cursor = {"folder": "9999-12-31", "after": ""}
+    report = run_in_app(gc.run_once, cursor)
+    assert report["wrapped"] and cursor == {"folder": None, "after": ""}
+
+
+def test_persisted_cursor(client, run_in_app):
+    """不传游标时从状态文件继续，并把推进后的游标写回"""
+    folder = "2001-02-05"
+    for i in range(3):
+        _file(folder, f"{i}.png")
+    gc = _gc(batch_size=1, dry_run=True)
+    gc.save_cursor({"folder": folder, "after": ""})
+    report = run_in_app(gc.run_once)
+    assert report["folder"] == folder
+    assert gc.load_cursor() == {"folder": folder, "after": "0.png"}
+    run_in_app(gc.run_once)
+    assert gc.load_cursor() == {"folder": folder, "after": "1.png"}
@@ -0,0 +1,81 @@
+"""流式上传的大小限制: 超出 UPLOAD_MAX_SIZE_MB 立即返回 413，不留下写了一半的文件"""
+import os
+import uuid
+import pytest
+from backend.config import settings
+from backend.upload_utils import get_week_folder
+from .conftest import TEST_DIR
+
+WEEK_DIR = os.path.join(TEST_DIR, "uploads", get_week_folder())
+BOUNDARY = "qa-box-test-boundary"
+
+
+def _files() -> set[str]:
+    try:
+        return {name for name in os.listdir(WEEK_DIR) if not name.startswith(".")}
+    except FileNotFoundError:
+        return set()
+
+
+def _multipart_chunks(size: int, chunk_size: int = 64 * 1024):
+    """分块生成 multipart 请求体 (不带 Content-Length，按 chunked 编码发送)"""
+    yield (
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="big.png"\r\n'
+        "Content-Type: image/png\r\n\r\n"
+    ).encode() + b"\x89PNG\r\n\x1a\n"
+    sent = 0
+    while sent < size:
+        chunk = uuid.uuid4().bytes * (min(chunk_size, size - sent) // 16 + 1)
+        chunk = chunk[:min(chunk_size, size - sent)]
+        sent += len(chunk)
+        yield chunk
+    yield f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+@pytest.fixture
+def one_mb_limit(monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_MAX_SIZE_MB", 1)
+
+
+def _post_stream(client, size: int, headers: dict | None = None):
+    return client.post("/api/upload", content=_multipart_chunks(size), headers={
+        "Content-Type": f"multipart/form-data; boundary={BOUNDARY}", **(headers or {}),
+    })
+
+
+def test_content_length_over_limit_rejected_upfront(client, one_mb_limit):
+    before = _files()
+    response = client.post("/api/upload", files={"file": ("big.png", b"\x89PNG\r\n\x1a\n" + b"x" * (2 << 20))})
+    assert response.status_code == 413
+    assert _files() == before
+
+
+def test_streamed_body_over_limit_is_aborted(client, one_mb_limit):
+    before = _files()
+    response = _post_stream(client, 3 << 20)
+    assert response.status_code == 413
+    assert "1MB" in response.json()["detail"]
+    # 已写入的部分被删除
+    assert _files() == before
+
+
+def test_streamed_body_within_limit(client, one_mb_limit):
+    response = _post_stream(client, 512 << 10)
+    assert response.status_code == 200
+    url = response.json()["url"]
+    assert url.endswith(".png")
+    assert os.path.getsize(os.path.join(TEST_DIR, "uploads", url[len("/uploads/"):])) == 8 + (512 << 10)
+
+
+def test_admin_is_not_limited(client, one_mb_limit, admin_headers):
+    response = _post_stream(client, 2 << 20, headers=admin_headers)
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"json": {"file": "x"}},
+    {"files": {"other": ("a.png", b"\x89PNG\r\n\x1a\n")}},
+])
+def test_malformed_uploads_rejected(client, kwargs):
+    assert client.post("/api/upload", **kwargs).status_code == 400
@@ -0,0 +1,124 @@
+"""上传去重与引用计数: 相同内容只存一份，引用数降为 0 的文件留给回收任务，不会在重新引用前被删除"""
+import os
+import sqlite3
+import uuid
+from datetime import datetime, timedelta
+from backend.upload_gc import UploadGC
+from .conftest import TEST_DIR
+
+UPLOAD_DIR = os.path.join(TEST_DIR, "uploads")
+
+
+def _png() -> bytes:
+    """能通过文件头识别的 PNG (内容唯一，不与其他测试的上传去重)"""
+    return b"\x89PNG\r\n\x1a\n" + uuid.uuid4().bytes * 16
+
+
+def _upload(client, data: bytes) -> str:
+    response = client.post("/api/upload", files={"file": ("photo.png", data, "image/png")})
+    assert response.status_code == 200
+    return response.json()["url"]
+
+
+def _row(url: str):
+    with sqlite3.connect(f"{TEST_DIR}/qa_box.db") as conn:
+        return conn.execute("SELECT ref_count, created_at FROM uploads WHERE url = ?", (url,)).fetchone()
+
+
+def _file(url: str) -> str:
+    return os.path.join(UPLOAD_DIR, url[len("/uploads/"):])
+
+
+def _age_upload(url: str, hours: float):
+    """把登记时间和文件修改时间调早，模拟宽限期已过"""
+    old = datetime.utcnow() - timedelta(hours=hours)
+    with sqlite3.connect(f"{TEST_DIR}/qa_box.db") as conn:
+        conn.execute("UPDATE uploads SET created_at = ? WHERE url = ?", (old.isoformat(sep=" "), url))
+    mtime = old.timestamp()
+    os.utime(_file(url), (mtime, mtime))
+
+
+def _submit(client, url: str):
+    return client.post("/api/questions", json={"content": "with image", "images": [url]})
+
+
+def test_same_content_is_stored_once(client):
+    data = _png()
+    url = _upload(client, data)
+    assert _upload(client, data) == url
+    folder = os.path.dirname(_file(url))
+    assert [name for name in os.listdir(folder) if name.startswith(os.path.basename(url).split(".")[0])] == [
+        os.path.basename(url),
+    ]
+    assert _row(url)[0] == 0
+
+
+def test_reference_counts(client, admin_prefix, admin_headers):
+    url = _upload(client, _png())
+    first, second = _submit(client, url).json(), _submit(client, url).json()
+    assert _row(url)[0] == 2
+
+    assert client.post("/api/questions/revoke", json={"token": first["access_token"]}).status_code == 200
+    assert _row(url)[0] == 1
+    response = client.delete(f"{admin_prefix}/questions/{second['question_id']}", headers=admin_headers)
+    assert response.json()["pending_image_deletions"] == 1
+    # 引用数降为 0 后登记记录和文件保留，交给回收任务
+    assert _row(url)[0] == 0
+    assert os.path.exists(_file(url))
+
+
+def test_released_upload_survives_until_resubmitted(client):
+    """撤回后用同一张图片重新提交: 重复上传拿到的 URL 在重新提交时仍然有效"""
+    data = _png()
+    url = _upload(client, data)
+    _age_upload(url, hours=48)
+    first = _submit(client, url).json()
+    assert _upload(client, data) == url  # 另一位用户上传相同内容
+
+    client.post("/api/questions/revoke", json={"token": first["access_token"]})
+    ref_count, created_at = _row(url)
+    assert ref_count == 0
+    # 引用数降为 0 时刷新登记时间，宽限期从此时开始
+    assert datetime.fromisoformat(created_at) > datetime.utcnow() - timedelta(minutes=5)
+
+    assert _submit(client, url).status_code == 200
+    assert _row(url)[0] == 1
+    assert os.path.exists(_file(url))
+
+
+def test_gc_keeps_released_upload_within_grace(client, run_in_app):
+    url = _upload(client, _png())
+    question = _submit(client, url).json()
+    client.post("/api/questions/revoke", json={"token": question["access_token"]})
+    os.utime(_file(url), (0, 0))  # 文件本身很旧，登记时间刚被刷新
+
+    gc = UploadGC(UPLOAD_DIR, batch_size=10_000, grace_hours=24, dry_run=False)
+    folder = url.split("/")[2]
+    run_in_app(gc.run_once, {"folder": folder, "after": ""})
+    assert _row(url) is not None and os.path.exists(_file(url))
+
+    _age_upload(url, hours=48)
+    run_in_app(gc.run_once, {"folder": folder, "after": ""})
+    assert _row(url) is None and not os.path.exists(_file(url))
+
+
+def test_missing_registration_is_restored(client):
+    url = _upload(client, _png())
+    with sqlite3.connect(f"{TEST_DIR}/qa_box.db") as conn:
+        conn.execute("DELETE FROM uploads WHERE url = ?", (url,))
+    assert _submit(client, url).status_code == 200
+    assert _row(url)[0] == 1
+
+
+def test_reclaimed_upload_is_rejected(client):
+    url = _upload(client, _png())
+    with sqlite3.connect(f"{TEST_DIR}/qa_box.db") as conn:
+        conn.execute("DELETE FROM uploads WHERE url = ?", (url,))
+    os.remove(_file(url))
+    response = _submit(client, url)
+    assert response.status_code == 400
+    assert _row(url) is None
+
+
+def test_external_image_urls_are_ignored(client):
+    assert _submit(client, "https://example.com/a.png").status_code == 200
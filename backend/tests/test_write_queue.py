@@ -0,0 +1,86 @@
+"""提问写入合并: 同一时间窗口内的提交共用一个事务，批次失败时逐条重试，只有出错的提交失败"""
+import asyncio
+import sqlite3
+import pytest
+from backend import write_queue
+from backend.upload_store import MissingUploads
+from .conftest import TEST_DIR
+
+
+@pytest.fixture
+def inserts(monkeypatch):
+    """记录每次 insert_questions 写入的行数"""
+    calls = []
+    insert_questions = write_queue.insert_questions
+
+    async def counting(db, rows):
+        calls.append(len(rows))
+        await insert_questions(db, rows)
+
+    monkeypatch.setattr(write_queue, "insert_questions", counting)
+    return calls
+
+
+def _stored(ids) -> set[str]:
+    with sqlite3.connect(f"{TEST_DIR}/qa_box.db") as conn:
+        marks = ",".join("?" * len(ids))
+        return {row[0] for row in conn.execute(f"SELECT id FROM questions WHERE id IN ({marks})", list(ids))}
+
+
+def _submit_all(run_in_app, queue, rows):
+    """启动队列并发提交 rows，返回每个提交的结果或异常"""
+    async def submit():
+        queue.start()
+        try:
+            return await asyncio.wait_for(
+                asyncio.gather(*(queue.submit(row) for row in rows), return_exceptions=True), 5,
+            )
+        finally:
+            await queue.stop()
+    return run_in_app(submit)
+
+
+def test_burst_shares_one_transaction(client, run_in_app, inserts):
+    queue = write_queue.QuestionWriteQueue(window=0.05, max_rows=100)
+    rows = [write_queue.new_question_row(f"burst {i}", []) for i in range(10)]
+    results = _submit_all(run_in_app, queue, rows)
+    assert results == [row["id"] for row in rows]
+    assert inserts == [10]
+    assert _stored(results) == set(results)
+
+
+def test_full_batch_flushes_early(client, run_in_app, inserts):
+    queue = write_queue.QuestionWriteQueue(window=30, max_rows=4)
+    rows = [write_queue.new_question_row(f"full {i}", []) for i in range(8)]
+    # 攒满 max_rows 时立即写入，不等待 30 秒的时间窗口
+    results = _submit_all(run_in_app, queue, rows)
+    assert results == [row["id"] for row in rows]
+    assert inserts == [4, 4]
+
+
+def test_failed_row_retried_alone(client, run_in_app, inserts):
+    queue = write_queue.QuestionWriteQueue(window=0.05, max_rows=100)
+    rows = [write_queue.new_question_row(f"retry {i}", []) for i in range(3)]
+    rows[1]["images"] = ["/uploads/1999-01-01/reclaimed.png"]
+    results = _submit_all(run_in_app, queue, rows)
+
+    assert isinstance(results[1], MissingUploads)
+    assert results[0] == rows[0]["id"] and results[2] == rows[2]["id"]
+    assert inserts == [3, 1, 1, 1]
+    assert _stored([row["id"] for row in rows]) == {rows[0]["id"], rows[2]["id"]}
+
+
+def test_api_submits_through_queue(client, run_in_app, inserts):
+    run_in_app(_start_global_queue)
+    try:
+        response = client.post("/api/questions", json={"content": "queued"})
+    finally:
+        run_in_app(write_queue.question_write_queue.stop)
+    assert response.status_code == 200
+    question_id = response.json()["question_id"]
+    assert inserts == [1]
+    assert _stored([question_id]) == {question_id}
+
+
+async def _start_global_queue():
+    write_queue.question_write_queue.start()
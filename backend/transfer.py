@@ -0,0 +1,180 @@
+"""
+问题数据导出 / 导入 (NDJSON)
+- 导出: 每行一个问题的 JSON，按 (created_at, id) 排序；服务端分块读取 (yield_per)，
+  边读边写出，内存占用与总行数无关；可选 gzip 压缩，可按创建/回答时间范围筛选
+- 导入: 流式读取请求体 (可为 gzip)，逐行校验，每 IMPORT_BATCH_ROWS 行在一个事务中写入；
+  ID 已存在的问题跳过 (用于恢复到空库或合并两份数据)，并登记新问题的图片引用
+"""
+import zlib
+import asyncio
+from collections import Counter
+from datetime import datetime
+from typing import AsyncIterator
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from . import models, schemas, database
+from .config import settings
+from .feed_cache import public_feed_cache
+from .serialization import dumps, loads
+from .upload_store import add_reference_counts
+
+# 单行超过该长度时中止导入 (防止缺少换行的输入占满内存)
+MAX_LINE_BYTES = 16 * 1024 * 1024
+# 导入结果中最多列出的错误行数
+MAX_REPORTED_ERRORS = 100
+GZIP_MAGIC = b"\x1f\x8b"
+
+EXPORT_COLUMNS = [models.Question.__table__.c[name] for name in schemas.QuestionRecord.model_fields]
+
+
+class InvalidImport(ValueError):
+    """导入数据无法继续读取 (压缩格式错误、单行过长)；此前的批次已经提交"""
+
+    def __init__(self, message: str, summary: dict):
+        super().__init__(message)
+        self.summary = summary
+
+
+def export_statement(
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    answered_from: datetime | None = None,
+    answered_to: datetime | None = None,
+):
+    """导出查询 (时间范围为左闭右开)"""
+    stmt = select(*EXPORT_COLUMNS)
+    q = models.Question
+    if created_from is not None:
+        stmt = stmt.where(q.created_at >= created_from)
+    if created_to is not None:
+        stmt = stmt.where(q.created_at < created_to)
+    if answered_from is not None:
+        stmt = stmt.where(q.answered_at >= answered_from)
+    if answered_to is not None:
+        stmt = stmt.where(q.answered_at < answered_to)
+    return stmt.order_by(q.created_at, q.id)
+
+
+async def export_questions(stmt, compress: bool = False) -> AsyncIterator[bytes]:
+    """按块输出 NDJSON (compress 时为 gzip 流)
+
+    使用独立的只读会话: 响应体在请求的依赖项清理之后才开始发送
+    """
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    async with database.ReadSessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=settings.EXPORT_CHUNK_ROWS))
+        async for rows in result.partitions():
+            chunk = b"".join(dumps(dict(row._mapping)) + b"\n" for row in rows)
+            if compressor is not None:
+                chunk = await asyncio.to_thread(compressor.compress, chunk)
+            if chunk:
+                yield chunk
+    if compressor is not None:
+        yield compressor.flush()
+
+
+async def _ndjson_lines(chunks: AsyncIterator[bytes], summary: dict) -> AsyncIterator[bytes]:
+    """把请求体拆成行，自动识别 gzip"""
+    decompressor = None
+    pending = b""
+    first = True
+    async for chunk in chunks:
+        if first and chunk:
+            first = False
+            if chunk[:2] == GZIP_MAGIC:
+                decompressor = zlib.decompressobj(wbits=31)
+        if decompressor is not None:
+            try:
+                chunk = decompressor.decompress(chunk)
+            except zlib.error as e:
+                raise InvalidImport(f"Invalid gzip data: {e}", summary)
+        pending += chunk
+        lines = pending.split(b"\n")
+        pending = lines.pop()
+        if len(pending) > MAX_LINE_BYTES:
+            raise InvalidImport(f"Line {summary['lines'] + len(lines) + 1} is too long", summary)
+        for line in lines:
+            yield line
+    if decompressor is not None and not decompressor.eof:
+        raise InvalidImport("Truncated gzip data", summary)
+    if pending:
+        yield pending
+
+
+async def _insert_batch(records: list[dict]) -> int:
+    """在一个事务中写入一批问题，跳过已存在的 ID，返回新插入的行数"""
+    async with database.AsyncSessionLocal() as db:
+        result = await db.execute(
+            sqlite_insert(models.Question)
+            .on_conflict_do_nothing(index_elements=["id"])
+            .returning(models.Question.id),
+            records,
+        )
+        inserted = set(result.scalars().all())
+        if not inserted:
+            return 0
+        counts = Counter()
+        public = False
+        for record in records:
+            if record["id"] in inserted:
+                # 与 question_image_urls 一致: 同一问题内重复出现只算一次引用
+                counts.update(set(record["images"]) | set(record["answer_images"]))
+                public = public or record["is_public"]
+        # 导出数据可能来自其他实例，引用的文件不在本机存储中时照常导入 (图片需另行迁移)
+        await add_reference_counts(db, counts)
+        if public:
+            await public_feed_cache.bump(db)
+        await db.commit()
+        return len(inserted)
+
+
+def _record_error(summary: dict, error: str):
+    summary["invalid"] += 1
+    if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+        summary["errors"].append({"line": summary["lines"], "error": error})
+
+
+async def import_questions(chunks: AsyncIterator[bytes]) -> dict:
+    """从 NDJSON 流导入问题
+
+    格式错误的行跳过并记录在 errors 中 (最多 MAX_REPORTED_ERRORS 条)，不影响其他行
+    返回: {"lines", "inserted", "skipped", "invalid", "errors"}
+    """
+    summary = {"lines": 0, "inserted": 0, "skipped": 0, "invalid": 0, "errors": []}
+    batch: list[dict] = []
+    seen: set[str] = set()
+
+    async def flush():
+        inserted = await _insert_batch(batch)
+        summary["inserted"] += inserted
+        summary["skipped"] += len(batch) - inserted
+        batch.clear()
+        seen.clear()
+
+    async for line in _ndjson_lines(chunks, summary):
+        summary["lines"] += 1
+        if not line.strip():
+            continue
+        try:
+            record = schemas.QuestionRecord.model_validate(loads(line)).model_dump()
+        except ValidationError as e:
+            _record_error(summary, "; ".join(
+                f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()
+            ))
+            continue
+        except ValueError as e:
+            # JSON 解析错误
+            _record_error(summary, str(e))
+            continue
+        if record["id"] in seen:
+            # 同一批次内的重复 ID: executemany 的 RETURNING 无法区分，直接按已存在处理
+            summary["skipped"] += 1
+            continue
+        seen.add(record["id"])
+        batch.append(record)
+        if len(batch) >= settings.IMPORT_BATCH_ROWS:
+            await flush()
+    if batch:
+        await flush()
+    return summary
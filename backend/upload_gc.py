@@ -0,0 +1,319 @@
+"""
+上传目录回收 (孤儿文件 GC)
+- 将上传存储 (本地目录或对象存储，见 storage.py) 与 questions.images / answer_images 引用的 URL 对账，
+  删除没有任何问题引用的文件:
+  上传后没有提交问题的图片、登记失败残留的临时文件、原图已不存在的缩略图
+- 增量执行: 每轮只列出一个周文件夹中游标之后的 UPLOAD_GC_BATCH_SIZE 个文件 (分页列出，只对这些文件查询数据库)，
+  游标保存在 UPLOAD_DIR/.gc_state.json；扫完全部文件夹后从头开始，并清理空文件夹 (本地存储)
+  本地存储在进入一个文件夹时扫描一次目录并保存快照，之后各轮从快照分页 (见 LocalStorage._list)
+- 修改时间和登记时间都早于 UPLOAD_GC_GRACE_HOURS 的文件才会被删除，刚上传、问题还没提交的文件不受影响
+  (引用数降为 0、重复上传命中已有文件时都会刷新其登记时间；删除问题时不直接删除文件)
+- 登记为未引用的文件删除前还会在 questions 表中核对一次，仍被引用的 (引用计数漂移) 只报告不删除
+- 多个 worker 通过 UPLOAD_DIR/.gc.lock 文件锁互斥，同一时间只有一个在执行
+- UPLOAD_GC_DRY_RUN=true 时只报告不删除; 命令行:
+    python -m backend.upload_gc report   # 全量试运行，按文件夹输出报告
+    python -m backend.upload_gc run      # 立即执行一轮
+"""
+import os
+import re
+import json
+import time
+import fcntl
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from pathlib import Path
+from sqlalchemy import DateTime, bindparam, delete, or_, select, text
+from . import models, database, metrics, serialization
+from .config import settings
+from .storage import storage
+from .upload_utils import delete_upload_files, get_week_folder
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = ".gc_state.json"
+LOCK_FILE = ".gc.lock"
+WEEK_FOLDER_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+VARIANT_RE = re.compile(r"^(?P<stem>.+)_\d+\.webp$")
+
+# 问题只可能引用创建时间之前上传的图片；周文件夹按本地日期命名，created_at 为 UTC，留一天余量
+REFERENCE_QUERY = text("""
+    SELECT j.value FROM questions AS q, json_each(q.images) AS j
+    WHERE q.created_at >= :since AND j.value IN :urls
+    UNION
+    SELECT j.value FROM questions AS q, json_each(q.answer_images) AS j
+    WHERE q.answered_at >= :since AND j.value IN :urls
+""").bindparams(bindparam("urls", expanding=True), bindparam("since", type_=DateTime()))
+
+
+# 文件名为 <stem>.<扩展名> 的登记记录: url 落在 [<stem>., <stem>/) 之间 ("." 与 "/" 相邻)，走主键索引
+STEM_QUERY = text("""
+    SELECT j.value FROM json_each(:stems) AS j
+    WHERE EXISTS (
+        SELECT 1 FROM uploads
+        WHERE url >= :prefix || j.value || '.' AND url < :prefix || j.value || '/'
+    )
+""")
+
+
+class UploadGC:
+    def __init__(self, upload_dir: str, batch_size: int, grace_hours: float, dry_run: bool):
+        self.upload_dir = Path(upload_dir)
+        self.batch_size = batch_size
+        self.grace = timedelta(hours=grace_hours)
+        self.dry_run = dry_run
+        self._task = None
+
+    # ---------------- 游标 ----------------
+    @property
+    def state_path(self) -> Path:
+        return self.upload_dir / STATE_FILE
+
+    def load_cursor(self) -> dict:
+        try:
+            state = json.loads(self.state_path.read_text())
+            return {"folder": state.get("folder"), "after": state.get("after", "")}
+        except (FileNotFoundError, ValueError):
+            return {"folder": None, "after": ""}
+
+    def save_cursor(self, cursor: dict):
+        tmp = self.state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(cursor))
+        os.replace(tmp, self.state_path)
+
+    async def _next_folder(self, folder: str | None) -> str | None:
+        """游标所在或之后的第一个周文件夹，没有时返回 None (一遍扫描结束)"""
+        for name in await storage.list_folders():
+            if WEEK_FOLDER_RE.match(name) and (folder is None or name >= folder):
+                return name
+        return None
+
+    # ---------------- 一轮回收 ----------------
+    async def run_once(self, cursor: dict | None = None, dry_run: bool | None = None) -> dict | None:
+        """检查游标之后的一批文件并删除其中的孤儿文件
+
+        cursor 为 None 时使用并更新持久化的游标 (需要获取文件锁，其他 worker 正在执行时返回 None)；
+        传入 dict 时就地推进该游标，不读写状态文件。
+        """
+        dry_run = self.dry_run if dry_run is None else dry_run
+        if cursor is not None:
+            return await self._run_batch(cursor, dry_run)
+
+        lock_file = await asyncio.to_thread(self._open_lock_file)
+        try:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+            cursor = await asyncio.to_thread(self.load_cursor)
+            report = await self._run_batch(cursor, dry_run)
+            await asyncio.to_thread(self.save_cursor, cursor)
+            return report
+        finally:
+            lock_file.close()
+
+    def _open_lock_file(self):
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+        return open(self.upload_dir / LOCK_FILE, "a")
+
+    async def _run_batch(self, cursor: dict, dry_run: bool) -> dict:
+        report = {
+            "folder": None, "scanned": 0, "candidates": 0, "deleted": 0,
+            "bytes_freed": 0, "referenced": [], "dry_run": dry_run, "wrapped": False,
+        }
+        folder = await self._next_folder(cursor["folder"])
+        if folder != cursor["folder"]:
+            cursor["after"] = ""
+        if folder is None:
+            # 一遍扫描结束，回到第一个文件夹
+            cursor["folder"], cursor["after"] = None, ""
+            report["wrapped"] = True
+            if not dry_run:
+                removed = await storage.prune_folders(keep=get_week_folder())
+                if removed:
+                    logger.info(f"Upload GC removed {removed} empty folders")
+            return report
+
+        report["folder"] = folder
+        # 只列出游标之后的一页 (文件名，缩略图为 variants/<文件名>)，每轮的 I/O 与文件总数无关
+        prefix = folder + "/"
+        page = await storage.list_objects(
+            prefix, start_after=prefix + cursor["after"] if cursor["after"] else "", limit=self.batch_size,
+        )
+        entries = {obj.key[len(prefix):]: obj for obj in page}
+        batch = list(entries)
+        report["scanned"] = len(batch)
+        if len(batch) < self.batch_size:
+            # 本文件夹已扫完，下一轮从下一个文件夹开始 (folder + "\x00" 排在 folder 之后、下一个日期之前)
+            cursor["folder"], cursor["after"] = folder + "\x00", ""
+        else:
+            cursor["folder"], cursor["after"] = folder, batch[-1]
+        if not batch:
+            return report
+
+        cutoff = datetime.utcnow() - self.grace
+        cutoff_ts = time.time() - self.grace.total_seconds()
+        old = [name for name in batch if entries[name].modified < cutoff_ts]
+
+        # 原图已不存在的缩略图 (原图被删除时会一并删除缩略图，这里处理残留)
+        variant_stems = {}
+        originals = []
+        for name in old:
+            if name.startswith("variants/"):
+                match = VARIANT_RE.match(name[len("variants/"):])
+                variant_stems[name] = match.group("stem") if match else None
+            else:
+                originals.append(name)
+        registered_stems = await self._registered_stems(
+            folder, {stem for stem in variant_stems.values() if stem is not None},
+        )
+        orphan_variants = [name for name, stem in variant_stems.items() if stem not in registered_stems]
+
+        urls = {f"/uploads/{folder}/{name}": name for name in originals}
+        orphan_urls, referenced = await self._find_orphans(folder, list(urls), cutoff, dry_run)
+        report["referenced"] = referenced
+        report["candidates"] = len(orphan_urls) + len(orphan_variants) + len(referenced)
+        report["deleted"] = len(orphan_urls) + len(orphan_variants)
+        report["bytes_freed"] = sum(entries[urls[url]].size for url in orphan_urls)
+        report["bytes_freed"] += sum(entries[name].size for name in orphan_variants)
+        if referenced:
+            logger.warning(f"Upload GC: {len(referenced)} files in {folder} are referenced by questions "
+                           f"but have no reference count, keeping them: {referenced[:5]}")
+
+        if not dry_run and report["deleted"]:
+            # 原图、其缩略图和残留缩略图在一次批量请求中删除
+            await delete_upload_files(orphan_urls, [f"{folder}/{name}" for name in orphan_variants])
+            metrics.upload_gc_deleted_files.inc(report["deleted"])
+            metrics.upload_gc_deleted_bytes.inc(report["bytes_freed"])
+            logger.info(f"Upload GC deleted {report['deleted']} files ({report['bytes_freed']} bytes) in {folder}")
+        return report
+
+    async def _registered_stems(self, folder: str, stems: set[str]) -> set[str]:
+        """有登记记录的原图文件名 (不含扩展名)
+
+        缩略图只会为登记过的上传文件生成，原图删除时登记记录也一并删除，
+        因此按 uploads 主键范围查询即可判断原图是否还在，不需要列出整个文件夹
+        """
+        if not stems:
+            return set()
+        async with database.AsyncSessionLocal() as db:
+            result = await db.execute(STEM_QUERY, {
+                "stems": serialization.dumps(sorted(stems)).decode("utf-8"),
+                "prefix": f"/uploads/{folder}/",
+            })
+            return set(result.scalars().all())
+
+    async def _find_orphans(self, folder: str, urls: list[str], cutoff: datetime,
+                            dry_run: bool) -> tuple[list[str], list[str]]:
+        """返回 (可删除的 URL, 未登记引用但仍被问题引用的 URL)；非试运行时同时删除登记记录"""
+        if not urls:
+            return [], []
+        since = datetime.strptime(folder, "%Y-%m-%d") - timedelta(days=1)
+        async with database.AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(models.Upload.url, models.Upload.ref_count, models.Upload.created_at)
+                .where(models.Upload.url.in_(urls))
+            )
+            registered = {}
+            for url, ref_count, created_at in result.all():
+                registered[url] = ref_count > 0 or (created_at is not None and created_at >= cutoff)
+            # 有引用计数或仍在宽限期内的登记文件直接保留
+            candidates = [url for url in urls if not registered.get(url, False)]
+            if not candidates:
+                return [], []
+
+            result = await db.execute(REFERENCE_QUERY, {"urls": candidates, "since": since})
+            referenced = set(result.scalars().all())
+            orphans = [url for url in candidates if url not in referenced]
+            unregistered = [url for url in orphans if url not in registered]
+            to_unregister = [url for url in orphans if url in registered]
+            if dry_run or not to_unregister:
+                return orphans, sorted(referenced)
+
+            # 引用数仍为 0 且登记时间未被刷新的才删除 (核对期间可能有新问题引用了这些文件，
+            # 或者重复上传命中了这些文件)
+            result = await db.execute(
+                delete(models.Upload)
+                .where(models.Upload.url.in_(to_unregister))
+                .where(models.Upload.ref_count <= 0)
+                .where(or_(models.Upload.created_at.is_(None), models.Upload.created_at < cutoff))
+                .returning(models.Upload.url)
+            )
+            unregistered += result.scalars().all()
+            await db.commit()
+        return unregistered, sorted(referenced)
+
+    # ---------------- 后台任务 ----------------
+    async def start(self):
+        """启动后台回收任务 (UPLOAD_GC_INTERVAL_SECONDS 为 0 时不启动)"""
+        interval = settings.UPLOAD_GC_INTERVAL_SECONDS
+        if interval <= 0:
+            logger.info("Upload GC disabled (interval <= 0)")
+            return
+
+        async def gc_loop():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await self.run_once()
+                except Exception as e:
+                    logger.error(f"Upload GC failed: {e}")
+
+        self._task = asyncio.create_task(gc_loop())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def report(self) -> list[dict]:
+        """全量试运行: 从头扫描全部文件夹 (不使用也不修改持久化游标)，按文件夹汇总"""
+        cursor = {"folder": None, "after": ""}
+        folders: dict[str, dict] = {}
+        while True:
+            batch = await self.run_once(cursor, dry_run=True)
+            if batch["wrapped"]:
+                return list(folders.values())
+            summary = folders.setdefault(batch["folder"], {
+                "folder": batch["folder"], "scanned": 0, "candidates": 0,
+                "deleted": 0, "bytes_freed": 0, "referenced": [],
+            })
+            for key in ("scanned", "candidates", "deleted", "bytes_freed"):
+                summary[key] += batch[key]
+            summary["referenced"] += batch["referenced"]
+
+
+upload_gc = UploadGC(
+    settings.UPLOAD_DIR,
+    batch_size=settings.UPLOAD_GC_BATCH_SIZE,
+    grace_hours=settings.UPLOAD_GC_GRACE_HOURS,
+    dry_run=settings.UPLOAD_GC_DRY_RUN,
+)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="QA Box 上传目录回收")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("report", help="全量试运行，按文件夹列出可回收的文件 (不删除)")
+    sub.add_parser("run", help="立即执行一轮 (遵循 UPLOAD_GC_DRY_RUN)")
+    args = parser.parse_args()
+
+    if args.command == "report":
+        folders = asyncio.run(upload_gc.report())
+        print(f"{'folder':<12}{'scanned':>10}{'orphans':>10}{'bytes':>14}{'referenced':>12}")
+        for f in folders:
+            print(f"{f['folder']:<12}{f['scanned']:>10}{f['deleted']:>10}{f['bytes_freed']:>14}"
+                  f"{len(f['referenced']):>12}")
+            for url in f["referenced"]:
+                print(f"  referenced without ref_count: {url}")
+        print(f"total: {sum(f['deleted'] for f in folders)} orphaned files, "
+              f"{sum(f['bytes_freed'] for f in folders)} bytes")
+    elif args.command == "run":
+        report = asyncio.run(upload_gc.run_once())
+        print(json.dumps(report, ensure_ascii=False) if report else "Another worker holds the GC lock")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+上传文件存储模块 (内容寻址)
+- 文件以内容的 sha256 命名，相同内容只存储一份
+- uploads 表记录每个文件被多少个问题引用 (同一问题内重复出现只算一次)
+- 引用数降为 0 的文件不立即删除: 重复上传可能刚拿到它的 URL、撤回后可能用同一张图片重新提交，
+  降为 0 时刷新登记时间，由上传回收任务 (upload_gc.py) 在宽限期后删除
+"""
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models
+from .storage import storage
+from .upload_utils import key_to_url, url_to_key
+
+
+class MissingUploads(Exception):
+    """问题引用的上传文件已不存在 (已被回收)"""
+
+    def __init__(self, urls: list[str]):
+        super().__init__(f"Uploads no longer exist: {urls[:5]}")
+        self.urls = urls
+
+
+def question_image_urls(question: models.Question) -> set[str]:
+    """问题及其回答引用的全部图片 URL"""
+    return set(question.images or []) | set(question.answer_images or [])
+
+
+async def register_upload(db: AsyncSession, saved: dict) -> tuple[str, bool]:
+    """登记一个刚写入存储的上传文件
+
+    已存在相同内容时删除新文件并返回已有文件的 URL；
+    否则将文件重命名为 <sha256>.<ext> 并写入 uploads 表 (引用数为 0)。
+    返回: (最终 URL, 是否为新文件)
+    """
+    existing = await _reuse_existing(db, saved["sha256"])
+    if existing:
+        await storage.delete([saved["key"]])
+        return existing, False
+
+    final_key = saved["key"].rsplit("/", 1)[0] + f"/{saved['sha256']}.{saved['ext']}"
+    await storage.move(saved["key"], final_key)
+    url = key_to_url(final_key)
+
+    db.add(models.Upload(url=url, sha256=saved["sha256"], size=saved["size"], ref_count=0))
+    try:
+        await db.commit()
+    except IntegrityError:
+        # 并发上传了相同内容，以先提交的为准
+        await db.rollback()
+        existing = await _reuse_existing(db, saved["sha256"])
+        if existing and existing != url:
+            await storage.delete([final_key])
+            return existing, False
+        return url, False
+    return url, True
+
+
+async def _reuse_existing(db: AsyncSession, sha256: str) -> str | None:
+    """命中已有文件时刷新其登记时间并提交，返回其 URL
+
+    未被引用的旧文件在问题提交前仍处于回收任务的宽限期内 (回收任务按 created_at 判断)，
+    不会在上传响应与提交问题之间被删除
+    """
+    result = await db.execute(select(models.Upload.url).where(models.Upload.sha256 == sha256))
+    existing = result.scalar()
+    if existing is None:
+        return None
+    result = await db.execute(
+        update(models.Upload)
+        .where(models.Upload.url == existing)
+        .values(created_at=datetime.utcnow())
+    )
+    await db.commit()
+    # 刚被回收任务删除时按新文件处理
+    return existing if result.rowcount else None
+
+
+async def add_references(db: AsyncSession, urls: set[str]):
+    """引用数 +1 (不提交事务)，引用的上传文件已不存在时抛出 MissingUploads"""
+    missing = await add_reference_counts(db, Counter(urls))
+    if missing:
+        raise MissingUploads(missing)
+
+
+async def add_reference_counts(db: AsyncSession, counts: Counter) -> list[str]:
+    """按 URL 分别增加引用数 (批量写入多个问题时使用，不提交事务)
+
+    相同增量的 URL 合并为一条 UPDATE；登记记录已被删除但文件仍在的重新登记，
+    非 /uploads/ 的外部 URL 忽略。
+    返回: 文件已不存在、无法登记的 URL 列表
+    """
+    if not counts:
+        return []
+    missing = await _register_missing(db, list(counts))
+    by_amount: dict[int, list[str]] = {}
+    for url, amount in counts.items():
+        by_amount.setdefault(amount, []).append(url)
+    for amount, urls in by_amount.items():
+        await db.execute(
+            update(models.Upload)
+            .where(models.Upload.url.in_(urls))
+            .values(ref_count=models.Upload.ref_count + amount)
+        )
+    return missing
+
+
+async def _register_missing(db: AsyncSession, urls: list[str]) -> list[str]:
+    """为没有登记记录的上传 URL 补登记 (引用数为 0)，返回文件也已不存在的 URL"""
+    keys = {url: url_to_key(url) for url in urls}
+    keys = {url: key for url, key in keys.items() if key is not None}
+    if not keys:
+        return []
+    result = await db.execute(select(models.Upload.url).where(models.Upload.url.in_(list(keys))))
+    registered = set(result.scalars().all())
+    missing = []
+    for url, key in keys.items():
+        if url in registered:
+            continue
+        stored = await storage.stat(key)
+        if stored is None:
+            missing.append(url)
+            continue
+        # 内容哈希未知 (文件名不一定可信)，不参与去重
+        await db.execute(
+            sqlite_insert(models.Upload)
+            .values(url=url, sha256=None, size=stored.size, ref_count=0, created_at=datetime.utcnow())
+            .on_conflict_do_nothing(index_elements=["url"])
+        )
+    return missing
+
+
+async def release_references(db: AsyncSession, urls: set[str]) -> list[str]:
+    """引用数 -1 (不提交事务)
+
+    返回: 不再被引用的 URL 列表 (文件由上传回收任务在宽限期后删除)
+    """
+    return await release_reference_counts(db, Counter(urls))
+
+
+async def release_reference_counts(db: AsyncSession, counts: Counter) -> list[str]:
+    """按 URL 分别减去引用数 (批量删除多个问题时使用，不提交事务)
+
+    相同减量的 URL 合并为一条 UPDATE。降为 0 的登记记录和文件保留，并刷新登记时间:
+    回收任务只删除登记时间早于宽限期的文件，期间重复上传或重新提交仍可以引用它们。
+    返回: 不再被引用的 URL 列表
+    """
+    if not counts:
+        return []
+    by_amount: dict[int, list[str]] = {}
+    for url, amount in counts.items():
+        by_amount.setdefault(amount, []).append(url)
+    for amount, urls in by_amount.items():
+        await db.execute(
+            update(models.Upload)
+            .where(models.Upload.url.in_(urls))
+            .values(ref_count=models.Upload.ref_count - amount)
+        )
+    result = await db.execute(
+        update(models.Upload)
+        .where(models.Upload.url.in_(list(counts)))
+        .where(models.Upload.ref_count <= 0)
+        .values(created_at=datetime.utcnow())
+        .returning(models.Upload.url)
+    )
+    return list(result.scalars().all())
+
+
+async def update_references(db: AsyncSession, old_urls: set[str], new_urls: set[str]) -> list[str]:
+    """问题图片从 old_urls 变为 new_urls 时调整引用数 (不提交事务)
+
+    新引用的上传文件已不存在时抛出 MissingUploads；返回不再被引用的 URL 列表
+    """
+    await add_references(db, new_urls - old_urls)
+    return await release_references(db, old_urls - new_urls)
@@ -1,12 +1,61 @@
 """
 上传文件工具模块
-- 按周分文件夹存储
+- 按周分文件夹存储 (对象键为 <周文件夹>/<文件名>，URL 为 /uploads/<对象键>)
+- 流式接收 multipart 上传: 边读边写入存储后端，超出大小限制立即中止
+- 写入的同时计算 sha256 并根据文件头识别图片类型
 """
-import os
 import uuid
+import asyncio
+import hashlib
+import logging
+import mimetypes
 from datetime import datetime, timedelta
-from pathlib import Path
+from starlette.requests import Request
+from multipart.multipart import MultipartParser, parse_options_header
 from .config import settings
+from .storage import storage, is_valid_key, StorageError
+
+logger = logging.getLogger(__name__)
+
+# 写盘缓冲区大小，攒够后交给工作线程写入
+WRITE_CHUNK_SIZE = 256 * 1024
+# multipart 边界和字段头的额外开销，用于根据 Content-Length 提前拒绝
+MULTIPART_OVERHEAD = 64 * 1024
+# 识别类型所需的文件头长度
+MAGIC_HEAD_SIZE = 32
+
+# (偏移, 魔数, 扩展名)
+MAGIC_SIGNATURES = [
+    (0, b"\x89PNG\r\n\x1a\n", "png"),
+    (0, b"\xff\xd8\xff", "jpg"),
+    (0, b"GIF87a", "gif"),
+    (0, b"GIF89a", "gif"),
+    (0, b"BM", "bmp"),
+    (4, b"ftypavif", "avif"),
+    (4, b"ftypheic", "heic"),
+]
+
+
+class UploadError(Exception):
+    """上传请求格式错误"""
+
+
+class UploadTooLarge(UploadError):
+    """上传文件超过大小限制"""
+
+    def __init__(self, max_size: int):
+        super().__init__(f"Upload exceeds {max_size} bytes")
+        self.max_size = max_size
+
+
+def detect_image_type(head: bytes) -> str | None:
+    """根据文件头识别图片类型，返回扩展名，无法识别时返回 None"""
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    for offset, magic, ext in MAGIC_SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            return ext
+    return None
 
 
 def get_week_folder() -> str:
@@ -20,39 +69,206 @@ def get_week_folder() -> str:
     return monday.strftime("%Y-%m-%d")
 
 
-def get_upload_path(filename: str) -> tuple[str, str]:
+def new_upload_key(filename: str, ext: str | None = None) -> str:
     """
-    获取上传文件的存储路径
-    返回: (完整文件路径, 相对URL路径)
+    新上传文件的对象键: <周文件夹>/<uuid>.<扩展名> (登记时再按内容重命名)
+    ext: 指定扩展名 (如根据文件头识别出的类型)，默认取原文件名的扩展名
     """
     # 获取文件扩展名
-    ext = filename.rsplit(".", 1)[-1] if "." in filename else "bin"
-    
-    # 生成唯一文件名
-    new_filename = f"{uuid.uuid4()}.{ext}"
-    
-    # 获取周文件夹
-    week_folder = get_week_folder()
-    
-    # 创建目录
-    folder_path = Path(settings.UPLOAD_DIR) / week_folder
-    folder_path.mkdir(parents=True, exist_ok=True)
-    
-    # 完整路径
-    file_path = folder_path / new_filename
-    
-    # URL 路径
-    url_path = f"/uploads/{week_folder}/{new_filename}"
-    
-    return str(file_path), url_path
-
-
-def cleanup_empty_folders():
-    """清理空的上传文件夹"""
-    upload_dir = Path(settings.UPLOAD_DIR)
-    for folder in upload_dir.iterdir():
-        if folder.is_dir() and not any(folder.iterdir()):
+    if ext is None:
+        ext = filename.rsplit(".", 1)[-1] if "." in filename else "bin"
+    return f"{get_week_folder()}/{uuid.uuid4()}.{ext}"
+
+
+def key_to_url(key: str) -> str:
+    return f"/uploads/{key}"
+
+
+def url_to_key(url: str) -> str | None:
+    """将 /uploads/... URL 转换为存储对象键，非本地上传的 URL 返回 None"""
+    if not url.startswith("/uploads/"):
+        return None
+    key = url[len("/uploads/"):]
+    # 防止 ../ 跳出上传目录
+    return key if is_valid_key(key) else None
+
+
+def variant_url(url: str, width: int) -> str:
+    """缩略图 URL: /uploads/<周>/variants/<原文件名去扩展名>_<宽度>.webp"""
+    folder, filename = url.rsplit("/", 1)
+    stem = filename.rsplit(".", 1)[0]
+    return f"{folder}/variants/{stem}_{width}.webp"
+
+
+def upload_keys(urls: list[str]) -> list[str]:
+    """URL 对应的原图及其全部缩略图的对象键"""
+    keys = []
+    for url in urls:
+        key = url_to_key(url)
+        if key is None:
+            continue
+        keys.append(key)
+        for width in settings.image_variant_widths_list:
+            variant_key = url_to_key(variant_url(url, width))
+            if variant_key is not None:
+                keys.append(variant_key)
+    return keys
+
+
+async def delete_upload_files(urls: list[str], extra_keys: list[str] = ()) -> int:
+    """删除 URL 对应的文件及其缩略图 (以及 extra_keys)，一次批量请求
+
+    返回: 删除的原图数量
+    """
+    originals = {url_to_key(url) for url in urls}
+    keys = upload_keys(urls) + list(extra_keys)
+    if not keys:
+        return 0
+    try:
+        deleted = await storage.delete(keys)
+    except (OSError, StorageError) as e:
+        # 记录错误但不阻止删除操作
+        logger.error(f"Failed to delete upload files: {e}")
+        return 0
+    return sum(1 for key in deleted if key in originals)
+
+
+class _FilePartCollector:
+    """multipart 解析回调: 只收集指定字段的第一个文件的数据"""
+
+    def __init__(self, field_name: str):
+        self.field_name = field_name
+        self.filename: str | None = None
+        self.pending: list[bytes] = []
+        self.finished = False
+        self._in_target = False
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        }
+
+    def on_part_begin(self):
+        self._disposition = b""
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_target:
+            self.pending.append(data[start:end])
+
+    def on_part_end(self):
+        if self._in_target:
+            self._in_target = False
+            self.finished = True
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        if name == self.field_name and b"filename" in options and self.filename is None:
+            self.filename = options[b"filename"].decode("utf-8", "replace")
+            self._in_target = True
+
+
+async def save_upload_stream(
+    request: Request,
+    field_name: str = "file",
+    max_size: int | None = None,
+) -> dict:
+    """流式保存 multipart 请求中的文件字段到周文件夹
+
+    - 不经过临时文件，数据分块直接写入存储后端 (本地写盘在工作线程中执行)
+    - 超过 max_size 时立即中止并删除已写入的部分 (None 表示不限制)
+    - 写入的同时在工作线程中计算 sha256，并根据文件头识别类型决定扩展名
+
+    返回: {"key", "url", "size", "sha256", "ext"}
+    """
+    content_type = request.headers.get("content-type", "")
+    mime, params = parse_options_header(content_type)
+    if mime != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadError("Expected multipart/form-data with a boundary")
+
+    content_length = request.headers.get("content-length")
+    if max_size is not None and content_length and content_length.isdigit():
+        if int(content_length) > max_size + MULTIPART_OVERHEAD:
+            raise UploadTooLarge(max_size)
+
+    collector = _FilePartCollector(field_name)
+    parser = MultipartParser(params[b"boundary"], collector.callbacks())
+    hasher = hashlib.sha256()
+    buffer: list[bytes] = []
+    buffered = 0
+    size = 0
+    writer = None
+    key = ext = None
+
+    async def flush():
+        nonlocal writer, key, ext, buffered
+        data = b"".join(buffer)
+        buffer.clear()
+        buffered = 0
+        if writer is None:
+            ext = detect_image_type(data[:MAGIC_HEAD_SIZE])
+            key = new_upload_key(collector.filename or "", ext)
+            ext = ext or key.rsplit(".", 1)[-1]
+            writer = await storage.open_writer(key, mimetypes.guess_type(key)[0])
+        if data:
+            await asyncio.gather(asyncio.to_thread(hasher.update, data), writer.write(data))
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if collector.pending:
+                for data in collector.pending:
+                    size += len(data)
+                    buffer.append(data)
+                    buffered += len(data)
+                collector.pending.clear()
+                if max_size is not None and size > max_size:
+                    raise UploadTooLarge(max_size)
+                # 第一次写入前至少攒够识别类型所需的文件头
+                if buffered >= WRITE_CHUNK_SIZE or (writer is None and buffered >= MAGIC_HEAD_SIZE * 2):
+                    await flush()
+            if collector.finished:
+                break
+
+        if collector.filename is None:
+            raise UploadError(f"Missing file field '{field_name}'")
+        if not collector.finished:
+            raise UploadError("Incomplete multipart body")
+        await flush()
+        await writer.close()
+    except BaseException:
+        if writer is not None:
             try:
-                folder.rmdir()
-            except OSError:
-                pass
+                await writer.abort()
+            except Exception as e:
+                logger.warning(f"Failed to discard partial upload {key}: {e}")
+        raise
+
+    return {
+        "key": key,
+        "url": key_to_url(key),
+        "size": size,
+        "sha256": hasher.hexdigest(),
+        "ext": ext,
+    }
@@ -0,0 +1,164 @@
+"""
+提问写入合并 (group commit)
+- QUESTION_WRITE_BATCHING=true 时，提交的问题先进入 asyncio 队列，
+  写入任务每 QUESTION_BATCH_WINDOW_MS 毫秒或攒够 QUESTION_BATCH_MAX_ROWS 条时在一个事务中写入
+- 一次提交只做一次 fsync、获取一次写锁；调用方在所在批次提交成功后才拿到结果
+- 问题 ID 在应用内生成 (uuid4)，写入后不需要再查询
+- 批次提交失败时逐条重试，只有失败的那一条向调用方抛出异常
+"""
+import time
+import uuid
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models, database, metrics
+from .config import settings
+from .upload_store import add_reference_counts, MissingUploads
+
+logger = logging.getLogger(__name__)
+
+
+def new_question_row(content: str, images: list[str]) -> dict:
+    """一行 questions 记录 (ID 和创建时间在应用内生成)"""
+    return {
+        "id": str(uuid.uuid4()),
+        "content": content,
+        "images": images,
+        "created_at": datetime.utcnow(),
+        "is_answered": False,
+        "is_public": False,
+        "answer_images": [],
+    }
+
+
+async def insert_questions(db: AsyncSession, rows: list[dict]):
+    """插入问题并登记图片引用 (每个问题内去重，不提交事务)
+
+    引用的上传文件已被回收时抛出 MissingUploads (合并写入时逐条重试，只有引用了它们的提交失败)
+    """
+    await db.execute(insert(models.Question), rows)
+    counts = Counter()
+    for row in rows:
+        counts.update(set(row["images"]))
+    missing = await add_reference_counts(db, counts)
+    if missing:
+        raise MissingUploads(missing)
+
+
+class QuestionWriteQueue:
+    def __init__(self, window: float, max_rows: int):
+        self.window = window
+        self.max_rows = max_rows
+        self._queue: asyncio.Queue | None = None
+        self._full: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def submit(self, row: dict) -> str:
+        """排队写入一行，所在批次提交后返回问题 ID"""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((row, future))
+        if self._queue.qsize() >= self.max_rows:
+            self._full.set()
+        # 请求被取消时该行仍会写入，不取消 future
+        await asyncio.shield(future)
+        return row["id"]
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._full = asyncio.Event()
+            self._task = asyncio.create_task(self._writer_loop())
+
+    async def stop(self):
+        """不再接收新提交，写完队列中剩余的问题后返回"""
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        self._queue.put_nowait(None)
+        self._full.set()
+        await task
+
+    def _drain(self, batch: list) -> bool:
+        """从队列补充本批次，遇到停止标记时返回 True"""
+        while len(batch) < self.max_rows and not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is None:
+                return True
+            batch.append(item)
+        return False
+
+    async def _writer_loop(self):
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            # 等待更多提交加入本批次，攒满时提前写入
+            if self.window > 0 and self._queue.qsize() + 1 < self.max_rows:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.window)
+                except asyncio.TimeoutError:
+                    pass
+            self._full.clear()
+            stopping = self._drain(batch)
+            await self._flush(batch)
+            if stopping:
+                return
+
+    async def _flush(self, batch: list[tuple[dict, asyncio.Future]]):
+        started = time.perf_counter()
+        try:
+            async with database.AsyncSessionLocal() as db:
+                await insert_questions(db, [row for row, _ in batch])
+                await db.commit()
+        except Exception as e:
+            logger.warning(f"Question batch of {len(batch)} failed, retrying one by one: {e}")
+            for row, future in batch:
+                try:
+                    async with database.AsyncSessionLocal() as db:
+                        await insert_questions(db, [row])
+                        await db.commit()
+                except Exception as row_error:
+                    _resolve(future, row_error)
+                else:
+                    _resolve(future)
+            return
+        metrics.question_batch_size.observe(len(batch))
+        metrics.question_batch_duration.observe(time.perf_counter() - started)
+        for _, future in batch:
+            _resolve(future)
+
+
+def _resolve(future: asyncio.Future, error: Exception | None = None):
+    if future.done():
+        return
+    if error is None:
+        future.set_result(None)
+    else:
+        future.set_exception(error)
+
+
+question_write_queue = QuestionWriteQueue(
+    window=settings.QUESTION_BATCH_WINDOW_MS / 1000,
+    max_rows=settings.QUESTION_BATCH_MAX_ROWS,
+)
+
+
+async def create_question(db: AsyncSession, content: str, images: list[str]) -> str:
+    """写入一个新问题并返回其 ID
+
+    写入合并开启时经过队列 (与同一时间窗口内的其他提交共用一个事务)，否则在 db 中直接写入并提交
+    """
+    row = new_question_row(content, images)
+    if question_write_queue.running:
+        return await question_write_queue.submit(row)
+    await insert_questions(db, [row])
+    await db.commit()
+    return row["id"]
@@ -28,8 +28,10 @@ export const questionApi = {
         return request.post('/api/questions/revoke', { token })
     },
     
-    getPublicQuestions(skip = 0, limit = 20) {
-        return request.get('/api/public/questions', { params: { skip, limit } })
+    getPublicQuestions(skip = 0, limit = 20, cursor = null) {
+        // 传入 cursor 时使用游标分页，下一页游标在 X-Next-Cursor 响应头中
+        const params = cursor ? { limit, cursor } : { skip, limit }
+        return request.get('/api/public/questions', { params })
     },
     
     getQuestion(id) {
@@ -40,6 +42,12 @@ export const questionApi = {
         return request.post('/api/questions/batch', questionIds)
     },
 
+    // 订阅问题状态变化 (Server-Sent Events)，返回 EventSource
+    subscribeQuestionEvents(questionIds) {
+        const ids = encodeURIComponent(questionIds.join(','))
+        return new EventSource(`/api/questions/events?ids=${ids}`)
+    },
+
     // ============================================
     // Admin 接口
     // ============================================
@@ -51,9 +59,25 @@ export const questionApi = {
         return request.post(`${ADMIN_API_PREFIX}/verify`)
     },
 
+    // 注销: 服务端吊销当前 Token
+    adminLogout() {
+        return request.post(`${ADMIN_API_PREFIX}/logout`)
+    },
+
+    // 总数及已回答/待回答/公开/私密数量 (服务端计数器，不依赖已加载的列表)
+    getStats() {
+        return request.get(`${ADMIN_API_PREFIX}/stats`)
+    },
+
     getQuestions() {
         return request.get(`${ADMIN_API_PREFIX}/questions`)
     },
+
+    // 全文检索 (按相关度排序)，下一页游标在 X-Next-Cursor 响应头中
+    searchQuestions(q, limit = 100, cursor = null) {
+        const params = cursor ? { q, limit, cursor } : { q, limit }
+        return request.get(`${ADMIN_API_PREFIX}/questions/search`, { params })
+    },
     
     updateQuestion(id, data) {
         return request.put(`${ADMIN_API_PREFIX}/questions/${id}`, data)
@@ -65,5 +89,10 @@ export const questionApi = {
 
     deleteQuestion(id) {
         return request.delete(`${ADMIN_API_PREFIX}/questions/${id}`)
+    },
+
+    // 批量操作，operations: [{ action: 'publish' | 'unpublish' | 'mark_answered' | 'delete', ids: [...] }]
+    bulkUpdateQuestions(operations) {
+        return request.post(`${ADMIN_API_PREFIX}/questions/bulk`, { operations })
     }
 }